@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Organization, APIKey
+from core.admin import ScheduledDeleteAdmin
+from .models import User, Organization, APIKey, OrganizationAPIKey
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -17,7 +18,7 @@ class CustomUserAdmin(UserAdmin):
     )
 
 @admin.register(Organization)
-class OrganizationAdmin(admin.ModelAdmin):
+class OrganizationAdmin(ScheduledDeleteAdmin):
     """Organization admin"""
     list_display = ('name', 'subscription_plan', 'is_active', 'max_users', 'created_at')
     list_filter = ('subscription_plan', 'is_active')
@@ -35,7 +36,7 @@ class OrganizationAdmin(admin.ModelAdmin):
             'fields': ('subscription_plan', 'subscription_start', 'subscription_end', 'is_active')
         }),
         ('Limits', {
-            'fields': ('max_users', 'max_conversations')
+            'fields': ('max_users', 'max_conversations', 'retention_days')
         }),
     )
 
@@ -59,4 +60,19 @@ class APIKeyAdmin(admin.ModelAdmin):
             'fields': ('last_used', 'created_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(OrganizationAPIKey)
+class OrganizationAPIKeyAdmin(admin.ModelAdmin):
+    """Organization API key admin"""
+    list_display = ('organization', 'name', 'prefix', 'user', 'is_active', 'last_used', 'created_at')
+    list_filter = ('is_active', 'organization')
+    search_fields = ('name', 'prefix')
+    readonly_fields = ('prefix', 'last_used', 'created_at')
+    ordering = ('-created_at',)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            full_key = obj.set_key()
+            messages.warning(request, f"API key for {obj.name}: {full_key} (shown only once)")
+        super().save_model(request, obj, form, change)
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import OrganizationAPIKey
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Create an API key for a user's organization and print it once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='API key')
+
+    def handle(self, *args, **options):
+        user = User.objects.select_related('organization').filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named {options['username']}")
+        if user.organization is None:
+            raise CommandError(f"{user.username} does not belong to an organization")
+        try:
+            api_key, full_key = OrganizationAPIKey.create_key(user.organization, user, options['name'])
+        except ValidationError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Created {api_key.name} for {user.organization.name}. Store this key, it is not shown again:")
+        self.stdout.write(full_key)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_organization_approval_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['approval_status'], name='org_approval_status_idx'),
+        ),
+    ]
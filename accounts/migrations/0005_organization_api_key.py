@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationAPIKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('prefix', models.CharField(editable=False, max_length=16, unique=True)),
+                ('hashed_key', models.CharField(editable=False, max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tenant_api_keys', to='accounts.organization')),
+                ('user', models.ForeignKey(help_text='Requests made with this key act as this user', on_delete=django.db.models.deletion.CASCADE, related_name='tenant_api_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Organization API Key',
+                'verbose_name_plural': 'Organization API Keys',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_organization_api_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Archive conversation data older than this many days (empty: DATA_RETENTION_DAYS; 0: keep)', null=True),
+        ),
+    ]
@@ -1,7 +1,13 @@
+import hashlib
+import secrets
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 
+from core.managers import LiveManager
+
 class User(AbstractUser):
     """Custom user model for BanglaChatPro"""
 
@@ -64,13 +70,23 @@ class Organization(models.Model):
     # Settings
     max_users = models.PositiveIntegerField(default=10)
     max_conversations = models.PositiveIntegerField(default=1000)
+    retention_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Archive conversation data older than this many days (empty: DATA_RETENTION_DAYS; 0: keep)")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the organization is deleted; purge_deleted then removes it and its data (core/purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
 
     class Meta:
         verbose_name = _('Organization')
         verbose_name_plural = _('Organizations')
+        indexes = [
+            models.Index(fields=['approval_status'], name='org_approval_status_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -107,6 +123,55 @@ class APIKey(models.Model):
         return f"{self.organization.name} - {self.name}"
 
 
+class OrganizationAPIKey(models.Model):
+    """API keys for calling the BanglaChatPro API on behalf of an organization
+
+    Keys look like ``<prefix>.<secret>``. Only the prefix and a SHA-256 hash of the
+    secret are stored; see core/authentication.py.
+    """
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='tenant_api_keys')
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='tenant_api_keys',
+                             help_text="Requests made with this key act as this user")
+    name = models.CharField(max_length=100)
+    prefix = models.CharField(max_length=16, unique=True, editable=False)
+    hashed_key = models.CharField(max_length=64, editable=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Organization API Key')
+        verbose_name_plural = _('Organization API Keys')
+
+    def __str__(self):
+        return f"{self.organization.name} - {self.name} ({self.prefix})"
+
+    def clean(self):
+        if self.user_id and self.organization_id and self.user.organization_id != self.organization_id:
+            raise ValidationError({'user': "The user must belong to the key's organization."})
+
+    @staticmethod
+    def hash_secret(secret):
+        return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+    def set_key(self):
+        """Give this key a new prefix and secret; returns the full key, which is not stored."""
+        self.prefix = secrets.token_hex(6)
+        secret = secrets.token_urlsafe(32)
+        self.hashed_key = self.hash_secret(secret)
+        return f"{self.prefix}.{secret}"
+
+    @classmethod
+    def create_key(cls, organization, user, name):
+        """Create a key; returns ``(api_key, full_key)``."""
+        api_key = cls(organization=organization, user=user, name=name)
+        api_key.clean()
+        full_key = api_key.set_key()
+        api_key.save()
+        return api_key, full_key
+
+
 class Subscription(models.Model):
     """Subscription and billing management"""
 
@@ -3,15 +3,18 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.forms import PasswordChangeForm
-from django.http import JsonResponse
+from core.http import JsonResponse
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.db.models import Avg
 from django.utils import timezone
 from .models import User, Organization
 from .forms import UserRegistrationForm, UserProfileForm
+from core.db import sharding
+from core.db.routers import read_from_replica
 from core.models import Client, BanglaConversation, CallLog
 from social_media.models import SocialMediaAccount
 
+@read_from_replica
 def client_dashboard_view(request):
     """Client dashboard view for logged-in users"""
     if not request.user.is_authenticated:
@@ -66,28 +69,28 @@ def client_dashboard_view(request):
     
     return render(request, 'accounts/client_dashboard.html', context)
 
+@read_from_replica
 def public_dashboard_view(request):
     """Public dashboard view showing platform statistics and features"""
     # Get public statistics
     stats = {
         'total_users': User.objects.count(),
-        'total_conversations': BanglaConversation.objects.count(),
-        'total_voice_calls': CallLog.objects.count(),
+        'total_conversations': sharding.count(BanglaConversation.objects.all()),
+        'total_voice_calls': sharding.count(CallLog.objects.all()),
         'total_clients': Client.objects.filter(is_active=True).count(),
-        'active_conversations': BanglaConversation.objects.filter(status='active').count(),
-        'average_rating': BanglaConversation.objects.filter(satisfaction_rating__isnull=False).aggregate(
-            avg_rating=Avg('satisfaction_rating')
-        )['avg_rating'] or 0,
+        'active_conversations': sharding.count(BanglaConversation.objects.filter(status='active')),
+        'average_rating': sharding.average(BanglaConversation.objects.all(), 'satisfaction_rating') or 0,
     }
     
     # Recent activity (public)
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
     recent_stats = {
-        'conversations_today': BanglaConversation.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count(),
-        'voice_calls_today': CallLog.objects.filter(
-            timestamp__date=timezone.now().date()
-        ).count(),
+        'conversations_today': sharding.count(BanglaConversation.objects.filter(
+            created_at__gte=today_start
+        )),
+        'voice_calls_today': sharding.count(CallLog.objects.filter(
+            timestamp__gte=today_start
+        )),
     }
     
     context = {
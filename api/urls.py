@@ -4,8 +4,9 @@ from . import views
 from .views import (
     chat_send, voice_process, rate_conversation, request_human_handoff,
     get_order_status, manage_clients, manage_intents, client_detail, intent_detail,
-    get_product_availability, get_payment_status, get_client_feature_status,
-    products_crud, product_detail
+    get_product_availability, get_products_availability_batch, get_payment_status, get_client_feature_status,
+    products_crud, product_detail, products_import, intents_import, usage_report, purge_job_status,
+    conversation_search, client_export
 )
 from rest_framework.authtoken.views import obtain_auth_token
 
@@ -23,12 +24,19 @@ urlpatterns = [
     path('handoff/', request_human_handoff, name='bangla_request_human_handoff'),
     path('orders/<int:order_id>/', get_order_status, name='bangla_get_order_status'),
     path('products/availability/', get_product_availability, name='bangla_product_availability'),
+    path('products/availability/batch/', get_products_availability_batch, name='bangla_products_availability_batch'),
+    path('products/import/', products_import, name='bangla_products_import'),
     path('products/', products_crud, name='bangla_products_crud'),
     path('products/<int:product_id>/', product_detail, name='bangla_product_detail'),
     path('payments/status/', get_payment_status, name='bangla_payment_status'),
+    path('usage/', usage_report, name='bangla_usage_report'),
+    path('search/', conversation_search, name='bangla_conversation_search'),
     path('client/features/', get_client_feature_status, name='bangla_client_feature_status'),
     path('clients/', manage_clients, name='bangla_manage_clients'),
     path('clients/<int:client_id>/', client_detail, name='bangla_client_detail'),
+    path('clients/<int:client_id>/export/<slug:kind>/', client_export, name='bangla_client_export'),
+    path('purge-jobs/<int:job_id>/', purge_job_status, name='bangla_purge_job_status'),
+    path('intents/import/', intents_import, name='bangla_intents_import'),
     path('intents/', manage_intents, name='bangla_manage_intents'),
     path('intents/<int:intent_id>/', intent_detail, name='bangla_intent_detail'),
 
@@ -1,17 +1,30 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, F
 from django.views.decorators.csrf import csrf_exempt
 import json
+from itertools import chain
 
-from core.models import Client, BanglaConversation, CallLog, BanglaIntent, Product
+from core.models import Client, BanglaConversation, CallLog, BanglaIntent, Product, PurgeJob
+from core.pagination import paginate_keyset, InvalidCursor
+from core.availability import MAX_AVAILABILITY_BATCH, get_availability, serialize_availability
+from core.retrieval import retrieve, select_snippets
+from core import metering, purge, search
+from core.runtime import get_client_runtime
+from core.db import sharding
+from core.throttling import ChatThrottle
+from core.importers import ProductImporter, IntentImporter, ImportFormatError, detect_format, iter_records
 from services.openai_service import openai_service
+from services.commerce_service import commerce_service
+from services.chat_tools import CHAT_TOOLS, ChatToolExecutor
 from accounts.models import Organization
+from chat.models import Message
+from social_media.models import SocialMediaMessage
 from rest_framework.decorators import permission_classes
 from django.contrib.auth.decorators import login_required
 
@@ -19,6 +32,7 @@ from django.contrib.auth.decorators import login_required
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required
 @permission_classes([AllowAny])  # Allow anonymous access for chat
+@throttle_classes([ChatThrottle])  # Rate limits and monthly quota; 429 + Retry-After
 def chat_send(request):
     """
     Send a message and get AI response
@@ -39,12 +53,15 @@ def chat_send(request):
         )
     
     try:
-        client = Client.objects.get(id=client_id, is_active=True)
-    except Client.DoesNotExist:
+        client = get_client_runtime(client_id)
+    except (TypeError, ValueError):
+        client = None
+    if client is None or not client.is_active:
         return Response(
             {'error': 'Client not found or inactive'}, 
             status=status.HTTP_404_NOT_FOUND
         )
+    sharding.pin(client_id=client.id)
     # Gate by organization approval if available
     org: Organization | None = getattr(request.user, 'organization', None) if request.user and request.user.is_authenticated else None
     if org and org.approval_status != 'approved':
@@ -52,7 +69,7 @@ def chat_send(request):
     
     # Get conversation history for context
     recent_conversations = BanglaConversation.objects.filter(
-        client=client,
+        client_id=client.id,
         user_name=user_name
     ).order_by('-created_at')[:5]
     
@@ -67,27 +84,37 @@ def chat_send(request):
             'content': conv.ai_response
         })
     
+    # Client knowledge relevant to this message
+    knowledge = select_snippets(retrieve(client.id, message))
+    
     # Generate AI response
     ai_result = openai_service.generate_chat_response(
         message=message,
         conversation_history=conversation_history,
         system_prompt=None,  # Let the service detect language and set appropriate prompt
-        client_name=client.name
+        client_name=client.name,
+        tools=CHAT_TOOLS,
+        tool_executor=ChatToolExecutor(client, user_name),
+        knowledge=knowledge,
+        system_prompts=client.prompts
     )
     
     # Create conversation record
     conversation = BanglaConversation.objects.create(
-        client=client,
+        client_id=client.id,
         user_name=user_name,
         user_message=message,
         ai_response=ai_result['response'],
         ai_confidence=ai_result.get('confidence', 0.0),
-        intent_detected=ai_result.get('intent', '')
+        intent_detected=ai_result.get('intent') or client.match_intent(message)
     )
+    metering.record('chats', 1, client_id=client.id, organization_id=client.organization_id)
+    metering.record('tokens', ai_result.get('tokens_used', 0), client_id=client.id,
+                    organization_id=client.organization_id)
     
     # Check if escalation is needed
     failed_responses = BanglaConversation.objects.filter(
-        client=client,
+        client_id=client.id,
         user_name=user_name,
         ai_confidence__lt=0.5
     ).count()
@@ -103,6 +130,7 @@ def chat_send(request):
         'ai_response': ai_result['response'],
         'confidence': ai_result.get('confidence', 0.0),
         'is_escalated': conversation.is_escalated,
+        'tools_used': ai_result.get('tools_used', []),
         'timestamp': conversation.created_at.isoformat()
     }
     
@@ -130,12 +158,15 @@ def voice_process(request):
         )
     
     try:
-        client = Client.objects.get(id=client_id, is_active=True)
-    except Client.DoesNotExist:
+        client = get_client_runtime(client_id)
+    except (TypeError, ValueError):
+        client = None
+    if client is None or not client.is_active:
         return Response(
             {'error': 'Client not found or inactive'}, 
             status=status.HTTP_404_NOT_FOUND
         )
+    sharding.pin(client_id=client.id)
     # Gate by organization approval
     org: Organization | None = getattr(request.user, 'organization', None) if request.user and request.user.is_authenticated else None
     if org and org.approval_status != 'approved':
@@ -158,9 +189,15 @@ def voice_process(request):
         model="tts-1"
     )
     
+    metering.record('tokens', ai_result.get('tokens_used', 0), client_id=client.id,
+                    organization_id=client.organization_id)
+    if audio_result.get('audio_url'):
+        metering.record('tts_characters', len(ai_result['response']), client_id=client.id,
+                        organization_id=client.organization_id)
+    
     # Create call log
     call_log = CallLog.objects.create(
-        client=client,
+        client_id=client.id,
         caller_name=caller_name,
         question=question,
         ai_text_response=ai_result['response'],
@@ -283,28 +320,10 @@ def request_human_handoff(request):
 @permission_classes([IsAuthenticated])
 def get_order_status(request, order_id):
     """
-    Get mock order status
+    Get order status
     GET /api/orders/<id>/
     """
-    # Mock order data
-    mock_orders = {
-        '1': {
-            'order_id': '1',
-            'status': 'প্রক্রিয়াধীন',
-            'tracking_number': 'TRK123456',
-            'estimated_delivery': '2024-01-15',
-            'items': ['পণ্য ১', 'পণ্য ২']
-        },
-        '2': {
-            'order_id': '2',
-            'status': 'ডেলিভারি হয়েছে',
-            'tracking_number': 'TRK789012',
-            'delivered_at': '2024-01-10',
-            'items': ['পণ্য ৩']
-        }
-    }
-    
-    order_data = mock_orders.get(str(order_id))
+    order_data = commerce_service.get_order_status(order_id)
     if not order_data:
         return Response(
             {'error': 'Order not found'}, 
@@ -320,28 +339,61 @@ def get_product_availability(request):
     """
     Check product availability by product_id or sku
     GET /api/products/availability?product_id=... or sku=...
-    Replace mock with real ERP/DB call.
     """
     product_id = request.GET.get('product_id')
     sku = request.GET.get('sku')
     if not (product_id or sku):
         return Response({'error': 'product_id or sku is required'}, status=400)
-    # Query real DB
-    try:
-        if sku:
-            prod = Product.objects.get(sku=sku, is_active=True)
-        else:
-            prod = Product.objects.get(sku=f'SKU-{product_id}', is_active=True)
-    except Product.DoesNotExist:
+    if sku:
+        data = get_availability([sku]).get(sku)
+    else:
+        prod = Product.objects.filter(pk=product_id, is_active=True).only(
+            'sku', 'name', 'in_stock', 'stock_qty', 'price', 'currency', 'client_id').first()
+        data = serialize_availability(prod) if prod else None
+    if data is None:
         return Response({'error': 'Product not found'}, status=404)
-    return Response({
-        'sku': prod.sku,
-        'name': prod.name,
-        'in_stock': prod.in_stock,
-        'qty': prod.stock_qty,
-        'price': str(prod.price),
-        'currency': prod.currency,
-    })
+    return Response(data)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def get_products_availability_batch(request):
+    """
+    Check availability of many products in one call
+    GET /api/products/availability/batch/?sku=A&sku=B (or skus=A,B)
+    POST /api/products/availability/batch/ {"skus": [...], "product_ids": [...]}
+    """
+    if request.method == 'POST':
+        skus = request.data.get('skus') or []
+        product_ids = request.data.get('product_ids') or []
+    else:
+        skus = request.GET.getlist('sku') + [s for s in request.GET.get('skus', '').split(',') if s]
+        product_ids = [p for p in request.GET.get('product_ids', '').split(',') if p]
+    if not isinstance(skus, list) or not isinstance(product_ids, list):
+        return Response({'error': 'skus and product_ids must be lists'}, status=400)
+    if not (skus or product_ids):
+        return Response({'error': 'skus or product_ids is required'}, status=400)
+    if len(skus) + len(product_ids) > MAX_AVAILABILITY_BATCH:
+        return Response({'error': f'At most {MAX_AVAILABILITY_BATCH} products per request'}, status=400)
+    try:
+        product_ids = [int(p) for p in product_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'product_ids must be integers'}, status=400)
+
+    found = get_availability(skus)
+    results = list(found.values())
+    not_found = [sku for sku in dict.fromkeys(str(s) for s in skus) if sku not in found]
+    if product_ids:
+        by_id = {
+            row['id']: row for row in Product.objects.filter(id__in=product_ids, is_active=True).values(
+                'id', 'sku', 'name', 'in_stock', 'stock_qty', 'price', 'currency', 'client_id')
+        }
+        for pk in dict.fromkeys(product_ids):
+            if pk in by_id:
+                results.append({'product_id': pk, **serialize_availability(by_id[pk])})
+            else:
+                not_found.append(pk)
+    return Response({'results': results, 'not_found': not_found})
 
 
 @api_view(['GET', 'POST'])
@@ -356,17 +408,14 @@ def products_crud(request):
             qs = Product.objects.filter(organization=org)
         else:
             return Response({'error': 'No organization associated with user'}, status=400)
-        data = [{
-            'id': p.id,
-            'sku': p.sku,
-            'name': p.name,
-            'price': str(p.price),
-            'currency': p.currency,
-            'in_stock': p.in_stock,
-            'qty': p.stock_qty,
-            'client_id': p.client_id,
-        } for p in qs]
-        return Response(data)
+        qs = qs.values('id', 'sku', 'name', 'price', 'currency', 'in_stock', 'client_id', qty=F('stock_qty'))
+        try:
+            rows, next_cursor = paginate_keyset(qs, request.GET)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=400)
+        for row in rows:
+            row['price'] = str(row['price'])
+        return Response({'results': rows, 'next_cursor': next_cursor})
     # POST create
     payload = request.data
     required = ['sku', 'name', 'price', 'client_id']
@@ -391,6 +440,75 @@ def products_crud(request):
     return Response({'id': prod.id, 'sku': prod.sku, 'name': prod.name}, status=201)
 
 
+def _import_records(request):
+    """
+    Return a lazy record iterator for an import request body.
+
+    Accepts a multipart upload in ``file`` or a raw CSV/NDJSON body. The format comes
+    from ``?file_format=csv|ndjson``, else the upload's name or the request content type.
+    """
+    upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+    if upload is not None:
+        fmt = request.GET.get('file_format') or detect_format(upload.content_type, upload.name)
+        lines = upload
+    else:
+        fmt = request.GET.get('file_format') or detect_format(request.content_type)
+        stream = request.stream
+        lines = iter(stream.readline, b'') if stream is not None else []
+    if fmt is None:
+        raise ImportFormatError('Could not detect import format; pass ?file_format=csv or ?file_format=ndjson')
+    return iter_records(lines, fmt)
+
+
+def _managed_clients(user):
+    """Clients ``user`` may change: all for superusers, else those of the user's organization."""
+    if user.is_superuser:
+        return Client.objects.all()
+    organization_id = getattr(user, 'organization_id', None)
+    return Client.objects.filter(organization_id=organization_id) if organization_id else Client.objects.none()
+
+
+def _client_param(request):
+    client_id = request.GET.get('client_id')
+    if not client_id:
+        return None
+    return get_object_or_404(_managed_clients(request.user), id=client_id)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def products_import(request):
+    """
+    Bulk upsert products for the user's organization
+    POST /api/products/import/?client_id=...  (CSV or NDJSON, matched on sku)
+    """
+    org = getattr(request.user, 'organization', None)
+    if not org:
+        return Response({'error': 'No organization associated with user'}, status=400)
+    try:
+        records = _import_records(request)
+        result = ProductImporter(org, client=_client_param(request),
+                                 clients=_managed_clients(request.user)).run(records)
+    except ImportFormatError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def intents_import(request):
+    """
+    Bulk upsert intents
+    POST /api/intents/import/?client_id=...  (CSV or NDJSON, matched on client + name)
+    """
+    try:
+        records = _import_records(request)
+        result = IntentImporter(client=_client_param(request), clients=_managed_clients(request.user)).run(records)
+    except ImportFormatError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(result)
+
+
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def product_detail(request, product_id):
@@ -437,19 +555,72 @@ def get_payment_status(request):
     """
     Get payment status by payment_id
     GET /api/payments/status?payment_id=...
-    Replace mock with real payment gateway or DB call.
     """
     payment_id = request.GET.get('payment_id')
     if not payment_id:
         return Response({'error': 'payment_id is required'}, status=400)
-    mock = {
-        'PMT1': { 'status': 'completed', 'amount': 1200, 'currency': 'BDT' },
-        'PMT2': { 'status': 'pending', 'amount': 850, 'currency': 'BDT' },
-    }
-    data = mock.get(payment_id)
+    data = commerce_service.get_payment_status(payment_id)
     if not data:
         return Response({'error': 'Payment not found'}, status=404)
-    return Response({ 'payment_id': payment_id, **data })
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def usage_report(request):
+    """
+    Metered usage and plan limits for billing and quota checks
+    GET /api/usage/?client_id=<id> or ?organization_id=<id>, optional start/end (YYYY-MM-DD)
+    Defaults to the current month to date.
+    """
+    from django.utils.dateparse import parse_date
+    from accounts.models import Subscription
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return Response({'error': f'{name} must be a YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Only the user's own organization and its clients; superusers see every tenant
+    own_organization = getattr(request.user, 'organization_id', None)
+    try:
+        if request.GET.get('client_id'):
+            scope = 'client'
+            tenant = _managed_clients(request.user).filter(id=int(request.GET['client_id'])).first()
+            limits_source = tenant
+        elif request.GET.get('organization_id'):
+            scope, organization_id = 'organization', int(request.GET['organization_id'])
+            tenant = None
+            if request.user.is_superuser or organization_id == own_organization:
+                tenant = Organization.objects.filter(id=organization_id).first()
+            limits_source = tenant and (Subscription.objects.filter(
+                organization=tenant, status__in=('active', 'trial')).first() or tenant)
+        else:
+            return Response({'error': 'client_id or organization_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({'error': 'client_id and organization_id must be integers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if tenant is None:
+        return Response({'error': f'{scope.capitalize()} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    start, end = metering.billing_period(dates['start'], dates['end'])
+    return Response({
+        'scope': scope,
+        'id': tenant.id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'usage': metering.get_usage(scope, tenant.id, start, end),
+        'daily': metering.get_daily_usage(scope, tenant.id, start, end),
+        'limits': {
+            'max_conversations': limits_source.max_conversations,
+            # Organizations without a subscription have no voice limit of their own
+            'max_voice_minutes': getattr(limits_source, 'max_voice_minutes', None),
+        },
+    })
 
 
 @api_view(['GET'])
@@ -475,17 +646,14 @@ def manage_clients(request):
     GET/POST /api/clients/
     """
     if request.method == 'GET':
-        clients = Client.objects.filter(is_active=True)
-        client_data = []
-        for client in clients:
-            client_data.append({
-                'id': client.id,
-                'name': client.name,
-                'domain': client.domain,
-                'contact_email': client.contact_email,
-                'is_active': client.is_active
-            })
-        return Response(client_data)
+        clients = Client.objects.filter(is_active=True).values(
+            'id', 'name', 'domain', 'contact_email', 'is_active'
+        )
+        try:
+            client_data, next_cursor = paginate_keyset(clients, request.GET)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': client_data, 'next_cursor': next_cursor})
     
     elif request.method == 'POST':
         data = request.data
@@ -503,7 +671,9 @@ def manage_clients(request):
             contact_email=data['contact_email'],
             description=data.get('description', ''),
             website=data.get('website', ''),
-            phone=data.get('phone', '')
+            phone=data.get('phone', ''),
+            # Its quotas and visibility follow the creator's organization
+            organization_id=getattr(request.user, 'organization_id', None),
         )
         
         return Response({
@@ -542,8 +712,153 @@ def client_detail(request, client_id):
             client.is_active = data['is_active']
         client.save()
         return Response({'message': 'Updated', 'id': client.id})
-    client.delete()
-    return Response(status=204)
+    # The client disappears now; its conversations, call logs and catalog are deleted in the background
+    job = purge.schedule(client, request.user)
+    return Response({'message': 'Deletion scheduled', 'purge_job': job.id}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def purge_job_status(request, job_id):
+    """
+    Progress of a background deletion
+    GET /api/purge-jobs/<id>/
+    """
+    job = get_object_or_404(PurgeJob, id=job_id)
+    return Response({
+        'id': job.id,
+        'target': job.target,
+        'object_id': job.object_id,
+        'status': job.status,
+        'rows_deleted': job.rows_deleted,
+        'current_model': job.current_model,
+        'error': job.error,
+        'finished_at': job.finished_at,
+    })
+
+
+# Searched rows: ?in= value -> (model, newest-first key, fields returned)
+SEARCHED = {
+    'messages': (Message, 'timestamp', ('id', 'conversation_id', 'sender_type', 'content', 'timestamp')),
+    'social_messages': (SocialMediaMessage, 'received_at', (
+        'id', 'conversation_id', 'social_account_id', 'sender_name', 'message_type', 'content', 'received_at')),
+    'bangla_conversations': (BanglaConversation, 'created_at', (
+        'id', 'client_id', 'user_name', 'user_message', 'ai_response', 'status', 'created_at')),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def conversation_search(request):
+    """
+    Full-text search of a tenant's conversations, newest first
+    GET /api/search/?q=<text>&in=messages|social_messages[&organization_id=<id>] (default: the user's organization)
+    GET /api/search/?q=<text>&client_id=<id> (Bangla conversations of that client)
+    """
+    text = request.GET.get('q', '').strip()
+    if not text:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    own_organization = getattr(request.user, 'organization_id', None)
+    try:
+        client_id = int(request.GET['client_id']) if request.GET.get('client_id') else None
+        organization_id = int(request.GET.get('organization_id') or own_organization or 0) or None
+    except ValueError:
+        return Response({'error': 'client_id and organization_id must be integers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if client_id is not None:
+        kind = 'bangla_conversations'
+        client = Client.objects.filter(id=client_id).only('organization_id').first()
+        if client is None or not (request.user.is_superuser or
+                                  (own_organization and client.organization_id == own_organization)):
+            return Response({'error': 'Client not found'}, status=status.HTTP_404_NOT_FOUND)
+        organization_id = client.organization_id
+        rows = BanglaConversation.objects.filter(client_id=client_id)
+    else:
+        kind = request.GET.get('in', 'messages')
+        if kind not in ('messages', 'social_messages'):
+            return Response({'error': 'in must be messages or social_messages; use client_id for Bangla conversations'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if organization_id is None:
+            return Response({'error': 'No organization associated with user'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (request.user.is_superuser or organization_id == own_organization) or \
+                not Organization.objects.filter(id=organization_id).exists():
+            return Response({'error': 'Organization not found'}, status=status.HTTP_404_NOT_FOUND)
+        model = SEARCHED[kind][0]
+        rows = model.objects.filter(**{sharding.SHARDED_MODELS[model._meta.label_lower]: organization_id})
+
+    model, key, fields = SEARCHED[kind]
+    rows = search.matching(rows.using(sharding.shard_for(organization_id, client_id)), text).values(*fields)
+    try:
+        results, next_cursor = paginate_keyset(rows, request.GET, keys=(key, 'id'), descending=True,
+                                               default_limit=20)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'in': kind, 'results': results, 'next_cursor': next_cursor})
+
+
+# Exported client data: kind in the URL -> (model, timestamp, fields left out)
+EXPORTED = {
+    'conversations': (BanglaConversation, 'created_at', ('search_terms',)),
+    'call-logs': (CallLog, 'timestamp', ()),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def client_export(request, client_id, kind):
+    """
+    Stream a client's conversations or call logs, oldest first
+    GET /api/clients/<id>/export/conversations/ or /api/clients/<id>/export/call-logs/
+    Optional: file_format=csv|ndjson|parquet (default csv), start/end (YYYY-MM-DD, inclusive),
+    include_archived=1 (rows moved to the archive come first)
+    """
+    import datetime
+    from django.utils.dateparse import parse_date
+    from core import archive, exports
+    if kind not in EXPORTED:
+        return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+    client = Client.objects.filter(id=client_id).only('organization_id').first()
+    own_organization = getattr(request.user, 'organization_id', None)
+    if client is None or not (request.user.is_superuser or
+                              (own_organization and client.organization_id == own_organization)):
+        return Response({'error': 'Client not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            day = parse_date(value) if value else None
+        except ValueError:
+            day = None
+        if value and day is None:
+            return Response({'error': f'{name} must be a YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+        if day is not None:
+            # Whole UTC days; the end day is included
+            day += datetime.timedelta(days=1 if name == 'end' else 0)
+            bounds[name] = datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+    start, end = bounds.get('start'), bounds.get('end')
+
+    model, timestamp, exclude = EXPORTED[kind]
+    columns = exports.model_columns(model, exclude=exclude)
+    rows = model.objects.using(sharding.shard_for(client.organization_id, client.id)).filter(client_id=client.id)
+    if start is not None:
+        rows = rows.filter(**{f'{timestamp}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{timestamp}__lt': end})
+    rows = exports.queryset_rows(rows.order_by(timestamp, 'id'), columns.values())
+    if request.GET.get('include_archived') in ('1', 'true'):
+        # A client of an organization is archived with the organization
+        records = archive.archived_records(
+            organization_id=client.organization_id,
+            client_id=None if client.organization_id else client.id,
+            start=start, end=end, models={model._meta.label_lower})
+        rows = chain(exports.archived_rows(model, columns.values(), records, timestamp, start, end,
+                                           client=client.id), rows)
+    try:
+        return exports.streaming_response(rows, model, columns, request.GET.get('file_format', 'csv'),
+                                          f"client-{client.id}-{kind}")
+    except exports.ExportFormatError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET', 'POST'])
@@ -561,26 +876,20 @@ def manage_intents(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            client = Client.objects.get(id=client_id)
-        except Client.DoesNotExist:
+        if not Client.objects.filter(id=client_id).exists():
             return Response(
                 {'error': 'Client not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        intents = BanglaIntent.objects.filter(client=client, is_active=True)
-        intent_data = []
-        for intent in intents:
-            intent_data.append({
-                'id': intent.id,
-                'name': intent.name,
-                'training_phrase': intent.training_phrase,
-                'ai_response_template': intent.ai_response_template,
-                'usage_count': intent.usage_count,
-                'success_rate': intent.success_rate
-            })
-        return Response(intent_data)
+        intents = BanglaIntent.objects.filter(client_id=client_id, is_active=True).values(
+            'id', 'name', 'training_phrase', 'ai_response_template', 'usage_count', 'success_rate'
+        )
+        try:
+            intent_data, next_cursor = paginate_keyset(intents, request.GET)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': intent_data, 'next_cursor': next_cursor})
     
     elif request.method == 'POST':
         data = request.data
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -59,16 +60,29 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Per-route Postgres statement timeouts (DB_STATEMENT_TIMEOUTS); unused on SQLite
+    'core.middleware.StatementTimeoutMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Django's session, CSRF, auth and message middleware, skipped on the stateless
+    # routes below; see core/middleware.py
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Tenant shard pinning; unused with a single database (DB_SHARDS)
+    'core.middleware.TenantShardMiddleware',
 ]
 
+# Routes that never use the session stack
+WEBHOOK_PATH_PREFIXES = ('/voice/twilio/', '/social/webhook/')
+# Routes that skip the session stack when the request has no session cookie
+API_PATH_PREFIXES = ('/api/',)
+# Staff pages and reports, which get the longest statement timeout
+ADMIN_PATH_PREFIXES = ('/admin/', '/admin-dashboard/')
+
 ROOT_URLCONF = 'bangla_chat_pro.urls'
 
 TEMPLATES = [
@@ -95,24 +109,146 @@ WSGI_APPLICATION = 'bangla_chat_pro.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) for development, postgres for production.
+# Postgres keeps each worker's connection open for DB_CONN_MAX_AGE seconds, checking it
+# before reuse. With DB_POOL=True it uses a psycopg 3 connection pool instead; Django
+# does not allow both. Per-route statement timeouts: DB_STATEMENT_TIMEOUTS below.
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+if DB_ENGINE == 'postgres':
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='bangla_chat_pro'),
+            'USER': config('DB_USER', default='bangla_chat'),
+            'PASSWORD': config('DB_PASSWORD', default='password'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=600, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'application_name': 'bangla_chat_pro',
+            },
+        }
+    }
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds a request waits for a free connection before failing
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        }
+elif DB_ENGINE == 'sqlite':
+    # WAL, tuned pragmas and one queued writer at a time across workers; see core/db/sqlite3
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.db.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Seconds SQLite waits for a lock held outside this app (e.g. a shell)
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=float),
+                'transaction_mode': 'IMMEDIATE',
+                'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+                'cache_size_kib': config('SQLITE_CACHE_SIZE_KIB', default=20000, cast=int),
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'sqlite' or 'postgres', not {DB_ENGINE!r}")
+
+# Read replica for dashboards and analytics (core/db/routers.py): DB_REPLICA_HOST for
+# Postgres, SQLITE_REPLICA_PATH for a second SQLite file. Views opt in with
+# @read_from_replica and fall back to the primary when the replica lags.
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+SQLITE_REPLICA_PATH = config('SQLITE_REPLICA_PATH', default='')
+if DB_ENGINE == 'postgres' and DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
     }
+elif DB_ENGINE == 'sqlite' and SQLITE_REPLICA_PATH:
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': SQLITE_REPLICA_PATH, 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICA_ALIAS = 'replica' if 'replica' in DATABASES else None
+
+# Tenant shards for conversation data (core/db/sharding.py): DB_SHARDS lists
+# alias=host (Postgres, same name and credentials as default) or alias=path (SQLite),
+# comma separated. Only append: a shard's position sets its id range. Tenants are
+# mapped in TenantShard and moved with manage.py move_tenant.
+DATABASE_SHARDS = ['default']
+for _shard in filter(None, (s.strip() for s in config('DB_SHARDS', default='').split(','))):
+    _alias, _, _location = _shard.partition('=')
+    if not _location or _alias in DATABASES:
+        raise ImproperlyConfigured(f"DB_SHARDS entries are alias=host or alias=path with a new alias, not {_shard!r}")
+    DATABASES[_alias] = {**DATABASES['default'], ('HOST' if DB_ENGINE == 'postgres' else 'NAME'): _location}
+    DATABASE_SHARDS.append(_alias)
+
+DATABASE_ROUTERS = ['core.db.sharding.TenantShardRouter', 'core.db.routers.ReplicaRouter']
+
+# Monthly partitions of the conversation tables on Postgres (core/db/partitions.py),
+# kept by manage.py manage_partitions: months created ahead, and months kept attached
+# before a partition is detached (0: never)
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=3, cast=int)
+PARTITION_RETAIN_MONTHS = config('PARTITION_RETAIN_MONTHS', default=0, cast=int)
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=10, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=5, cast=float)
+
+# Postgres statement_timeout in milliseconds per route class (0: no limit), applied by
+# core.middleware.StatementTimeoutMiddleware. Management commands run without a limit.
+DB_STATEMENT_TIMEOUTS = {
+    'webhook': config('DB_STATEMENT_TIMEOUT_WEBHOOK', default=5000, cast=int),
+    'api': config('DB_STATEMENT_TIMEOUT_API', default=10000, cast=int),
+    'page': config('DB_STATEMENT_TIMEOUT_PAGE', default=30000, cast=int),
+    'admin': config('DB_STATEMENT_TIMEOUT_ADMIN', default=120000, cast=int),
 }
 
-# Use PostgreSQL in production
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': config('DB_NAME', default='bangla_chat_pro'),
-#         'USER': config('DB_USER', default='bangla_chat'),
-#         'PASSWORD': config('DB_PASSWORD', default='password'),
-#         'HOST': config('DB_HOST', default='localhost'),
-#         'PORT': config('DB_PORT', default='5432'),
-#     }
-# }
+
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached so
+# every worker shares one cache.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='bangla-chat-pro'),
+    },
+    # Per-process session cache for core.sessions; see SESSION_BACKEND below
+    'sessions': {
+        'BACKEND': config('SESSION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('SESSION_CACHE_LOCATION', default='bangla-chat-pro-sessions'),
+        'OPTIONS': {'MAX_ENTRIES': config('SESSION_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+}
+
+# Session storage (SESSION_BACKEND):
+# - cached_db: database sessions read through the 'sessions' cache, invalidated across
+#   workers by the invalidation bus (core/sessions.py); no session query on most page loads
+# - db: Django's database sessions, one SELECT per page load
+# - signed_cookies: no server-side storage; logout cannot revoke a copied cookie, so only
+#   for deployments whose sessions hold low-privilege data such as widget state
+# Expired database sessions are removed by `python manage.py purge_expired_sessions`.
+SESSION_ENGINES = {
+    'cached_db': 'core.sessions',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[config('SESSION_BACKEND', default='cached_db')]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Product availability cache (core/availability.py), in seconds
+PRODUCT_AVAILABILITY_CACHE_TTL = config('PRODUCT_AVAILABILITY_CACHE_TTL', default=300, cast=int)
+PRODUCT_AVAILABILITY_LOCAL_TTL = config('PRODUCT_AVAILABILITY_LOCAL_TTL', default=60, cast=int)
+
+# Invalidation bus for in-process caches (core/invalidation.py). Every worker applies
+# edits made on other workers and nodes within INVALIDATION_POLL_INTERVAL seconds.
+# DatabaseBus needs no extra service; RedisBus uses pub/sub on INVALIDATION_REDIS_URL.
+INVALIDATION_BUS_BACKEND = config('INVALIDATION_BUS_BACKEND', default='core.invalidation.DatabaseBus')
+INVALIDATION_POLL_INTERVAL = config('INVALIDATION_POLL_INTERVAL', default=1.0, cast=float)
+INVALIDATION_EVENT_RETENTION = config('INVALIDATION_EVENT_RETENTION', default=3600, cast=int)
+INVALIDATION_REDIS_URL = config('INVALIDATION_REDIS_URL', default='redis://localhost:6379/0')
+INVALIDATION_REDIS_CHANNEL = config('INVALIDATION_REDIS_CHANNEL', default='bangla-chat-pro:invalidation')
 
 
 # Password validation
@@ -170,10 +306,27 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # DRF TokenAuthentication with a per-process cache; see core/authentication.py
+        'core.authentication.CachedTokenAuthentication',
+        # Organization API keys (Authorization: Api-Key <key>); replaces BasicAuthentication,
+        # which ran the password hasher on every request
+        'core.authentication.OrganizationAPIKeyAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
+    # orjson-backed JSON (raw UTF-8 output for Bangla payloads); see core/fastjson.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Client IPs for throttling come from the X-Forwarded-For entry added by this many
+    # proxies. 0 uses the socket address; set 1 behind nginx. Higher than the real number of
+    # proxies, clients can pick their own IP with a forged header.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -233,3 +386,39 @@ VOICE_API_ENDPOINT = config('VOICE_API_ENDPOINT', default='')
 # Chat settings
 MAX_CONVERSATION_LENGTH = 1000
 MAX_AI_RESPONSES_BEFORE_HANDOFF = 2
+
+# Chat tool calls (services/chat_tools.py): per-conversation result cache in seconds,
+# and threads used when the model requests several lookups at once
+CHAT_TOOL_CACHE_TTL = config('CHAT_TOOL_CACHE_TTL', default=60, cast=int)
+CHAT_TOOL_MAX_WORKERS = config('CHAT_TOOL_MAX_WORKERS', default=4, cast=int)
+
+# Anonymous /api/chat/ limits (core/ratelimit.py, core/throttling.py); 0 disables one.
+# Per IP: burst size and refill rate. Per client and per client user: requests a minute.
+# Monthly conversation quotas come from Client.max_conversations and the organization's plan.
+CHAT_RATE_IP_BURST = config('CHAT_RATE_IP_BURST', default=20, cast=int)
+CHAT_RATE_IP_PER_SECOND = config('CHAT_RATE_IP_PER_SECOND', default=0.5, cast=float)
+CHAT_RATE_CLIENT_PER_MINUTE = config('CHAT_RATE_CLIENT_PER_MINUTE', default=600, cast=int)
+CHAT_RATE_USER_PER_MINUTE = config('CHAT_RATE_USER_PER_MINUTE', default=20, cast=int)
+
+# Seconds a token's user, organization and admin permissions stay cached in each worker
+# (core/authentication.py); edits invalidate them sooner through the invalidation bus
+AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=60, cast=int)
+# Seconds between batched writes of OrganizationAPIKey.last_used
+API_KEY_LAST_USED_INTERVAL = config('API_KEY_LAST_USED_INTERVAL', default=60, cast=float)
+
+# Usage metering (core/metering.py): seconds between batched writes of in-memory counts
+USAGE_FLUSH_INTERVAL = config('USAGE_FLUSH_INTERVAL', default=5, cast=float)
+
+# Client knowledge retrieval (core/retrieval.py): per-client memory-mapped indexes,
+# top-k snippets injected into the chat prompt within a token budget
+RETRIEVAL_INDEX_DIR = config('RETRIEVAL_INDEX_DIR', default=str(BASE_DIR / 'retrieval_index'))
+RETRIEVAL_TOP_K = config('RETRIEVAL_TOP_K', default=5, cast=int)
+RETRIEVAL_TOKEN_BUDGET = config('RETRIEVAL_TOKEN_BUDGET', default=600, cast=int)
+RETRIEVAL_DENSE_DIM = config('RETRIEVAL_DENSE_DIM', default=64, cast=int)
+RETRIEVAL_DENSE_WEIGHT = config('RETRIEVAL_DENSE_WEIGHT', default=0.3, cast=float)
+
+# Conversation data retention (core/archive.py): days kept for organizations without
+# their own retention_days and for standalone clients (0: keep), and where
+# manage.py archive_conversations writes the compressed archive files
+DATA_RETENTION_DAYS = config('DATA_RETENTION_DAYS', default=0, cast=int)
+ARCHIVE_DIR = config('ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
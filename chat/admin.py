@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import FullTextSearchAdmin, ScheduledDeleteAdmin
 from .models import Conversation, Message, AIAgent, Intent, Feedback
 
 @admin.register(Conversation)
@@ -25,11 +26,13 @@ class ConversationAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
+class MessageAdmin(FullTextSearchAdmin):
     """Message admin"""
     list_display = ('id', 'conversation', 'sender_type', 'sender', 'timestamp', 'content_preview')
     list_filter = ('sender_type', 'content_type', 'timestamp')
-    search_fields = ('content', 'sender__username')
+    search_fields = Message.SEARCH_FIELDS
+    exact_search_fields = ('sender__username',)
+    search_help_text = "Finds whole words of the message, or an exact sender username."
     readonly_fields = ('id', 'timestamp')
     ordering = ('-timestamp',)
 
@@ -38,7 +41,7 @@ class MessageAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Content'
 
 @admin.register(AIAgent)
-class AIAgentAdmin(admin.ModelAdmin):
+class AIAgentAdmin(ScheduledDeleteAdmin):
     """AI Agent admin"""
     list_display = ('name', 'organization', 'status', 'model_provider', 'model_name', 'total_conversations', 'average_rating', 'created_at')
     list_filter = ('status', 'model_provider', 'organization', 'supported_languages')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_shard_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiagent',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
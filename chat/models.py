@@ -2,6 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from core.managers import LiveManager
+from core.search import Searchable
+
 class Conversation(models.Model):
     """Chat conversation model"""
 
@@ -12,19 +15,23 @@ class Conversation(models.Model):
         ('abandoned', 'Abandoned'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
-    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='conversations')
+    # Control rows live on the default database, so no constraint (core/db/sharding.py)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations',
+                             db_constraint=False)
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='conversations',
+                                     db_constraint=False)
 
     # Conversation metadata
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     title = models.CharField(max_length=255, blank=True, help_text="Auto-generated conversation title")
 
     # AI Agent assigned
-    ai_agent = models.ForeignKey('AIAgent', on_delete=models.SET_NULL, null=True, blank=True)
+    ai_agent = models.ForeignKey('AIAgent', on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
 
     # Transfer information
     transferred_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
-                                       null=True, blank=True, related_name='transferred_conversations')
+                                       null=True, blank=True, related_name='transferred_conversations',
+                                       db_constraint=False)
     transfer_reason = models.TextField(blank=True)
 
     # Timestamps
@@ -51,9 +58,11 @@ class Conversation(models.Model):
         return end_time - self.started_at
 
 
-class Message(models.Model):
+class Message(Searchable):
     """Individual message in a conversation"""
 
+    SEARCH_FIELDS = ('content',)
+
     SENDER_CHOICES = [
         ('user', 'User'),
         ('ai', 'AI Agent'),
@@ -63,7 +72,8 @@ class Message(models.Model):
 
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender_type = models.CharField(max_length=10, choices=SENDER_CHOICES)
-    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                               db_constraint=False)
 
     # Message content
     content = models.TextField()
@@ -89,6 +99,9 @@ class Message(models.Model):
         verbose_name = _('Message')
         verbose_name_plural = _('Messages')
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['conversation', 'timestamp'], name='message_conv_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender_type}: {self.content[:50]}..."
@@ -147,6 +160,10 @@ class AIAgent(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the agent is deleted; purge_deleted then removes it and its intents (core/purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
 
     class Meta:
         verbose_name = _('AI Agent')
@@ -189,7 +206,7 @@ class Feedback(models.Model):
     """User feedback on conversations"""
 
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='feedback')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
 
     # Rating and feedback
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)])  # 1-5 stars
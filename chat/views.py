@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from core.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.utils import timezone
@@ -32,7 +32,8 @@ def chat_interface(request):
         )
 
     # Get conversation history
-    messages = Message.objects.filter(conversation=conversation).order_by('timestamp')
+    messages = Message.objects.filter(conversation=conversation,
+                                      timestamp__gte=conversation.started_at).order_by('timestamp')
 
     # Get user's conversations
     conversations = Conversation.objects.filter(user=request.user).order_by('-last_message_at')[:10]
@@ -49,7 +50,8 @@ def chat_interface(request):
 def conversation_detail(request, conversation_id):
     """Conversation detail view"""
     conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
-    messages = Message.objects.filter(conversation=conversation).order_by('timestamp')
+    messages = Message.objects.filter(conversation=conversation,
+                                      timestamp__gte=conversation.started_at).order_by('timestamp')
 
     context = {
         'conversation': conversation,
@@ -1,24 +1,62 @@
 from django.contrib import admin
+from django.db.models import Q
+from . import purge, search
 from .models import (
     Client, BanglaConversation, CallLog, BanglaIntent, 
-    AdminProfile, SystemSettings, Analytics
+    AdminProfile, SystemSettings, Analytics, TenantShard, PurgeJob
 )
 
 
+class ScheduledDeleteAdmin(admin.ModelAdmin):
+    """Deleting soft-deletes the object and queues a PurgeJob (core/purge.py)."""
+
+    def get_deleted_objects(self, objs, request):
+        # Collecting every dependent row for the confirmation page is as slow as deleting them
+        objs = list(objs)
+        summary = [f"{obj} and everything that belongs to it, in the background" for obj in objs]
+        return summary, {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+
+    def delete_model(self, request, obj):
+        purge.schedule(obj, request.user)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            purge.schedule(obj, request.user)
+
+
+class FullTextSearchAdmin(admin.ModelAdmin):
+    """Searches the full-text index of a ``Searchable`` model (core/search.py) instead of LIKE scans."""
+    search_help_text = "Finds whole words; the last word may be the start of one."
+    # Lookups outside the index that match the whole search term exactly, e.g. a username
+    exact_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        found = search.matching(queryset, term)
+        if self.exact_search_fields:
+            exact = Q()
+            for lookup in self.exact_search_fields:
+                exact |= Q(**{lookup: term})
+            found = found | queryset.filter(exact)
+        return found, False
+
+
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
-    list_display = ['name', 'domain', 'contact_email', 'is_active', 'created_at']
-    list_filter = ['is_active', 'created_at']
+class ClientAdmin(ScheduledDeleteAdmin):
+    list_display = ['name', 'domain', 'contact_email', 'organization', 'is_active', 'created_at']
+    list_filter = ['is_active', 'organization', 'created_at']
     search_fields = ['name', 'domain', 'contact_email']
     list_editable = ['is_active']
     ordering = ['name']
 
 
 @admin.register(BanglaConversation)
-class BanglaConversationAdmin(admin.ModelAdmin):
+class BanglaConversationAdmin(FullTextSearchAdmin):
     list_display = ['id', 'client', 'user_name', 'status', 'is_escalated', 'satisfaction_rating', 'created_at']
     list_filter = ['status', 'is_escalated', 'client', 'created_at']
-    search_fields = ['user_name', 'user_message', 'ai_response']
+    search_fields = BanglaConversation.SEARCH_FIELDS
     readonly_fields = ['created_at']
     ordering = ['-created_at']
 
@@ -64,3 +102,35 @@ class AnalyticsAdmin(admin.ModelAdmin):
     search_fields = ['client__name']
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-date']
+
+
+@admin.register(TenantShard)
+class TenantShardAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'client', 'alias', 'state', 'updated_at']
+    list_filter = ['alias', 'state']
+    search_fields = ['organization__name', 'client__name']
+    readonly_fields = ['state', 'updated_at']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Placing a new tenant is fine; an existing one has data and moves with move_tenant
+        if obj is not None:
+            return ['organization', 'client', 'alias', 'state', 'updated_at']
+        return self.readonly_fields
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ['target', 'object_id', 'name', 'status', 'rows_deleted', 'current_model', 'updated_at']
+    list_filter = ['status', 'target']
+    search_fields = ['name']
+    readonly_fields = ['target', 'object_id', 'name', 'requested_by', 'status', 'rows_deleted', 'current_model',
+                       'error', 'created_at', 'updated_at', 'finished_at']
+
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Retry failed jobs")
+    def retry(self, request, queryset):
+        queryset.filter(status='failed').update(status='pending', error='')
@@ -5,3 +5,13 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'BanglaChatPro Core'
+
+    def ready(self):
+        # Connect cache and index invalidation receivers and the usage flush
+        from core import authentication, availability, metering, retrieval, runtime  # noqa: F401
+        from core.db import sharding
+        sharding.connect_signals(self)
+        # Migrations that rebuild a table drop its full-text triggers; put them back
+        from django.db.models.signals import post_migrate
+        from core import search
+        post_migrate.connect(search.ensure_indexes_after_migrate, sender=self)
@@ -0,0 +1,227 @@
+"""
+Retention: conversation data past its tenant's retention period moves to compressed
+NDJSON archive files.
+
+An organization keeps conversation data for ``Organization.retention_days`` days, or
+``DATA_RETENTION_DAYS`` when that is empty; standalone clients use
+``DATA_RETENTION_DAYS``. 0 keeps everything. ``manage.py archive_conversations``
+(daily) archives, in batches:
+
+- conversations idle since before the cutoff, together with everything deleting them
+  deletes (messages, feedback, voice sessions, social messages, ...);
+- older messages of conversations still in use;
+- social messages, Bangla conversations, call logs and social webhook payloads.
+
+Each batch is appended to the archive and flushed to disk, then deleted in one
+transaction. If the process dies in between, the rows stay in the database and the
+next run archives them again; restoring a row twice is harmless because rows keep
+their primary keys.
+
+Files are ``ARCHIVE_DIR/<tenant>/<YYYY-MM>/<run>.ndjson.zst`` (``.gz`` when the
+zstandard package is missing), by the UTC month of each batch root's timestamp.
+Every line is one row in Django's serialization format. ``restore`` saves rows back
+to the tenant's current shard, and ``archived_records`` streams them for exports.
+"""
+import datetime
+import decimal
+import gzip
+import io
+import logging
+import os
+import time
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.core import serializers
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+
+from core import fastjson
+from core.db import partitions, sharding
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+# Archived model -> timestamp that decides its age, in archiving order. Conversations
+# go first so their messages are archived with them.
+ARCHIVED_MODELS = {
+    'chat.conversation': 'last_message_at',
+    'chat.message': 'timestamp',
+    'social_media.socialmediamessage': 'received_at',
+    'core.banglaconversation': 'created_at',
+    'core.calllog': 'timestamp',
+}
+
+_TRUNCATED = (EOFError,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def archive_dir():
+    return getattr(settings, 'ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def tenant_key(organization_id=None, client_id=None):
+    return f"organization-{organization_id}" if organization_id is not None else f"client-{client_id}"
+
+
+def retention_days(organization=None):
+    """Days ``organization`` (None: a standalone client) keeps its data; 0 keeps it all."""
+    if organization is not None and organization.retention_days is not None:
+        return organization.retention_days
+    return getattr(settings, 'DATA_RETENTION_DAYS', 0)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ArchiveWriter:
+    """Appends batches to one run's archive files of a tenant."""
+
+    def __init__(self, organization_id=None, client_id=None, run=None):
+        self.directory = os.path.join(archive_dir(), tenant_key(organization_id, client_id))
+        self.run = run or f"{timezone.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.extension = '.ndjson.zst' if zstandard is not None else '.ndjson.gz'
+        self.paths = set()
+
+    def write(self, month, instances):
+        directory = os.path.join(self.directory, f"{month:%Y-%m}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.run + self.extension)
+        # Django's JSON serializers round times to milliseconds; rows must come back unchanged
+        data = b''.join(fastjson.dumps(row, default=_json_default) + b'\n'
+                        for row in serializers.serialize('python', instances))
+        # A complete gzip member or zstd frame per batch, so appending keeps the file readable
+        data = zstandard.ZstdCompressor().compress(data) if zstandard is not None else gzip.compress(data)
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.paths.add(path)
+        return path
+
+
+def _archive_batch(writer, month, roots, alias):
+    """Archive ``roots`` and every row deleting them deletes, then delete them all."""
+    with transaction.atomic(using=alias):
+        collector = Collector(using=alias)
+        collector.collect(roots)
+        collector.sort()
+        # Parents first, so a restore inserts them before their children
+        rows = [instance for instances in reversed(list(collector.data.values())) for instance in instances]
+        for queryset in collector.fast_deletes:
+            rows.extend(queryset)
+        writer.write(month, rows)
+        collector.delete()
+    return len(rows)
+
+
+def _archive_rows(writer, rows, field, alias, batch_size, pause):
+    archived = 0
+    while True:
+        batch = list(rows.order_by(field, 'pk')[:batch_size])
+        if not batch:
+            return archived
+        by_month = {}
+        for row in batch:
+            by_month.setdefault(partitions.month_start(getattr(row, field)), []).append(row)
+        for month, roots in by_month.items():
+            archived += _archive_batch(writer, month, roots, alias)
+        time.sleep(pause)
+
+
+def archive_tenant(days, organization_id=None, client_id=None, batch_size=200, pause=0.05, now=None):
+    """
+    Archive and delete the tenant's conversation data older than ``days`` days.
+    Returns (rows archived, files written).
+    """
+    place = sharding.placement(organization_id, client_id)
+    if place.frozen:
+        # move_tenant is copying the tenant; archive it on the next run
+        return 0, set()
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=days)
+    writer = ArchiveWriter(organization_id, client_id)
+    querysets = {model._meta.label_lower: rows for model, rows in
+                 sharding.tenant_querysets(place.alias, organization_id=organization_id, client_id=client_id)}
+    archived = 0
+    for label, field in ARCHIVED_MODELS.items():
+        if label in querysets:
+            archived += _archive_rows(writer, querysets[label].filter(**{f'{field}__lt': cutoff}),
+                                      field, place.alias, batch_size, pause)
+    if organization_id is not None:
+        from social_media.models import SocialMediaWebhook
+        webhooks = SocialMediaWebhook.objects.filter(
+            social_account__organization_id=organization_id, created_at__lt=cutoff)
+        archived += _archive_rows(writer, webhooks, 'created_at', DEFAULT_DB_ALIAS, batch_size, pause)
+    return archived, writer.paths
+
+
+def archive_files(organization_id=None, client_id=None, start=None, end=None):
+    """The tenant's archive files for months from ``start`` up to ``end``, oldest first."""
+    directory = os.path.join(archive_dir(), tenant_key(organization_id, client_id))
+    if not os.path.isdir(directory):
+        return []
+    start = partitions.month_start(start) if start is not None else None
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        try:
+            month = datetime.datetime.strptime(name, '%Y-%m').replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            continue
+        if (start is None or month >= start) and (end is None or month < end):
+            month_dir = os.path.join(directory, name)
+            paths.extend(os.path.join(month_dir, file) for file in sorted(os.listdir(month_dir)))
+    return paths
+
+
+def read_archive(path):
+    """Yield the rows of an archive file as ``{"model", "pk", "fields"}`` dicts."""
+    with open(path, 'rb') as f:
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise ImproperlyConfigured(f"Reading {path} needs the zstandard package")
+            stream = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        else:
+            stream = gzip.GzipFile(fileobj=f)
+        try:
+            for line in io.TextIOWrapper(stream, encoding='utf-8'):
+                if line.strip():
+                    yield fastjson.loads(line)
+        except _TRUNCATED:
+            # The last batch was being written when the process stopped; its rows were
+            # not deleted and are in a later run's file
+            logger.warning(f"{path} ends in an incomplete batch; skipped it")
+
+
+def archived_records(organization_id=None, client_id=None, start=None, end=None, models=None):
+    """Stream the tenant's archived rows, optionally only those of ``models`` (labels)."""
+    for path in archive_files(organization_id, client_id, start, end):
+        for record in read_archive(path):
+            if models is None or record['model'] in models:
+                yield record
+
+
+def restore(path, organization_id=None, client_id=None, batch_size=500):
+    """Save the rows of archive ``path`` back with their primary keys; returns the row count."""
+    alias = sharding.shard_for(organization_id, client_id)
+    records = read_archive(path)
+    restored = 0
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return restored
+        with transaction.atomic(using=alias), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            for row in serializers.deserialize('python', batch):
+                row.save(using=alias if sharding.is_sharded(type(row.object)) else DEFAULT_DB_ALIAS)
+        restored += len(batch)
@@ -0,0 +1,321 @@
+"""
+Cached API token authentication and admin permission resolution.
+
+``CachedTokenAuthentication`` replaces DRF's ``TokenAuthentication``. On the first
+request for a token it loads the token, user, organization and ``AdminProfile``
+in one query. The result is kept in process memory for ``AUTH_CACHE_TTL``
+seconds (default 60). Later requests with that token rebuild ``request.user``
+from memory, with ``user.organization`` and the admin permissions already
+attached. The token check, the organization approval check and the permission
+lookup then cost no queries.
+
+``OrganizationAPIKeyAuthentication`` accepts tenant API keys
+(``Authorization: Api-Key <prefix>.<secret>``, see ``accounts.OrganizationAPIKey``).
+The key is looked up by its prefix, and the SHA-256 of the secret is compared with
+``hmac.compare_digest``. Keys are long random strings, so a fast hash is enough and
+no password hasher runs on the API path. Verified keys are cached the same way as
+tokens. ``last_used`` is kept in memory and written in one batched update at most
+every ``API_KEY_LAST_USED_INTERVAL`` seconds (default 60).
+
+``get_admin_permissions`` caches the role and permissions of session users the
+same way.
+
+Entries are dropped through ``core.invalidation``, so every worker drops them
+within the bus poll interval. This happens when:
+- a token or API key is created, saved or deleted;
+- a user or their ``AdminProfile`` is saved or deleted;
+- an organization is saved, for example on an approval change.
+"""
+import atexit
+import hashlib
+import hmac
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Organization, OrganizationAPIKey
+from core import invalidation
+from core.models import AdminProfile
+
+logger = logging.getLogger(__name__)
+
+
+MAX_ENTRIES = 10000
+
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff',
+               'is_superuser', 'is_admin', 'organization_id', 'language')
+ORGANIZATION_FIELDS = ('id', 'name', 'is_active', 'approval_status', 'subscription_plan')
+
+ROLE_LABELS = {
+    'super_admin': 'Super Admin',
+    'admin': 'Admin',
+    'moderator': 'Moderator',
+}
+PERMISSIONS = ('can_manage_clients', 'can_manage_intents', 'can_view_analytics', 'can_handle_escalations')
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_CACHE_TTL', 60)
+
+
+def admin_permissions(user, profile):
+    """Role label and permission flags for ``user`` given its ``AdminProfile`` (or None)."""
+    if not user.is_authenticated:
+        return 'User', dict.fromkeys(PERMISSIONS, False)
+    if user.is_superuser:
+        return 'Super Admin', dict.fromkeys(PERMISSIONS, True)
+    if profile is None:
+        return 'User', dict.fromkeys(PERMISSIONS, False)
+    return ROLE_LABELS.get(profile.role, 'User'), {name: bool(getattr(profile, name)) for name in PERMISSIONS}
+
+
+class _Entries:
+    """Per-process ``key -> (expires, user_id, organization_id, value)`` with drop by user/org."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[3]
+
+    def set(self, key, user_id, organization_id, value):
+        with self._lock:
+            if len(self._data) >= MAX_ENTRIES:
+                self._data.clear()
+            self._data[key] = (time.monotonic() + _ttl(), user_id, organization_id, value)
+
+    def drop(self, user_id=None, organization_id=None):
+        with self._lock:
+            if user_id is None and organization_id is None:
+                self._data.clear()
+                return
+            for key in [key for key, (_, uid, oid, _) in self._data.items()
+                        if (user_id is not None and uid == user_id)
+                        or (organization_id is not None and oid == organization_id)]:
+                del self._data[key]
+
+
+_tokens = _Entries()
+_api_keys = _Entries()
+_permissions = _Entries()
+
+
+def _token_hash(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _snapshot(user, organization):
+    profile = getattr(user, 'admin_profile', None)
+    return (
+        {name: getattr(user, name) for name in USER_FIELDS},
+        {name: getattr(organization, name) for name in ORGANIZATION_FIELDS} if organization else None,
+        admin_permissions(user, profile),
+    )
+
+
+def _partial_instance(model, values):
+    # from_db() takes values in model field order; fields not given stay deferred, load
+    # on access, and are left out of save()
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db('default', names, [values[name] for name in names])
+
+
+def _restore_user(snapshot):
+    user_values, organization_values, permissions = snapshot
+    User = get_user_model()
+    user = _partial_instance(User, user_values)
+    organization = _partial_instance(Organization, organization_values) if organization_values else None
+    User._meta.get_field('organization').set_cached_value(user, organization)
+    role_label, perms = permissions
+    user._admin_permissions = (role_label, dict(perms))
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` served from a per-process cache after the first request."""
+
+    def authenticate_credentials(self, key):
+        invalidation.sync()
+        token_hash = _token_hash(key)
+        snapshot = _tokens.get(token_hash)
+        if snapshot is None:
+            try:
+                token = Token.objects.select_related('user__organization', 'user__admin_profile').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            snapshot = _snapshot(token.user, token.user.organization)
+            _tokens.set(token_hash, token.user_id, token.user.organization_id, snapshot)
+        user = _restore_user(snapshot)
+        token = Token(key=key, user=user)
+        token._state.adding = False
+        return user, token
+
+
+class OrganizationAPIKeyAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Api-Key <prefix>.<secret>`` for ``OrganizationAPIKey``.
+
+    ``request.user`` is the key's user with ``organization`` set to the key's
+    organization; ``request.auth`` is the key (only ``id``, ``prefix``,
+    ``organization_id`` and ``user_id`` are loaded).
+    """
+
+    keyword = 'Api-Key'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+        try:
+            prefix, secret = auth[1].decode().split('.', 1)
+        except (UnicodeError, ValueError):
+            raise exceptions.AuthenticationFailed('Invalid API key.')
+        return self.authenticate_credentials(prefix, secret)
+
+    def authenticate_credentials(self, prefix, secret):
+        invalidation.sync()
+        cached = _api_keys.get(prefix)
+        if cached is None:
+            api_key = (OrganizationAPIKey.objects
+                       .select_related('organization', 'user__admin_profile')
+                       .filter(prefix=prefix, is_active=True).first())
+            if api_key is None or not api_key.user.is_active:
+                # Same cost as a wrong secret, so prefixes cannot be probed by timing
+                hmac.compare_digest(OrganizationAPIKey.hash_secret(secret), '0' * 64)
+                raise exceptions.AuthenticationFailed('Invalid API key.')
+            cached = (api_key.id, api_key.organization_id, api_key.user_id, api_key.hashed_key,
+                      _snapshot(api_key.user, api_key.organization))
+            _api_keys.set(prefix, api_key.user_id, api_key.organization_id, cached)
+        key_id, organization_id, user_id, hashed_key, snapshot = cached
+        if not hmac.compare_digest(OrganizationAPIKey.hash_secret(secret), hashed_key):
+            raise exceptions.AuthenticationFailed('Invalid API key.')
+        _mark_used(key_id)
+        user = _restore_user(snapshot)
+        api_key = _partial_instance(OrganizationAPIKey, {
+            'id': key_id, 'organization_id': organization_id, 'user_id': user_id, 'prefix': prefix})
+        return user, api_key
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# last_used, batched
+
+# key id -> time of the latest request with that key
+_last_used = {}
+_last_used_lock = threading.Lock()
+_last_used_flushed = time.monotonic()
+# Database the pending times were recorded against
+_last_used_database = None
+
+
+def _mark_used(key_id):
+    global _last_used_database
+    with _last_used_lock:
+        _last_used[key_id] = timezone.now()
+        _last_used_database = connection.settings_dict.get('NAME')
+
+
+def flush_last_used():
+    """Write pending ``last_used`` times in one update; returns the number of keys written."""
+    global _last_used_flushed
+    with _last_used_lock:
+        batch = dict(_last_used)
+        _last_used.clear()
+        _last_used_flushed = time.monotonic()
+    if not batch:
+        return 0
+    keys = [OrganizationAPIKey(id=key_id, last_used=used) for key_id, used in batch.items()]
+    try:
+        # Saves through the ORM would invalidate the key caches on every flush
+        OrganizationAPIKey.objects.bulk_update(keys, ['last_used'])
+    except Exception as e:
+        logger.error(f"API key last_used flush failed for {len(batch)} keys: {str(e)}")
+        return 0
+    return len(batch)
+
+
+@receiver(request_finished, dispatch_uid='api_key_last_used_flush_after_request')
+def _flush_last_used_after_request(sender, **kwargs):
+    if _last_used and time.monotonic() - _last_used_flushed >= getattr(settings, 'API_KEY_LAST_USED_INTERVAL', 60):
+        flush_last_used()
+
+
+@atexit.register
+def _flush_last_used_at_exit():
+    # See metering._flush_at_exit
+    if _last_used and connection.settings_dict.get('NAME') == _last_used_database:
+        flush_last_used()
+
+
+def get_admin_permissions(user):
+    """``(role_label, permissions)`` for ``user``, cached per process."""
+    cached = getattr(user, '_admin_permissions', None)
+    if cached is not None:
+        return cached[0], dict(cached[1])
+    if not user.is_authenticated or user.is_superuser:
+        return admin_permissions(user, None)
+    invalidation.sync()
+    cached = _permissions.get(user.pk)
+    if cached is None:
+        cached = admin_permissions(user, AdminProfile.objects.filter(user_id=user.pk).first())
+        _permissions.set(user.pk, user.pk, None, cached)
+    return cached[0], dict(cached[1])
+
+
+# Invalidation
+
+def _drop_user(key):
+    user_id = None if key is None else int(key)
+    _tokens.drop(user_id=user_id)
+    _api_keys.drop(user_id=user_id)
+    _permissions.drop(user_id=user_id)
+
+
+def _drop_organization(key):
+    organization_id = None if key is None else int(key)
+    _tokens.drop(organization_id=organization_id)
+    _api_keys.drop(organization_id=organization_id)
+
+
+invalidation.subscribe('auth.user', _drop_user)
+invalidation.subscribe('auth.organization', _drop_organization)
+
+
+@receiver([post_save, post_delete], sender=Token, dispatch_uid='auth_cache_token_changed')
+@receiver([post_save, post_delete], sender=AdminProfile, dispatch_uid='auth_cache_admin_profile_changed')
+@receiver([post_save, post_delete], sender=OrganizationAPIKey, dispatch_uid='auth_cache_api_key_changed')
+def _user_child_changed(sender, instance, **kwargs):
+    invalidation.publish('auth.user', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL, dispatch_uid='auth_cache_user_changed')
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which is not cached
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidation.publish('auth.user', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Organization, dispatch_uid='auth_cache_organization_changed')
+def _organization_changed(sender, instance, **kwargs):
+    invalidation.publish('auth.organization', instance.pk)
@@ -0,0 +1,180 @@
+"""
+Read-through cache of product availability keyed by SKU.
+
+Lookups go through two layers before touching the database: a small per-process
+LRU of hot SKUs (``PRODUCT_AVAILABILITY_LOCAL_TTL`` seconds, default 60) and the
+shared Django cache (``PRODUCT_AVAILABILITY_CACHE_TTL`` seconds, default 300).
+Whatever is still missing is read with one ``sku IN (...)`` query. Unknown or
+inactive SKUs are cached too, so polling for a SKU that does not exist stays cheap.
+
+Entries are dropped on ``Product`` save/delete, for the old SKU too when it was
+renamed, and on ``catalog_imported``. Code
+that changes stock with ``QuerySet.update()`` must call ``invalidate_availability``.
+Other processes drop their local copy through ``core.invalidation``; the local TTL
+only bounds staleness if the bus is unavailable.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import invalidation
+from core.models import Product
+from core.signals import catalog_imported
+
+
+MAX_AVAILABILITY_BATCH = 500
+LOCAL_MAX_ENTRIES = 2048
+
+# Cached value for a SKU with no active product
+NOT_FOUND = {}
+
+_FIELDS = ('sku', 'name', 'in_stock', 'stock_qty', 'price', 'currency', 'client_id')
+
+
+def _cache_key(sku):
+    return f'availability:{sku}'
+
+
+def _ttl():
+    return getattr(settings, 'PRODUCT_AVAILABILITY_CACHE_TTL', 300)
+
+
+def _local_ttl():
+    return getattr(settings, 'PRODUCT_AVAILABILITY_LOCAL_TTL', 60)
+
+
+class _HotCache:
+    """Thread-safe LRU with a per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires, value = item
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, ttl):
+        expires = time.monotonic() + ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_hot = _HotCache(LOCAL_MAX_ENTRIES)
+
+
+def _drop_local(sku):
+    if sku is None:
+        _hot.clear()
+    else:
+        _hot.delete_many([sku])
+
+
+invalidation.subscribe('availability', _drop_local)
+
+
+def serialize_availability(row):
+    """API payload for one product row (a model instance or a ``values()`` dict)."""
+    get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+    return {
+        'sku': get('sku'),
+        'name': get('name'),
+        'in_stock': get('in_stock'),
+        'qty': get('stock_qty'),
+        'price': str(get('price')),
+        'currency': get('currency'),
+        'client_id': get('client_id'),
+    }
+
+
+def get_availability(skus):
+    """
+    Return ``{sku: payload}`` for the active products among ``skus``.
+
+    SKUs without an active product are left out of the result.
+    """
+    invalidation.sync()
+    skus = list(dict.fromkeys(str(sku) for sku in skus))
+    found = _hot.get_many(skus)
+
+    missing = [sku for sku in skus if sku not in found]
+    if missing:
+        shared = cache.get_many([_cache_key(sku) for sku in missing])
+        from_shared = {sku: shared[_cache_key(sku)] for sku in missing if _cache_key(sku) in shared}
+        found.update(from_shared)
+        _hot.set_many(from_shared, _local_ttl())
+
+        missing = [sku for sku in missing if sku not in from_shared]
+    if missing:
+        from_db = {sku: NOT_FOUND for sku in missing}
+        for row in Product.objects.filter(sku__in=missing, is_active=True).values(*_FIELDS):
+            from_db[row['sku']] = serialize_availability(row)
+        cache.set_many({_cache_key(sku): value for sku, value in from_db.items()}, _ttl())
+        _hot.set_many(from_db, _local_ttl())
+        found.update(from_db)
+
+    return {sku: found[sku] for sku in skus if found[sku]}
+
+
+def _delete_shared(skus):
+    cache.delete_many([_cache_key(sku) for sku in skus])
+
+
+def invalidate_availability(skus):
+    """Drop cached availability now and again on commit, so a read racing the
+    write cannot leave the old row cached, and on every other process."""
+    skus = [str(sku) for sku in skus]
+    _delete_shared(skus)
+    transaction.on_commit(lambda: _delete_shared(skus))
+    invalidation.publish_many('availability', skus)
+
+
+@receiver(pre_save, sender=Product, dispatch_uid='availability_product_saving')
+def _product_saving(sender, instance, **kwargs):
+    # A renamed SKU leaves its old entry behind unless that is dropped too
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_sku = Product.objects.filter(pk=instance.pk).values_list('sku', flat=True).first()
+
+
+@receiver(post_save, sender=Product, dispatch_uid='availability_product_saved')
+@receiver(post_delete, sender=Product, dispatch_uid='availability_product_deleted')
+def _product_changed(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_sku', None)
+    invalidate_availability({instance.sku, previous} - {None})
+
+
+@receiver(catalog_imported, sender=Product, dispatch_uid='availability_catalog_imported')
+def _catalog_imported(sender, keys=(), **kwargs):
+    invalidate_availability([sku for (sku,) in keys])
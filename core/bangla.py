@@ -0,0 +1,156 @@
+"""
+Bangla/English text normalization and tokenization, shared by cache keys, intent
+matching, handoff triggers, auto-reply keywords, the retrieval index and full-text
+search.
+
+The same Bangla text arrives in several encodings: nukta letters precomposed (ড়,
+U+09DC) or as letter + nukta (ড + ়), with or without zero-width joiners, with Bangla
+or ASCII digits and with assorted quotes, dashes and repeated punctuation. A
+``Normalizer`` maps them all to one string:
+
+1. NFC. For the nukta letters that is letter + nukta, since Unicode excludes
+   U+09DC, U+09DD and U+09DF from composition.
+2. One ``str.translate`` pass with a table built once: Bangla digits to ASCII, ZWJ
+   and ZWNJ dropped (``joiners='drop'``), soft hyphens and word joiners removed,
+   quote and dash variants folded to ASCII, and Latin letters case folded.
+3. Runs of one punctuation mark collapsed to one, and whitespace runs to one space.
+
+``normalize``/``normalize_many`` use the defaults. ``tokenize`` splits normalized
+text into lightly stemmed terms without stopwords. The module imports no models, so
+models can use it. ``manage.py bench_normalizer`` measures throughput.
+"""
+import hashlib
+import re
+import string
+import unicodedata
+
+
+_BANGLA_DIGITS = '০১২৩৪৫৬৭৮৯'
+_JOINERS = '\u200c\u200d'  # ZWNJ, ZWJ
+# Soft hyphen, word joiner
+_INVISIBLE = '\u00ad\u2060'
+_FOLDED_PUNCTUATION = {
+    '\u200b': ' ',  # zero-width space
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'", '\u2032': "'", '`': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"', '\u2033': '"', '\u00ab': '"', '\u00bb': '"',
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-', '\u2015': '-', '\u2212': '-',
+    '\u2026': '...', '\u0965': '।',  # ellipsis; double danda to danda
+}
+# Punctuation whose repeats are collapsed ("!!!" -> "!", "।।" -> "।")
+_PUNCTUATION = string.punctuation + '।'
+_REPEATED_PUNCTUATION = re.compile('([' + re.escape(_PUNCTUATION) + r'])\1+')
+
+
+def _latin_casefold():
+    # Basic Latin through Latin Extended-B
+    folded = {}
+    for code in range(0x41, 0x250):
+        char = chr(code)
+        if char.casefold() != char:
+            folded[code] = char.casefold()
+    return folded
+
+
+class Normalizer:
+    """
+    Normalizes text for comparison. The options are fixed when it is created, which
+    builds the translation table once.
+
+    ``joiners`` is ``'drop'`` (ZWJ/ZWNJ removed, for matching) or ``'keep'`` (they
+    decide how conjuncts are drawn, for text shown back to people). ``collapse``
+    controls step 3, which tokenizers can skip.
+    """
+
+    def __init__(self, joiners='drop', fold_digits=True, casefold=True, collapse=True):
+        if joiners not in ('drop', 'keep'):
+            raise ValueError(f"joiners must be 'drop' or 'keep', not {joiners!r}")
+        mapping = dict.fromkeys(map(ord, _INVISIBLE))
+        mapping.update((ord(char), folded) for char, folded in _FOLDED_PUNCTUATION.items())
+        if joiners == 'drop':
+            mapping.update(dict.fromkeys(map(ord, _JOINERS)))
+        if fold_digits:
+            mapping.update(str.maketrans(_BANGLA_DIGITS, '0123456789'))
+        if casefold:
+            mapping.update(_latin_casefold())
+        # str.translate() indexes a list about twice as fast as it looks up a dict.
+        # Characters past the end raise IndexError, which leaves them unchanged.
+        self.table = [mapping.get(code, chr(code)) for code in range(max(mapping) + 1)]
+        self.collapse = collapse
+
+    def __call__(self, text):
+        if not text:
+            return ''
+        if not text.isascii():
+            # Returns ``text`` itself when it already is NFC
+            text = unicodedata.normalize('NFC', text)
+        text = text.translate(self.table)
+        if self.collapse:
+            # Searching is much cheaper than substituting, and most text has no repeats
+            if _REPEATED_PUNCTUATION.search(text):
+                text = _REPEATED_PUNCTUATION.sub(r'\1', text)
+            text = ' '.join(text.split())
+        return text
+
+    def normalize_many(self, texts):
+        """Normalize each of ``texts``; returns a list in the same order."""
+        nfc, table, collapse = unicodedata.normalize, self.table, self.collapse
+        repeated, collapse_repeated = _REPEATED_PUNCTUATION.search, _REPEATED_PUNCTUATION.sub
+        result = []
+        append = result.append
+        for text in texts:
+            if not text:
+                append('')
+                continue
+            if not text.isascii():
+                text = nfc('NFC', text)
+            text = text.translate(table)
+            if collapse:
+                if repeated(text):
+                    text = collapse_repeated(r'\1', text)
+                text = ' '.join(text.split())
+            append(text)
+        return result
+
+
+normalize = Normalizer()
+normalize_many = normalize.normalize_many
+
+
+def key_digest(text):
+    """Digest of ``text`` for cache and rate-limit keys: equal for equivalent spellings."""
+    return hashlib.sha1(normalize(str(text)).encode('utf-8')).hexdigest()
+
+
+# Tokenization
+
+_TOKEN_RE = re.compile(r'[0-9a-z\u0980-\u09ff]+')
+# The token pattern drops punctuation and whitespace anyway
+_for_tokens = Normalizer(collapse=False)
+# Common Bangla inflections (plural, classifier, case markers), longest first
+_SUFFIXES = sorted(
+    (unicodedata.normalize('NFC', s) for s in (
+        'গুলোতে', 'গুলোর', 'গুলো', 'গুলি', 'দের', 'টিতে', 'টির', 'টার', 'টি', 'টা',
+        'েরা', 'য়ের', 'ের', 'কে', 'তে',
+    )),
+    key=len, reverse=True,
+)
+STOPWORDS = frozenset(unicodedata.normalize('NFC', w) for w in (
+    'এবং', 'ও', 'কি', 'কী', 'আমি', 'আমার', 'আপনি', 'আপনার', 'এই', 'সেই', 'যে', 'না',
+    'হয়', 'করে', 'জন্য', 'থেকে', 'আছে', 'একটি', 'তার', 'কোন', 'কোনো',
+    'a', 'an', 'and', 'are', 'do', 'does', 'for', 'how', 'i', 'in', 'is', 'it', 'me',
+    'my', 'of', 'on', 'or', 'the', 'this', 'that', 'to', 'what', 'you', 'your',
+))
+
+
+def _stem(token):
+    if token.isascii():
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Split Bangla/English text into normalized, lightly stemmed terms."""
+    return [_stem(token) for token in _TOKEN_RE.findall(_for_tokens(text)) if token not in STOPWORDS]
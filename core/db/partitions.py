@@ -0,0 +1,217 @@
+"""
+Monthly range partitioning of the append-only conversation tables on PostgreSQL.
+
+``BanglaConversation``, ``chat.Message``, ``CallLog`` and ``SocialMediaMessage`` are
+partitioned by the month of their creation timestamp (``PARTITIONED_MODELS``). Months
+are UTC, like the usage quotas, and each one is a partition named ``<table>_pYYYYMM``.
+A query that filters on the timestamp only scans the months it covers, and
+``ORDER BY <timestamp> DESC LIMIT n`` reads the newest partitions first.
+
+Migration ``core.0009`` converts the existing tables without copying rows: the old
+table becomes the partition ``<table>_plegacy`` for everything before next month. The
+``<table>_pdefault`` partition takes rows that fall outside every month, so inserts
+never fail if the daily ``manage.py manage_partitions`` job stops. That job creates the
+coming months, moves rows out of the default partition into them, and detaches months
+older than ``PARTITION_RETAIN_MONTHS``. Detached partitions stay as plain tables until
+they are archived or dropped.
+
+Django is unaffected, with two limits. PostgreSQL requires the partition key in the
+primary key, so the key is ``(id, <timestamp>)``; ``id`` stays unique because every
+partition draws it from the parent's sequence. Foreign keys to a partitioned table
+have no database constraint. SQLite tables are never partitioned.
+"""
+import datetime
+import re
+
+from django.apps import apps
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+
+# Partitioned model -> the timestamp field it is partitioned by
+PARTITIONED_MODELS = {
+    'core.banglaconversation': 'created_at',
+    'core.calllog': 'timestamp',
+    'chat.message': 'timestamp',
+    'social_media.socialmediamessage': 'received_at',
+}
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(value):
+    """Start of the UTC month containing ``value``."""
+    return value.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_key(model, connection):
+    """Column ``model``'s table is partitioned by on ``connection``; None if it is not."""
+    field = PARTITIONED_MODELS.get(model._meta.label_lower)
+    if field is None or connection.vendor != 'postgresql':
+        return None
+    return model._meta.get_field(field).column
+
+
+def partitioned_tables(app_registry=apps):
+    """(table, column) of each partitioned model in ``app_registry``."""
+    for label, field in PARTITIONED_MODELS.items():
+        model = app_registry.get_model(label)
+        yield model._meta.db_table, model._meta.get_field(field).column
+
+
+def _parse_bound(value):
+    if value == 'MINVALUE':
+        return None
+    return datetime.datetime.fromisoformat(value.strip("'"))
+
+
+def partitions(connection, table):
+    """
+    (name, lower, upper) of ``table``'s partitions, oldest first. ``lower`` is None
+    for a partition without a lower bound; both are None for the default partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass", [table])
+        rows = cursor.fetchall()
+    result = []
+    for name, bound in rows:
+        match = _BOUND.search(bound)
+        if match is None:  # FOR VALUES DEFAULT
+            result.append((name, None, None))
+        else:
+            result.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    epoch = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    return sorted(result, key=lambda p: (p[2] is None, p[1] or epoch))
+
+
+def _is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])
+        return cursor.fetchone()[0] == 'p'
+
+
+def partition_table(connection, table, column, ahead=3, now=None):
+    """
+    Turn ``table`` into a table partitioned by month of ``column``. Its rows become the
+    legacy partition; ``ahead`` months after the current one are created empty.
+    """
+    if _is_partitioned(connection, table):
+        return
+    qn = connection.ops.quote_name
+    legacy = f"{table}_plegacy"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid), x.indisprimary FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid WHERE x.indrelid = %s::regclass", [table])
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+        last_value, is_called = cursor.fetchone()
+        cursor.execute(f"SELECT MAX({qn(column)}) FROM {qn(table)}")
+        latest = cursor.fetchone()[0]
+
+        # The legacy partition ends after the current month, or after its newest row
+        boundary = add_months(month_start(now or timezone.now()), 1)
+        if latest is not None and latest >= boundary:
+            boundary = add_months(month_start(latest), 1)
+
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        for name, _, _ in indexes:
+            cursor.execute(f"ALTER INDEX {qn(name)} RENAME TO {qn(name[:55] + '_plegacy')}")
+        cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+                       [legacy])
+        if cursor.fetchone()[0]:
+            cursor.execute(f"ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP IDENTITY")
+        else:
+            cursor.execute(f"ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP DEFAULT")
+            cursor.execute(f"DROP SEQUENCE {sequence}")
+
+        cursor.execute(f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                       f"PARTITION BY RANGE ({qn(column)})")
+        # One sequence for every partition keeps id unique; it continues where the
+        # old one stopped, which may be a shard's reserved range
+        sequence = f"{table}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id")
+        cursor.execute("SELECT setval(%s, %s, %s)", [sequence, last_value, is_called])
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{qn(sequence)}'::regclass)")
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(column)})")
+        # The definitions name the original table, which is now the parent
+        for name, definition, primary in indexes:
+            if not primary:
+                cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(legacy)} "
+                       f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')")
+        cursor.execute(f"CREATE TABLE {qn(table + '_pdefault')} PARTITION OF {qn(table)} DEFAULT")
+    ensure_partitions(connection, table, column, ahead, now=add_months(boundary, -1))
+
+
+def ensure_partitions(connection, table, column, ahead, now=None):
+    """
+    Create the partitions of the current month and the ``ahead`` months after it that
+    no partition covers yet, moving their rows out of the default partition. Returns
+    (name, rows moved) for each one created.
+    """
+    qn = connection.ops.quote_name
+    existing = partitions(connection, table)
+    default = next((name for name, lower, upper in existing if upper is None), None)
+    first = month_start(now or timezone.now())
+    created = []
+    for offset in range(ahead + 1):
+        lower = add_months(first, offset)
+        upper = add_months(lower, 1)
+        if any(end is not None and (start is None or start < upper) and lower < end
+               for _, start, end in existing):
+            continue
+        name = partition_name(table, lower)
+        moved = 0
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            if default is not None:
+                # Attaching fails while the default partition holds rows of the new range
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(column)} >= %s AND {qn(column)} < %s "
+                    f"RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved", [lower, upper])
+                moved = cursor.rowcount
+            cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} "
+                           f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')")
+        created.append((name, moved))
+    return created
+
+
+def detach_partitions(connection, table, before, lock_timeout='5s'):
+    """
+    Detach the partitions of ``table`` that end on or before ``before``. Detaching
+    briefly locks the table; a partition whose lock is not granted within
+    ``lock_timeout`` is left for the next run. Returns the names detached.
+    """
+    qn = connection.ops.quote_name
+    detached = []
+    for name, lower, upper in partitions(connection, table):
+        if upper is None or upper > before:
+            continue
+        try:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+        except OperationalError:
+            continue
+        detached.append(name)
+    return detached
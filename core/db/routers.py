@@ -0,0 +1,155 @@
+"""
+Read-replica routing for dashboard and analytics views.
+
+Views opt in with ``@read_from_replica``. While such a view runs, its reads go to the
+``DATABASE_REPLICA_ALIAS`` database. Writes, reads inside a transaction and
+``PRIMARY_ONLY_MODELS`` stay on the primary. Without a replica alias configured, the
+decorator does nothing.
+
+Replication lag is measured through ``ReplicaHeartbeat``. Every
+``REPLICA_LAG_CHECK_INTERVAL`` seconds (default 5), each process compares the
+replica's copy of the heartbeat row with the primary's, then writes a new time to the
+primary if its heartbeat is older than the interval. If the copy is more than
+``REPLICA_MAX_LAG`` seconds behind (default 10), or the replica cannot be read, reads
+go to the primary until the next check. This works for any replication that
+copies the table, including a second SQLite file refreshed with ``sqlite3 .backup``.
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+# Models read right after being written by the same user, or used for coordination
+PRIMARY_ONLY_MODELS = {'sessions.session', 'authtoken.token', 'core.invalidationevent', 'core.replicaheartbeat'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+def _heartbeat_table():
+    from core.models import ReplicaHeartbeat
+    return ReplicaHeartbeat._meta.db_table
+
+
+def write_heartbeat(connection, now=None):
+    """Record ``now`` in the heartbeat row of ``connection`` (the primary)."""
+    table = connection.ops.quote_name(_heartbeat_table())
+    now = time.time() if now is None else now
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET written_at = %s WHERE id = 1", [now])
+        if not cursor.rowcount:
+            cursor.execute(f"INSERT INTO {table} (id, written_at) VALUES (1, %s)", [now])
+    return now
+
+
+def read_heartbeat(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT written_at FROM {connection.ops.quote_name(_heartbeat_table())} WHERE id = 1")
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def replica_lag(primary, replica):
+    """
+    Seconds the replica trails the primary: how far its heartbeat is behind the
+    primary's current one, to within the check interval. A replica that has caught up
+    reports 0 however long the primary has been idle. None when either has no
+    heartbeat yet.
+    """
+    written = read_heartbeat(primary)
+    copied = read_heartbeat(replica)
+    now = time.time()
+    # Compared before writing: a fresh heartbeat cannot have reached the replica yet
+    if written is None or now - written >= getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5):
+        write_heartbeat(primary, now)
+    if written is None or copied is None:
+        return None
+    return max(written - copied, 0.0)
+
+
+class _Health:
+    """Per-process result of the last lag check."""
+
+    def __init__(self):
+        self.usable = False
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def replica_usable(self, alias):
+        now = time.monotonic()
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return self.usable
+        # One thread checks; the others keep the previous answer meanwhile
+        if not self.lock.acquire(blocking=False):
+            return self.usable
+        try:
+            self.checked_at = now
+            try:
+                lag = replica_lag(connections[DEFAULT_DB_ALIAS], connections[alias])
+            except Exception as e:
+                logger.warning(f"Replica {alias} unavailable, reading from the primary: {str(e)}")
+                lag = None
+            max_lag = getattr(settings, 'REPLICA_MAX_LAG', 10)
+            if lag is not None and lag > max_lag:
+                logger.warning(f"Replica {alias} is {lag:.1f}s behind, reading from the primary")
+            self.usable = lag is not None and lag <= max_lag
+        finally:
+            self.lock.release()
+        return self.usable
+
+
+_health = _Health()
+
+
+def read_from_replica(view):
+    """Send the reads of ``view`` to the replica while it is within ``REPLICA_MAX_LAG``."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if replica_alias() is None:
+            return view(request, *args, **kwargs)
+        # Resolve the session and user on the primary first; a fresh login may not
+        # have reached the replica yet
+        getattr(getattr(request, 'user', None), 'is_authenticated', None)
+        token = _replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if (alias is None or not _replica_reads.get()
+                or model._meta.label_lower in PRIMARY_ONLY_MODELS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return alias if _health.replica_usable(alias) else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Not None, or instances read from the replica would be saved back to it
+        return DEFAULT_DB_ALIAS if replica_alias() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        if db == replica_alias() and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
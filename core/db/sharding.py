@@ -0,0 +1,397 @@
+"""
+Tenant sharding of conversation data across databases.
+
+An organization's conversation data lives on one database alias listed in
+``DATABASE_SHARDS``: its ``chat.Conversation`` rows and everything hanging off them,
+its ``SocialMediaMessage`` rows, and the ``BanglaConversation`` and ``CallLog`` rows of
+its clients. ``TenantShard`` maps an organization, or a client without one, to its
+alias; unmapped tenants live on ``default``. Everything else (accounts, clients,
+agents, configuration, sessions, usage) stays on ``default``, the control database.
+
+``TenantShardRouter`` sends queries on ``SHARDED_MODELS`` to:
+
+- the database of a related instance given as a hint, as in ``conversation.messages``,
+  ``organization.conversations`` or ``BanglaConversation(client=client)``;
+- otherwise the shard of the tenant pinned for the current request.
+  ``TenantShardMiddleware`` pins the ``organization_id`` of webhook URLs, or else the
+  authenticated user's organization, looked up at the first sharded query so DRF
+  token and API key users count too. Anonymous endpoints keyed by client call
+  ``pin(client_id=...)``. Scripts use ``with tenant(...)`` or ``.using(shard_for(...))``;
+- otherwise ``default``. Platform-wide reports add up every shard with ``count``,
+  ``average`` and ``latest``.
+
+All shards have the full schema (``migrate --database <alias>``); only the sharded
+tables are used outside ``default``. Foreign keys from sharded tables to control
+tables have no database constraint, and deleting a control row cascades to the other
+shards through ``pre_delete``, outside the deleting transaction. A client keeps its
+rows where they are when it joins an organization, so attach clients to an
+organization on the same shard.
+
+Rows keep their primary keys when a tenant moves (``manage.py move_tenant``), so each
+shard allocates ids from its own range, ``SHARD_ID_SPAN`` times its position in
+``DATABASE_SHARDS``, set after ``migrate``. Only append to that list.
+"""
+import contextvars
+import heapq
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from core import invalidation
+
+
+# Sharded model -> lookup of its tenant. Parents come before children, the order
+# move_tenant copies in; client-keyed rows follow the client's organization.
+SHARDED_MODELS = {
+    'chat.conversation': 'organization_id',
+    'chat.message': 'conversation__organization_id',
+    'chat.feedback': 'conversation__organization_id',
+    'voice.voicesession': 'conversation__organization_id',
+    'voice.voicerecording': 'conversation__organization_id',
+    'voice.speechsynthesis': 'message__conversation__organization_id',
+    'social_media.socialmediamessage': 'organization_id',
+    'core.banglaconversation': 'client_id',
+    'core.calllog': 'client_id',
+}
+
+# Ids allocated on the shard at position i of DATABASE_SHARDS start above i * SHARD_ID_SPAN
+SHARD_ID_SPAN = 2 ** 40
+
+Placement = namedtuple('Placement', 'alias frozen')
+_HOME = Placement(DEFAULT_DB_ALIAS, False)
+
+
+class TenantMoving(DatabaseError):
+    """A write for a tenant that ``move_tenant`` has frozen; retry once the move is done."""
+
+
+def shard_aliases():
+    """``DATABASE_SHARDS``: database aliases in id range order, ``default`` first."""
+    return tuple(getattr(settings, 'DATABASE_SHARDS', None) or (DEFAULT_DB_ALIAS,))
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def sharded_models():
+    return [apps.get_model(label) for label in SHARDED_MODELS]
+
+
+# Shard map
+
+class _ShardMap:
+    """Per-process copy of ``TenantShard``, reloaded after any change to it."""
+
+    def __init__(self):
+        self.entries = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        invalidation.sync()
+        entries = self.entries
+        if entries is None:
+            from core.models import TenantShard
+            generation = self.generation
+            entries = {
+                ('organization', organization_id) if organization_id else ('client', client_id):
+                    Placement(alias, state == 'frozen')
+                for organization_id, client_id, alias, state in TenantShard.objects.using(
+                    DEFAULT_DB_ALIAS).values_list('organization_id', 'client_id', 'alias', 'state')
+            }
+            with self.lock:
+                # Not if it changed while loading
+                if self.generation == generation:
+                    self.entries = entries
+        return entries.get(key, _HOME)
+
+    def drop(self, key=None):
+        with self.lock:
+            self.generation += 1
+            self.entries = None
+
+
+_map = _ShardMap()
+invalidation.subscribe('shard', _map.drop)
+
+
+def placement(organization_id=None, client_id=None):
+    """``Placement(alias, frozen)`` of an organization, or of a client through its organization."""
+    if len(shard_aliases()) == 1:
+        return _HOME
+    if organization_id is None and client_id is not None:
+        from core.runtime import get_client_runtime
+        runtime = get_client_runtime(client_id)
+        if runtime is not None and runtime.organization_id:
+            organization_id = runtime.organization_id
+    if organization_id is not None:
+        return _map.get(('organization', int(organization_id)))
+    if client_id is not None:
+        return _map.get(('client', int(client_id)))
+    return _HOME
+
+
+def shard_for(organization_id=None, client_id=None):
+    """Database alias of the tenant's conversation data."""
+    return placement(organization_id, client_id).alias
+
+
+# Pinning
+
+class _Scope:
+    def __init__(self, request=None, organization_id=None, client_id=None):
+        self.request = request
+        self.organization_id = organization_id
+        self.client_id = client_id
+
+    def tenant(self):
+        """``(organization_id, client_id)`` pinned, or from the authenticated user; None if neither."""
+        if self.organization_id is None and self.client_id is None and self.request is not None:
+            # DRF also sets its authenticated user on the Django request
+            user = getattr(self.request, 'user', None)
+            if user is not None and user.is_authenticated:
+                self.organization_id = getattr(user, 'organization_id', None)
+        if self.organization_id is None and self.client_id is None:
+            return None
+        return self.organization_id, self.client_id
+
+
+_scope = contextvars.ContextVar('tenant_scope', default=None)
+
+
+@contextmanager
+def request_scope(request):
+    """Route sharded queries made while handling ``request`` to its tenant's shard."""
+    token = _scope.set(_Scope(request=request))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def tenant(organization_id=None, client_id=None):
+    """Route the block's sharded queries to this tenant's shard; yields the alias."""
+    token = _scope.set(_Scope(organization_id=organization_id, client_id=client_id))
+    try:
+        yield shard_for(organization_id, client_id)
+    finally:
+        _scope.reset(token)
+
+
+def pin(organization_id=None, client_id=None):
+    """Pin the current request (or ``tenant`` block) to this tenant. No-op outside either."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.organization_id, scope.client_id = organization_id, client_id
+
+
+def pinned_placement():
+    scope = _scope.get()
+    pinned = scope.tenant() if scope is not None else None
+    return None if pinned is None else placement(*pinned)
+
+
+def _instance_placement(instance):
+    """Placement of the tenant ``instance`` belongs to, from its own fields; None if they don't say."""
+    label = instance._meta.label_lower
+    if label == 'accounts.organization':
+        return placement(organization_id=instance.pk)
+    organization_id = getattr(instance, 'organization_id', None)
+    client_id = instance.pk if label == 'core.client' else getattr(instance, 'client_id', None)
+    if organization_id is None and client_id is None:
+        return None
+    return placement(organization_id, client_id)
+
+
+class TenantShardRouter:
+    """Sends ``SHARDED_MODELS`` queries to the tenant's shard; returns None for ``default`` so later routers apply."""
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints.get('instance'), write=False)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints.get('instance'), write=True)
+
+    def _route(self, model, instance, write):
+        if len(shard_aliases()) == 1:
+            return None
+        if not is_sharded(model):
+            # Control data, also when reached from a row on another shard
+            if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS) and is_sharded(type(instance)):
+                return DEFAULT_DB_ALIAS
+            return None
+        found = None
+        if instance is not None:
+            if is_sharded(type(instance)) and instance._state.db is not None:
+                # A row already on a shard, or a related manager of one (conversation.messages)
+                own = _instance_placement(instance) or pinned_placement()
+                found = Placement(instance._state.db, bool(own and own.alias == instance._state.db and own.frozen))
+            else:
+                found = _instance_placement(instance)
+        if found is None:
+            found = pinned_placement()
+        if found is None:
+            return None
+        if write and found.frozen:
+            raise TenantMoving(f"Tenant data on {found.alias} is being moved; retry shortly")
+        return None if found.alias == DEFAULT_DB_ALIAS else found.alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if len(shard_aliases()) == 1:
+            return None
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        # Control rows are related to rows on every shard
+        return True if any(sharded) else None
+
+
+# Platform-wide reports
+
+def _each_shard(queryset, evaluate):
+    if len(shard_aliases()) == 1:
+        return [evaluate(queryset)]
+    results = []
+    for alias in shard_aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            # Unpinned but still routed, so read_from_replica applies
+            token = _scope.set(_Scope())
+            try:
+                results.append(evaluate(queryset))
+            finally:
+                _scope.reset(token)
+        else:
+            results.append(evaluate(queryset.using(alias)))
+    return results
+
+
+def count(queryset):
+    """``queryset.count()`` over every shard."""
+    return sum(_each_shard(queryset, lambda qs: qs.count()))
+
+
+def average(queryset, field):
+    """Average of ``field`` over every shard, or None without values."""
+    totals = _each_shard(queryset.filter(**{f'{field}__isnull': False}),
+                         lambda qs: qs.aggregate(total=Sum(field), rows=Count(field)))
+    rows = sum(t['rows'] for t in totals)
+    return sum(t['total'] or 0 for t in totals) / rows if rows else None
+
+
+def latest(queryset, field, limit):
+    """The ``limit`` rows with the highest ``field`` over every shard."""
+    rows = []
+    for found in _each_shard(queryset, lambda qs: list(qs.order_by(f'-{field}')[:limit])):
+        rows.extend(found)
+    return heapq.nlargest(limit, rows, key=attrgetter(field))
+
+
+# Tenant data
+
+def tenant_querysets(alias, organization_id=None, client_id=None):
+    """``(model, queryset)`` of the tenant's rows on ``alias`` for each sharded model, parents first."""
+    if organization_id is not None:
+        from core.models import Client
+        client_ids = list(Client._base_manager.using(DEFAULT_DB_ALIAS).filter(
+            organization_id=organization_id).values_list('id', flat=True))
+    else:
+        client_ids = [client_id]
+    for label, lookup in SHARDED_MODELS.items():
+        model = apps.get_model(label)
+        if lookup == 'client_id':
+            filters = {'client_id__in': client_ids}
+        elif organization_id is not None:
+            filters = {lookup: organization_id}
+        else:
+            continue
+        yield model, model._base_manager.using(alias).filter(**filters)
+
+
+def reserve_id_range(alias):
+    """Start the id sequences of sharded tables on ``alias`` at its range."""
+    index = shard_aliases().index(alias)
+    if index == 0:
+        return
+    connection = connections[alias]
+    start = index * SHARD_ID_SPAN
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+                elif row[0] < start:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [start, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, "
+                    f"(SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))", [table, start])
+
+
+# Signals
+
+def _reserve_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using in shard_aliases():
+        reserve_id_range(using)
+
+
+def _shard_map_changed(sender, instance, **kwargs):
+    invalidation.publish('shard')
+
+
+def keep_client_placements(organization_id):
+    """
+    Map the organization's clients to its shard, where their rows stay once they lose
+    it. Returns the client ids.
+    """
+    from core.models import Client, TenantShard
+    client_ids = list(Client._base_manager.filter(organization_id=organization_id).values_list('id', flat=True))
+    home = shard_for(organization_id=organization_id)
+    if home != DEFAULT_DB_ALIAS:
+        TenantShard.objects.bulk_create([TenantShard(client_id=client_id, alias=home) for client_id in client_ids],
+                                        ignore_conflicts=True)
+    return client_ids
+
+
+def _cascade_to_shards(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Apply ``on_delete`` of sharded rows that reference ``instance`` on the other shards."""
+    if using != DEFAULT_DB_ALIAS or len(shard_aliases()) == 1:
+        return
+    if sender._meta.label_lower == 'accounts.organization':
+        keep_client_placements(instance.pk)
+    for alias in shard_aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        for model in sharded_models():
+            for field in model._meta.concrete_fields:
+                if not field.is_relation or field.related_model is not sender:
+                    continue
+                rows = model._base_manager.using(alias).filter(**{field.attname: instance.pk})
+                if field.remote_field.on_delete is models.CASCADE:
+                    rows.delete()
+                elif field.remote_field.on_delete is models.SET_NULL:
+                    rows.update(**{field.attname: None})
+
+
+def connect_signals(app_config):
+    from django.db.models.signals import post_migrate
+    from core.models import TenantShard
+    post_migrate.connect(_reserve_after_migrate, sender=app_config, dispatch_uid='shard_reserve_id_range')
+    post_save.connect(_shard_map_changed, sender=TenantShard, dispatch_uid='shard_map_saved')
+    post_delete.connect(_shard_map_changed, sender=TenantShard, dispatch_uid='shard_map_deleted')
+    # Per sender, so models without sharded references keep fast deletes
+    referenced = {field.related_model for model in sharded_models() for field in model._meta.concrete_fields
+                  if field.is_relation and not is_sharded(field.related_model)}
+    for model in referenced:
+        pre_delete.connect(_cascade_to_shards, sender=model, dispatch_uid=f'shard_cascade_{model._meta.label_lower}')
@@ -0,0 +1,232 @@
+"""
+SQLite backend for single-node deployments with concurrent gunicorn workers.
+
+Django's stock backend runs SQLite in rollback-journal mode. There, a writer blocks
+readers, and concurrent writers retry inside SQLite's busy handler, which sleeps
+and polls until ``timeout`` expires and then raises "database is locked". This
+backend changes two things.
+
+- Every connection enables WAL, so readers never wait for a writer. It also sets
+  ``synchronous``, ``cache_size`` and ``mmap_size`` from ``OPTIONS``.
+- Writes queue on a writer lock. The lock combines a thread lock with an ``flock``
+  on ``<database>-writer.lock``, so it is shared by every thread and process on
+  the node. An ``atomic`` block holds the lock from ``BEGIN`` until it commits or
+  rolls back. Outside a transaction, each INSERT, UPDATE or DELETE, also behind a
+  ``WITH`` clause, holds it for the statement. A writer waits for the lock at most
+  ``OPTIONS['timeout']`` seconds (default 5, like SQLite's busy timeout) and then
+  raises ``OperationalError``. Transactions on two databases taken in opposite
+  orders therefore fail instead of waiting on each other forever.
+
+``OPTIONS`` (besides Django's ``timeout``, ``transaction_mode`` and ``init_command``):
+``synchronous`` (default ``NORMAL``, which is durable under WAL except on power
+loss), ``cache_size_kib`` (default 20000) and ``mmap_size`` (bytes, default 128 MiB).
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+try:
+    import fcntl
+except ImportError:  # Windows: the writer lock covers threads of one process only
+    fcntl = None
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+_WRITE_KEYWORD = re.compile(r'\b(?:INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+# Seconds between attempts on a contended flock, doubling up to the maximum
+_POLL_MIN, _POLL_MAX = 0.001, 0.05
+
+
+class WriterLock:
+    """Reentrant lock shared by the threads of this process and, through flock, other processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+
+    def _file(self):
+        # A descriptor inherited across fork() would share its flock with the parent
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def acquire(self, timeout=None):
+        """Wait at most ``timeout`` seconds (None: forever), then raise ``OperationalError``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._lock.acquire(timeout=-1 if timeout is None else max(timeout, 0)):
+            raise OperationalError(f"database is locked: no writer lock on {self.path} after {timeout}s")
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            try:
+                self._flock(deadline, timeout)
+            except BaseException:
+                self._depth -= 1
+                self._lock.release()
+                raise
+
+    def _flock(self, deadline, timeout):
+        if deadline is None:
+            fcntl.flock(self._file(), fcntl.LOCK_EX)
+            return
+        delay = _POLL_MIN
+        while True:
+            try:
+                fcntl.flock(self._file(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise OperationalError(f"database is locked: no writer lock on {self.path} after {timeout}s")
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _POLL_MAX)
+
+    def release(self):
+        if self._depth == 1 and fcntl is not None:
+            fcntl.flock(self._file(), fcntl.LOCK_UN)
+        self._depth -= 1
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @contextmanager
+    def held(self, timeout=None):
+        self.acquire(timeout)
+        try:
+            yield self
+        finally:
+            self.release()
+
+
+_writer_locks = {}
+_writer_locks_lock = threading.Lock()
+
+
+def writer_lock(name):
+    """The process-wide ``WriterLock`` of database file ``name``."""
+    key = os.path.abspath(str(name))
+    with _writer_locks_lock:
+        if key not in _writer_locks:
+            _writer_locks[key] = WriterLock(f"{key}-writer.lock")
+        return _writer_locks[key]
+
+
+def _is_write(query):
+    head = query.lstrip()[:7].upper()
+    if head.startswith(WRITE_STATEMENTS):
+        return True
+    # A write after common table expressions; a false positive only takes the lock
+    return head.startswith('WITH') and _WRITE_KEYWORD.search(query) is not None
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    def execute(self, query, params=None):
+        if self.db.held_writer or not _is_write(query) or self.db.writer is None:
+            return super().execute(query, params)
+        with self.db.writer.held(self.db.writer_timeout):
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if self.db.held_writer or not _is_write(query) or self.db.writer is None:
+            return super().executemany(query, param_list)
+        with self.db.writer.held(self.db.writer_timeout):
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    PRAGMA_OPTIONS = {'synchronous': 'NORMAL', 'cache_size_kib': 20000, 'mmap_size': 128 * 1024 * 1024}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writer_name = self._writer = None
+        # The WriterLock held by this connection's open transaction
+        self.held_writer = None
+
+    @property
+    def writer(self):
+        """This database's ``WriterLock``; None for an in-memory database, which has one connection."""
+        # The test runner renames the database after the wrapper is created
+        name = self.settings_dict['NAME']
+        if name != self._writer_name:
+            self._writer_name = name
+            self._writer = None if self.is_in_memory_db() else writer_lock(name)
+        return self._writer
+
+    @property
+    def writer_timeout(self):
+        """Seconds to wait for the writer lock: Django's ``timeout`` option, as for SQLite."""
+        return float(self.settings_dict['OPTIONS'].get('timeout', 5))
+
+    def get_connection_params(self):
+        settings_dict = self.settings_dict
+        options = settings_dict['OPTIONS']
+        self.pragmas = {name: options.get(name, default) for name, default in self.PRAGMA_OPTIONS.items()}
+        # sqlite3.connect() rejects unknown keyword arguments
+        self.settings_dict = {**settings_dict, 'OPTIONS': {
+            name: value for name, value in options.items() if name not in self.PRAGMA_OPTIONS}}
+        try:
+            return super().get_connection_params()
+        finally:
+            self.settings_dict = settings_dict
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if not self.is_in_memory_db():
+            conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f"PRAGMA synchronous = {self.pragmas['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.pragmas['cache_size_kib'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.pragmas['mmap_size'])}")
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        writer = self.writer
+        if writer is None:
+            return super()._start_transaction_under_autocommit()
+        writer.acquire(self.writer_timeout)
+        self.held_writer = writer
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_writer()
+            raise
+
+    def _release_writer(self):
+        writer, self.held_writer = self.held_writer, None
+        if writer is not None:
+            writer.release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_writer()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_writer()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._release_writer()
@@ -0,0 +1,233 @@
+"""
+Streaming export of query results as CSV, NDJSON or Parquet.
+
+Rows come from ``values_list(...).iterator(chunk_size=...)``. On PostgreSQL that is a
+server-side cursor and on SQLite chunked fetches. No model instances are built and the
+queryset caches nothing. Each format encodes rows as they arrive and yields bytes
+about every ``FLUSH_BYTES``, so a ``StreamingHttpResponse`` sends an export of any
+size in constant memory. Parquet needs the pyarrow package. It writes one row group
+per ``ROW_GROUP_SIZE`` rows and sends each group as soon as it is written.
+
+Archived rows (``core.archive``) can be streamed ahead of the live ones with
+``archived_rows``.
+"""
+import csv
+import datetime
+import decimal
+import uuid
+
+from django.db import models
+from django.http import StreamingHttpResponse
+
+from core import fastjson
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+
+CHUNK_SIZE = 2000
+ROW_GROUP_SIZE = 50000
+FLUSH_BYTES = 64 * 1024
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportFormatError(ValueError):
+    """Raised when an export format is unknown or cannot be produced here."""
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ExportFormatError(f"Unsupported export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise ExportFormatError("Parquet export needs the pyarrow package; use csv or ndjson")
+
+
+def queryset_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Tuples of the ``columns`` (lookups) of ``queryset``'s rows, fetched ``chunk_size`` at a time."""
+    # The response is streamed after the view returns, when the request's shard pin and
+    # replica routing are gone; choose the database now
+    return queryset.using(queryset.db).values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def archived_rows(model, columns, records, timestamp, start=None, end=None, **equal):
+    """
+    Tuples of ``columns`` (``model``'s own fields) from archive ``records``
+    (``core.archive.archived_records``) of ``model`` whose ``timestamp`` is in
+    ``[start, end)`` and whose fields equal ``equal``, e.g. ``client=7``.
+    """
+    label = model._meta.label_lower
+    fields = [model._meta.get_field(name) for name in columns]
+    timestamp = model._meta.get_field(timestamp)
+    for record in records:
+        data = record['fields']
+        if record['model'] != label or any(data.get(name) != value for name, value in equal.items()):
+            continue
+        moment = timestamp.to_python(data.get(timestamp.name))
+        if (start is not None and moment < start) or (end is not None and moment >= end):
+            continue
+        yield tuple(field.to_python(record['pk'] if field.primary_key else data.get(field.name))
+                    for field in fields)
+
+
+def _field(model, lookup):
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def _text(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (dict, list)):
+        return fastjson.dumps(value).decode('utf-8')
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    converted = _text(value)
+    if converted is value:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return converted
+
+
+class _Buffer:
+    """Write target that hands out what was written since the last ``take()``."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = data.encode('utf-8') if isinstance(data, str) else bytes(data)
+        self.parts.append(data)
+        self.size += len(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def csv_chunks(headers, rows):
+    buffer = _Buffer()
+    # The byte order mark makes Excel read the file as UTF-8 (Bangla text)
+    buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow([_text(value) for value in row])
+        if buffer.size >= FLUSH_BYTES:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def ndjson_chunks(headers, rows):
+    buffer = _Buffer()
+    for row in rows:
+        buffer.write(fastjson.dumps(dict(zip(headers, row)), default=_json_default) + b'\n')
+        if buffer.size >= FLUSH_BYTES:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def _arrow_type(field):
+    kind = field.get_internal_type()
+    if field.is_relation:
+        return _arrow_type(field.target_field)
+    if kind in ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+                'SmallIntegerField', 'PositiveIntegerField', 'PositiveBigIntegerField',
+                'PositiveSmallIntegerField'):
+        return pyarrow.int64()
+    if kind == 'FloatField':
+        return pyarrow.float64()
+    if kind == 'BooleanField':
+        return pyarrow.bool_()
+    if kind == 'DateTimeField':
+        return pyarrow.timestamp('us', tz='UTC')
+    if kind == 'DateField':
+        return pyarrow.date32()
+    if kind == 'DurationField':
+        return pyarrow.duration('us')
+    if kind == 'DecimalField':
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    return pyarrow.string()
+
+
+def parquet_chunks(headers, rows, model, columns, row_group_size=ROW_GROUP_SIZE):
+    # Column types come from the model fields, so an empty or all-null first group is fine
+    types = [_arrow_type(_field(model, lookup)) for lookup in columns]
+    schema = pyarrow.schema(list(zip(headers, types)))
+    strings = [index for index, type_ in enumerate(types) if type_ == pyarrow.string()]
+    buffer = _Buffer()
+    writer = pyarrow.parquet.ParquetWriter(buffer, schema, compression='zstd')
+
+    def write(group):
+        values = list(zip(*group))
+        for index in strings:
+            values[index] = [value if value is None or isinstance(value, str) else str(_text(value))
+                             for value in values[index]]
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=type_) for column, type_ in zip(values, types)], schema=schema))
+
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= row_group_size:
+            write(group)
+            group = []
+            yield buffer.take()
+    if group:
+        write(group)
+    writer.close()
+    yield buffer.take()
+
+
+def streaming_response(rows, model, columns, fmt, filename):
+    """
+    A ``StreamingHttpResponse`` downloading ``rows`` (tuples of ``columns``, lookups on
+    ``model``) as ``filename.<fmt>``. ``columns`` maps each header to its lookup.
+    """
+    check_format(fmt)
+    headers, lookups = list(columns), list(columns.values())
+    if fmt == 'csv':
+        chunks = csv_chunks(headers, rows)
+    elif fmt == 'ndjson':
+        chunks = ndjson_chunks(headers, rows)
+    else:
+        chunks = parquet_chunks(headers, rows, model, lookups)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def model_columns(model, exclude=()):
+    """``{column: column}`` for the concrete fields of ``model``, foreign keys as ``<name>_id``."""
+    return {field.attname: field.attname for field in model._meta.concrete_fields
+            if field.name not in exclude and not isinstance(field, models.FileField)}
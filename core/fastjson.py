@@ -0,0 +1,36 @@
+"""
+Fast JSON encoding/decoding shared by the DRF renderer/parser and ``core.http.JsonResponse``.
+
+Uses orjson when it is installed and falls back to the standard library otherwise.
+Output is always compact UTF-8: Bangla text is emitted as raw UTF-8 bytes, not as
+``\\uXXXX`` escapes that make a Bangla payload about six times larger.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(data, default=None, passthrough_datetime=False):
+    """
+    Serialize ``data`` to UTF-8 JSON bytes.
+
+    ``default`` is called for types the encoder does not know (Decimal, lazy strings, ...).
+    With ``passthrough_datetime`` datetimes are also routed through ``default`` so callers
+    can keep their existing datetime formatting.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if passthrough_datetime:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(data, default=default, option=option)
+    return json.dumps(data, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from bytes or str. Raises ``ValueError`` on malformed input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,31 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from core import fastjson
+
+
+class JsonResponse(HttpResponse):
+    """
+    django.http.JsonResponse replacement that emits raw UTF-8 instead of ``\\uXXXX`` escapes.
+
+    Same signature as Django's JsonResponse. With the default encoder and no
+    ``json_dumps_params`` the body is produced by orjson; non-native values
+    (including datetimes, to keep Django's millisecond formatting) go through
+    DjangoJSONEncoder.
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        if encoder is DjangoJSONEncoder and not json_dumps_params:
+            content = fastjson.dumps(data, default=encoder().default, passthrough_datetime=True)
+        else:
+            json_dumps_params = {'ensure_ascii': False, **(json_dumps_params or {})}
+            content = json.dumps(data, cls=encoder, **json_dumps_params)
+        super().__init__(content=content, **kwargs)
@@ -0,0 +1,318 @@
+"""
+Streaming bulk import (upsert) of products and intents from CSV or NDJSON.
+
+Rows are read lazily from a line iterator, validated in chunks with the model
+fields' own ``clean()`` and written with one
+``bulk_create(update_conflicts=True)`` statement per chunk: products upsert on
+``sku``, intents on ``(client, name)``. Only the columns present in the input are
+updated, so a file with fewer columns leaves the others alone. Invalid rows are
+reported with their row number and skipped. When the import finishes, ``core.signals.catalog_imported``
+is sent once, so caches and indexes are rebuilt once per import rather than once
+per row.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core import fastjson
+from core.models import BanglaIntent, Client, Product
+from core.signals import catalog_imported
+
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+
+class ImportFormatError(ValueError):
+    """Raised when the input cannot be read as the requested format."""
+
+
+def detect_format(content_type='', filename=''):
+    """Guess csv/ndjson from a content type or file name; None if unknown."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    filename = (filename or '').lower()
+    if content_type in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl') \
+            or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def _decoded_lines(lines):
+    first = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_records(lines, fmt):
+    """
+    Yield ``(row_number, dict)`` from an iterable of byte or str lines.
+
+    Input that is not UTF-8, or CSV that cannot be parsed, raises ``ImportFormatError``
+    with the line number.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(_decoded_lines(lines))
+        try:
+            for row in reader:
+                yield reader.line_num, {k.strip(): v for k, v in row.items() if k}
+        # DictReader.line_num only moves on after a row is returned; the inner reader's
+        # counter includes the line that failed
+        except UnicodeDecodeError:
+            raise ImportFormatError(f"Line {reader.reader.line_num + 1} is not valid UTF-8") from None
+        except csv.Error as e:
+            raise ImportFormatError(f"Line {reader.reader.line_num}: {e}") from None
+    elif fmt == 'ndjson':
+        number = 0
+        try:
+            for number, line in enumerate(_decoded_lines(lines), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = fastjson.loads(line)
+                except ValueError as e:
+                    yield number, e
+                    continue
+                yield number, record
+        except UnicodeDecodeError:
+            raise ImportFormatError(f"Line {number + 1} is not valid UTF-8") from None
+    else:
+        raise ImportFormatError(f"Unsupported import format '{fmt}', expected one of {', '.join(FORMATS)}")
+
+
+def _list_value(value):
+    """Intent examples/responses: JSON list, or '|'-separated text in CSV."""
+    if isinstance(value, list) or value in (None, ''):
+        return value or []
+    value = str(value).strip()
+    if value.startswith('['):
+        return fastjson.loads(value)
+    return [part.strip() for part in value.split('|') if part.strip()]
+
+
+class _Importer:
+    model = None
+    conflict_fields = ()
+    # import column -> (model field, default, converter)
+    columns = {}
+    required = ()
+
+    def __init__(self, clients=None, chunk_size=CHUNK_SIZE):
+        # Clients rows may name in client_id; None allows any
+        self.clients = Client.objects.all() if clients is None else clients
+        self.chunk_size = chunk_size
+        self.processed = 0
+        self.upserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.client_ids = set()
+        self.keys = set()
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def clean_record(self, record):
+        """Return (field values, errors) for one input record."""
+        values, errors = {}, {}
+        for column in self.required:
+            if record.get(column) in (None, ''):
+                errors[column] = ['This field is required.']
+        for column, (field_name, default, convert) in self.columns.items():
+            if column not in record:
+                # Existing rows keep their value, new rows get the model default
+                continue
+            raw = record[column]
+            try:
+                if convert and raw not in (None, ''):
+                    raw = convert(raw)
+                if raw in (None, '', []):
+                    # Empty optional values take the default without validation
+                    if column not in self.required and default is not None:
+                        values[field_name] = default() if callable(default) else default
+                    continue
+                if field_name.endswith('_id'):
+                    # Foreign keys are checked once per chunk in validate_chunk()
+                    values[field_name] = raw
+                else:
+                    values[field_name] = self.model._meta.get_field(field_name).clean(raw, None)
+            except (ValidationError, ValueError, TypeError) as e:
+                errors[column] = list(getattr(e, 'messages', [str(e)]))
+        return values, errors
+
+    def validate_chunk(self, rows):
+        """Hook for checks that need one query per chunk. Returns surviving rows."""
+        return rows
+
+    def known_clients(self, rows):
+        client_ids = {values['client_id'] for _, values in rows}
+        return set(self.clients.filter(id__in=client_ids).values_list('id', flat=True))
+
+    def flush(self, chunk):
+        rows = []
+        for row_number, record in chunk:
+            if isinstance(record, Exception) or not isinstance(record, dict):
+                self.add_error(row_number, {'__all__': [f'Invalid record: {record}']})
+                continue
+            values, errors = self.clean_record(record)
+            if errors:
+                self.add_error(row_number, errors)
+            else:
+                rows.append((row_number, values))
+        rows = self.validate_chunk(rows)
+
+        # A single upsert statement may not touch the same key twice; the last row wins
+        latest = {}
+        for row_number, values in rows:
+            latest[tuple(values[f] for f in self.conflict_key)] = values
+        # An upsert overwrites only the columns its rows came with; NDJSON rows may differ
+        groups = {}
+        for values in latest.values():
+            groups.setdefault(frozenset(values), []).append(values)
+        if latest:
+            with transaction.atomic():
+                for fields, group in groups.items():
+                    self.model.objects.bulk_create(
+                        [self.model(**values) for values in group],
+                        update_conflicts=True,
+                        unique_fields=list(self.conflict_fields),
+                        update_fields=self.update_fields(fields),
+                    )
+            self.upserted += len(latest)
+            self.client_ids.update(values['client_id'] for values in latest.values())
+            self.keys.update(latest)
+
+    @property
+    def conflict_key(self):
+        return [f if f != 'client' else 'client_id' for f in self.conflict_fields]
+
+    def update_fields(self, fields):
+        """Fields overwritten on existing rows by an upsert of rows that set ``fields``."""
+        skip = set(self.conflict_fields) | {'client', 'organization', 'id', 'created_at'}
+        return sorted(f for f in {*fields, 'updated_at'} if f.removesuffix('_id') not in skip)
+
+    def run(self, records):
+        chunk = []
+        for item in records:
+            self.processed += 1
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        catalog_imported.send(sender=self.model, client_ids=frozenset(self.client_ids),
+                              keys=frozenset(self.keys))
+        return self.result()
+
+    def result(self):
+        return {
+            'processed': self.processed,
+            'upserted': self.upserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+class ProductImporter(_Importer):
+    model = Product
+    conflict_fields = ('sku',)
+    required = ('sku', 'name', 'price')
+    columns = {
+        'sku': ('sku', None, lambda v: str(v).strip()),
+        'name': ('name', None, None),
+        'price': ('price', None, None),
+        'client_id': ('client_id', None, int),
+        'description': ('description', '', None),
+        'currency': ('currency', 'BDT', None),
+        'in_stock': ('in_stock', True, None),
+        'qty': ('stock_qty', 0, int),
+        'is_active': ('is_active', True, None),
+    }
+
+    def __init__(self, organization, client=None, **kwargs):
+        super().__init__(**kwargs)
+        self.organization = organization
+        self.default_client = client
+
+    def clean_record(self, record):
+        values, errors = super().clean_record(record)
+        if 'client_id' not in values and 'client_id' not in errors:
+            if self.default_client is None:
+                errors['client_id'] = ['This field is required.']
+            else:
+                values['client_id'] = self.default_client.id
+        values['organization_id'] = self.organization.id
+        return values, errors
+
+    def validate_chunk(self, rows):
+        known_clients = self.known_clients(rows)
+        # sku is globally unique: never let one organization's import overwrite another's product
+        foreign_skus = set(
+            Product.objects.filter(sku__in=[values['sku'] for _, values in rows])
+            .exclude(organization=self.organization)
+            .values_list('sku', flat=True)
+        )
+        valid = []
+        for row_number, values in rows:
+            if values['client_id'] not in known_clients:
+                self.add_error(row_number, {'client_id': ['Client not found.']})
+            elif values['sku'] in foreign_skus:
+                self.add_error(row_number, {'sku': ['SKU belongs to another organization.']})
+            else:
+                valid.append((row_number, values))
+        return valid
+
+    def update_fields(self, fields):
+        return super().update_fields(fields) + ['client']
+
+
+class IntentImporter(_Importer):
+    model = BanglaIntent
+    conflict_fields = ('client', 'name')
+    required = ('name', 'training_phrase', 'ai_response_template')
+    columns = {
+        'client_id': ('client_id', None, int),
+        'name': ('name', None, lambda v: str(v).strip()),
+        'training_phrase': ('training_phrase', None, None),
+        'ai_response_template': ('ai_response_template', None, None),
+        'description': ('description', '', None),
+        'examples': ('examples', list, _list_value),
+        'responses': ('responses', list, _list_value),
+        'confidence_threshold': ('confidence_threshold', 0.8, float),
+        'is_active': ('is_active', True, None),
+    }
+
+    def __init__(self, client=None, **kwargs):
+        super().__init__(**kwargs)
+        self.default_client = client
+
+    def clean_record(self, record):
+        values, errors = super().clean_record(record)
+        if 'client_id' not in values and 'client_id' not in errors:
+            if self.default_client is None:
+                errors['client_id'] = ['This field is required.']
+            else:
+                values['client_id'] = self.default_client.id
+        return values, errors
+
+    def validate_chunk(self, rows):
+        known_clients = self.known_clients(rows)
+        valid = []
+        for row_number, values in rows:
+            if values['client_id'] not in known_clients:
+                self.add_error(row_number, {'client_id': ['Client not found.']})
+            else:
+                valid.append((row_number, values))
+        return valid
@@ -0,0 +1,268 @@
+"""
+Cluster-wide invalidation bus for in-process caches.
+
+Caches that live in worker memory (``core.runtime``, ``core.availability``) subscribe
+to a topic with a handler that drops one key, or every entry when the key is None.
+Writers call ``publish(topic, key)``. The writing process drops the entry at once and
+again on commit, and after commit the event is put on the bus.
+
+Each process calls ``sync()`` on its cache hot paths. At most once every
+``INVALIDATION_POLL_INTERVAL`` seconds (default 1) it reads the events other
+processes published and runs the handlers. An edit therefore stops being served
+from any worker's memory within that interval plus the time until the worker's
+next lookup.
+
+Backends (``INVALIDATION_BUS_BACKEND``):
+
+- ``core.invalidation.DatabaseBus`` (default) polls the ``InvalidationEvent``
+  table by id. It needs no extra service, so it runs the same on SQLite for local
+  development and tests as on the shared Postgres in production.
+- ``core.invalidation.RedisBus`` uses Redis pub/sub on ``INVALIDATION_REDIS_URL``.
+  Events arrive on a listener thread and ``sync()`` only drains them.
+
+If a process may have missed events, it drops every subscribed cache instead of
+serving stale entries. This happens when it has not polled for longer than
+``INVALIDATION_EVENT_RETENTION``, or when its Redis connection was lost.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core import fastjson
+
+logger = logging.getLogger(__name__)
+
+
+# More keys than this in one publish_many() become a single "drop everything" event
+MAX_KEYS_PER_PUBLISH = 100
+# Events read per poll; a process further behind than this drops all caches
+MAX_EVENTS_PER_POLL = 1000
+# How long a DatabaseBus keeps re-reading an id skipped by a still-open transaction
+GAP_WAIT_SECONDS = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class DatabaseBus:
+    """Invalidation events as rows of ``InvalidationEvent``, read by id."""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.last_id = None
+        self.polled_at = None
+        # ids below last_id not yet visible (their transaction had not committed), with
+        # the monotonic time to stop looking for them
+        self.gaps = {}
+
+    def publish(self, topic, key):
+        from core.models import InvalidationEvent
+        InvalidationEvent.objects.create(topic=topic, key=key or '', origin=self.origin)
+        if random.random() < 0.01:
+            self.prune()
+
+    def prune(self):
+        from core.models import InvalidationEvent
+        cutoff = timezone.now() - timedelta(seconds=_setting('INVALIDATION_EVENT_RETENTION', 3600))
+        InvalidationEvent.objects.filter(created_at__lt=cutoff).delete()
+
+    def _baseline(self, now):
+        from core.models import InvalidationEvent
+        self.last_id = InvalidationEvent.objects.aggregate(last=Max('id'))['last'] or 0
+        self.gaps = {}
+        self.polled_at = now
+
+    def poll(self):
+        """Events published by other processes since the last poll, or None to drop everything."""
+        from core.models import InvalidationEvent
+        now = time.monotonic()
+        if self.last_id is None:
+            # Nothing is cached before the first lookup, so there is nothing to drop yet
+            self._baseline(now)
+            return []
+        if now - self.polled_at > _setting('INVALIDATION_EVENT_RETENTION', 3600):
+            self._baseline(now)
+            return None
+        self.polled_at = now
+
+        self.gaps = {event_id: until for event_id, until in self.gaps.items() if until > now}
+        query = Q(id__gt=self.last_id)
+        if self.gaps:
+            query |= Q(id__in=list(self.gaps))
+        rows = list(
+            InvalidationEvent.objects.filter(query).order_by('id')
+            .values_list('id', 'topic', 'key', 'origin')[:MAX_EVENTS_PER_POLL]
+        )
+        if len(rows) == MAX_EVENTS_PER_POLL:
+            self._baseline(now)
+            return None
+
+        events = []
+        for event_id, topic, key, origin in rows:
+            self.gaps.pop(event_id, None)
+            if event_id > self.last_id:
+                if event_id - self.last_id <= MAX_EVENTS_PER_POLL:
+                    self.gaps.update((missing, now + GAP_WAIT_SECONDS)
+                                     for missing in range(self.last_id + 1, event_id))
+                self.last_id = event_id
+            if origin != self.origin:
+                events.append((topic, key or None))
+        return events
+
+
+class RedisBus:
+    """Invalidation events over Redis pub/sub."""
+
+    def __init__(self):
+        import redis
+        self.redis = redis.Redis.from_url(_setting('INVALIDATION_REDIS_URL', 'redis://localhost:6379/0'))
+        self.channel = _setting('INVALIDATION_REDIS_CHANNEL', 'bangla-chat-pro:invalidation')
+        self.origin = uuid.uuid4().hex
+        self.pending = deque(maxlen=MAX_EVENTS_PER_POLL)
+        self.resync = False
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, topic, key):
+        self.redis.publish(self.channel, fastjson.dumps([self.origin, topic, key]))
+
+    def _listen(self):
+        import redis
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    origin, topic, key = fastjson.loads(message['data'])
+                    if origin != self.origin:
+                        if len(self.pending) == self.pending.maxlen:
+                            self.resync = True
+                        self.pending.append((topic, key))
+            except (redis.RedisError, ValueError) as e:
+                logger.error(f"Invalidation listener disconnected: {str(e)}")
+                # Anything published while disconnected is lost
+                self.resync = True
+                time.sleep(1)
+
+    def poll(self):
+        """Events received since the last poll, or None to drop everything."""
+        # Started on first use so each forked worker gets its own listener
+        if self._listener is None:
+            with self._listener_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name='invalidation-bus', daemon=True)
+                    self._listener.start()
+        if self.resync:
+            self.resync = False
+            self.pending.clear()
+            return None
+        events = []
+        while self.pending:
+            events.append(self.pending.popleft())
+        return events
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    """The process's bus, built from ``INVALIDATION_BUS_BACKEND`` on first use."""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = import_string(_setting('INVALIDATION_BUS_BACKEND', 'core.invalidation.DatabaseBus'))()
+    return _bus
+
+
+# Subscribers
+
+_handlers = defaultdict(list)
+
+
+def subscribe(topic, handler):
+    """Call ``handler(key)`` for every invalidation of ``topic``; key None means all entries."""
+    if handler not in _handlers[topic]:
+        _handlers[topic].append(handler)
+
+
+def _dispatch(topic, key):
+    for handler in _handlers.get(topic, ()):
+        handler(key)
+
+
+def _dispatch_all():
+    for topic in list(_handlers):
+        _dispatch(topic, None)
+
+
+def publish(topic, key=None, local=True):
+    """Drop ``key`` from ``topic`` caches here now and on commit, and on every other process.
+
+    With ``local=False`` only the other processes are told, for writers that have
+    just cached the new value themselves.
+    """
+    key = None if key is None else str(key)
+    if local:
+        _dispatch(topic, key)
+
+    def send():
+        if local:
+            _dispatch(topic, key)
+        try:
+            get_bus().publish(topic, key)
+        except Exception as e:
+            logger.error(f"Failed to publish invalidation {topic}:{key}: {str(e)}")
+    transaction.on_commit(send)
+
+
+def publish_many(topic, keys):
+    """``publish`` each key, or one drop-everything event for large batches."""
+    keys = list(dict.fromkeys(keys))
+    if len(keys) > MAX_KEYS_PER_PUBLISH:
+        publish(topic, None)
+    else:
+        for key in keys:
+            publish(topic, key)
+
+
+# Consumers
+
+_last_sync = 0.0
+_sync_lock = threading.Lock()
+
+
+def sync(force=False):
+    """Apply other processes' invalidations if the poll interval has passed."""
+    global _last_sync
+    now = time.monotonic()
+    if not force and now - _last_sync < _setting('INVALIDATION_POLL_INTERVAL', 1.0):
+        return
+    # One thread polls; the others keep serving from cache meanwhile
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sync = now
+        events = get_bus().poll()
+    except Exception as e:
+        logger.error(f"Invalidation bus poll failed: {str(e)}")
+        return
+    finally:
+        _sync_lock.release()
+    if events is None:
+        _dispatch_all()
+        return
+    for topic, key in events:
+        _dispatch(topic, key)
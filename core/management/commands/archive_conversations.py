@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Organization
+from core import archive
+from core.models import Client
+
+
+class Command(BaseCommand):
+    help = ("Move conversation data past each tenant's retention period to compressed archive files "
+            "and delete it in batches (run from cron, e.g. daily)")
+
+    def add_arguments(self, parser):
+        tenant = parser.add_mutually_exclusive_group()
+        tenant.add_argument('--organization', type=int, help='Only this organization')
+        tenant.add_argument('--client', type=int, help='Only this standalone client')
+        parser.add_argument('--days', type=int, default=None,
+                            help="Override the tenants' retention period")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches so live traffic gets the databases')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.only('id', 'retention_days').order_by('id')
+        clients = Client.objects.filter(organization__isnull=True).only('id').order_by('id')
+        if options['organization'] is not None:
+            organizations, clients = organizations.filter(id=options['organization']), []
+            if not organizations:
+                raise CommandError(f"Organization {options['organization']} does not exist")
+        elif options['client'] is not None:
+            organizations, clients = [], clients.filter(id=options['client'])
+            if not clients:
+                raise CommandError(f"Client {options['client']} does not exist or belongs to an organization")
+
+        tenants = [({'organization_id': organization.id}, archive.retention_days(organization))
+                   for organization in organizations]
+        tenants += [({'client_id': client.id}, archive.retention_days()) for client in clients]
+        total = 0
+        for tenant, days in tenants:
+            days = options['days'] if options['days'] is not None else days
+            if not days:
+                continue
+            archived, paths = archive.archive_tenant(
+                days, **tenant, batch_size=options['batch_size'], pause=options['pause'])
+            if archived:
+                self.stdout.write(f"{archive.tenant_key(**tenant)}: archived {archived} row(s) "
+                                  f"to {len(paths)} file(s)")
+            total += archived
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} row(s)."))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.query_audit import HOT_QUERIES, audit_hot_queries, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Seed a large synthetic dataset and fail if any hot query's plan does a full table scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Rows to seed per hot table (default: 20000)')
+        parser.add_argument('--tenants', type=int, default=50,
+                            help='Number of organizations/clients to spread rows across (default: 50)')
+        parser.add_argument('--strict', action='store_true',
+                            help='Also fail when a plan needs a sort that no index satisfies')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows instead of rolling them back')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print the full EXPLAIN output for every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Query-plan audit does not support the '{connection.vendor}' backend")
+
+        failures = []
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['rows']} rows per table on {connection.vendor}...")
+            sample = seed_dataset(options['rows'], tenants=options['tenants'])
+
+            for name, plan, scanned, has_sort in audit_hot_queries(sample):
+                problems = []
+                if scanned:
+                    problems.append(f"full scan of {', '.join(sorted(set(scanned)))}")
+                if has_sort:
+                    problems.append('unindexed sort')
+
+                if scanned or (has_sort and options['strict']):
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FAIL  {name}: {'; '.join(problems)}"))
+                elif problems:
+                    self.stdout.write(self.style.WARNING(f"WARN  {name}: {'; '.join(problems)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"OK    {name}"))
+                if options['verbose_plans'] or scanned:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"        {line}")
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} of {len(HOT_QUERIES)} hot queries do full scans: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(HOT_QUERIES)} hot queries use indexes."))
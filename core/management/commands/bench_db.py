@@ -0,0 +1,61 @@
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+
+from core.models import Client
+
+
+def _view(request):
+    return HttpResponse(str(Client.objects.filter(is_active=True).exists()))
+
+
+# One query per request, so the timings are mostly connection handling
+urlpatterns = [path('bench/db/', _view)]
+
+
+class Command(BaseCommand):
+    help = "Compare request throughput with a new database connection per request vs the configured profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def _run(self, requests):
+        handler = WSGIHandler()
+        factory = RequestFactory(SERVER_NAME='localhost')
+        start = time.perf_counter()
+        for _ in range(requests):
+            # Through the WSGI handler, so connections are closed or kept as in production
+            response = handler(factory.get('/bench/db/').environ,
+                               lambda status, headers: None)
+            response.close()
+        return requests / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        configured = settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'].get('pool')
+        if configured[1]:
+            mode = 'pooled'
+        elif configured[0]:
+            mode = f'persistent (CONN_MAX_AGE={configured[0]})'
+        else:
+            mode = 'configured (connection per request)'
+        with override_settings(ROOT_URLCONF=__name__):
+            connection.close()
+            settings_dict['CONN_MAX_AGE'] = 0
+            settings_dict['OPTIONS'].pop('pool', None)
+            try:
+                per_request = self._run(options['requests'])
+            finally:
+                settings_dict['CONN_MAX_AGE'] = configured[0]
+                if configured[1]:
+                    settings_dict['OPTIONS']['pool'] = configured[1]
+            connection.close()
+            profile = self._run(options['requests'])
+        self.stdout.write(f"{connection.vendor}, {options['requests']} requests:")
+        self.stdout.write(f"  connection per request: {per_request:.0f} req/s")
+        self.stdout.write(f"  {mode}: {profile:.0f} req/s")
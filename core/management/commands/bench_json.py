@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse as DjangoJsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from core import fastjson
+from core.http import JsonResponse
+from core.renderers import FastJSONRenderer
+
+
+def _sample_payloads():
+    """Typical Bangla responses: a chat reply, a product page and an intent page."""
+    now = datetime(2025, 1, 15, 10, 30, 12, 345678, tzinfo=dt_timezone.utc)
+    chat_reply = {
+        'conversation_id': 48213,
+        'ai_response': 'আপনার অর্ডারটি প্রক্রিয়াধীন আছে এবং আগামী ২-৩ কর্মদিবসের মধ্যে ডেলিভারি হবে। '
+                       'অন্য কোনো সাহায্যের প্রয়োজন হলে জানাবেন, আমরা সবসময় আপনার পাশে আছি।',
+        'confidence': 0.9,
+        'is_escalated': False,
+        'timestamp': now.isoformat(),
+    }
+    products = {
+        'results': [{
+            'id': i,
+            'sku': f'SKU-{i}',
+            'name': f'উচ্চমানের কটন টি-শার্ট {i}',
+            'price': str(Decimal('499.00') + i),
+            'currency': 'BDT',
+            'in_stock': i % 3 != 0,
+            'client_id': 1,
+            'qty': i * 2,
+        } for i in range(50)],
+        'next_cursor': 'WzUwXQ',
+    }
+    intents = {
+        'results': [{
+            'id': i,
+            'name': f'order_status_{i}',
+            'training_phrase': 'আমার অর্ডার কোথায়? অর্ডারের অবস্থা জানতে চাই',
+            'ai_response_template': 'আপনার অর্ডারের অবস্থা: {{status}}। ধন্যবাদ আমাদের সাথে থাকার জন্য।',
+            'usage_count': i * 7,
+            'success_rate': 0.82,
+        } for i in range(50)],
+        'next_cursor': None,
+    }
+    return {'chat reply': chat_reply, 'product page (50)': products, 'intent page (50)': intents}
+
+
+def _time(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare bytes on the wire and serialization time of stdlib json vs the orjson-backed encoders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        n = options['iterations']
+        backend = 'orjson' if fastjson.orjson is not None else 'stdlib (orjson not installed)'
+        self.stdout.write(f"fast backend: {backend}; {n} iterations per measurement\n")
+
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        header = f"{'payload':<20} {'encoder':<32} {'bytes':>8} {'us/op':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for name, payload in _sample_payloads().items():
+            rows = [
+                ('django.http.JsonResponse',
+                 lambda: DjangoJsonResponse(payload).content),
+                ('core.http.JsonResponse',
+                 lambda: JsonResponse(payload).content),
+                ('DRF JSONRenderer',
+                 lambda: drf_renderer.render(payload)),
+                ('core FastJSONRenderer',
+                 lambda: fast_renderer.render(payload)),
+            ]
+            for label, fn in rows:
+                size = len(fn())
+                self.stdout.write(f"{name:<20} {label:<32} {size:>8} {_time(fn, n):>9.1f}")
+            self.stdout.write('')
@@ -0,0 +1,75 @@
+import random
+import re
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand
+
+from core.bangla import normalize, normalize_many, tokenize
+
+
+# Typical inbound messages, in the encodings they arrive in
+_SAMPLES = [
+    'আমার অর্ডারটা কোথায়?? ১২৩৪৫ নম্বর অর্ডার!!!',
+    'শাড়ির দাম কত? ২টা নিতে চাই\u2026',
+    'র\u200d্যাব চত্বরের কাছে ডেলিভারি দেবেন?',
+    'Delivery to Dhaka \u2014 how many days?',
+    '\u201cCash on delivery\u201d available?   ধন্যবাদ।।',
+    'SKU-১২০০ এর স্টক আছে কি\u200b?',
+    'আমি রিফান্ড চাই, অর্ডার নম্বর 98765',
+    'বা\u09dcি থেকে অর্ডার করেছি, আজ পাব?',  # precomposed ড়
+    'HELLO!!! Is anyone there???',
+]
+
+
+def _corpus(chars):
+    rng = random.Random(0)
+    texts, total = [], 0
+    while total < chars:
+        text = ' '.join(rng.choice(_SAMPLES) for _ in range(rng.randint(1, 4)))
+        texts.append(text)
+        total += len(text)
+    return texts, total
+
+
+_WHITESPACE = re.compile(r'\s+')
+_REPEATS = re.compile(r'([!?.,।])\1+')
+_NAIVE_REPLACEMENTS = [('\u200c', ''), ('\u200d', ''), ('\u200b', ' '), ('\u2018', "'"), ('\u2019', "'"),
+                       ('\u201c', '"'), ('\u201d', '"'), ('\u2013', '-'), ('\u2014', '-'), ('\u2026', '...')]
+_NAIVE_REPLACEMENTS += [(digit, str(i)) for i, digit in enumerate('০১২৩৪৫৬৭৮৯')]
+
+
+def _naive(text):
+    """Roughly the same steps with one str.replace() per mapped character."""
+    text = unicodedata.normalize('NFC', text).lower()
+    for old, new in _NAIVE_REPLACEMENTS:
+        text = text.replace(old, new)
+    return _WHITESPACE.sub(' ', _REPEATS.sub(r'\1', text)).strip()
+
+
+class Command(BaseCommand):
+    help = "Measure Bangla normalization and tokenization throughput in characters per second"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chars', type=int, default=5_000_000, help='Size of the generated corpus')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is reported')
+
+    def handle(self, *args, **options):
+        texts, total = _corpus(options['chars'])
+        self.stdout.write(f"{len(texts)} messages, {total} characters; best of {options['repeat']} runs\n")
+        rows = [
+            ('str.replace chain', lambda: [_naive(text) for text in texts]),
+            ('normalize() per message', lambda: [normalize(text) for text in texts]),
+            ('normalize_many()', lambda: normalize_many(texts)),
+            ('tokenize() per message', lambda: [tokenize(text) for text in texts]),
+        ]
+        header = f"{'method':<26} {'seconds':>9} {'M chars/s':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for label, fn in rows:
+            best = float('inf')
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - start)
+            self.stdout.write(f"{label:<26} {best:>9.3f} {total / best / 1e6:>10.1f}")
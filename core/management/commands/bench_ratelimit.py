@@ -0,0 +1,36 @@
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from core import ratelimit
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of the /api/chat/ rate limit and quota checks against the configured cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # High limits so every check runs to the end, as for an admitted request
+        client = SimpleNamespace(id=0, max_conversations=10 ** 9)
+        organization = SimpleNamespace(id=0, max_conversations=10 ** 9)
+        ratelimit.conversation_quota(client, 'warmup', organization)
+
+        timings = []
+        for i in range(options['requests']):
+            user = f'bench-{i % options["users"]}'
+            start = time.perf_counter()
+            ratelimit.token_bucket(f'bench:ip:{i % 256}', 10 ** 9, 10 ** 6)
+            ratelimit.sliding_window('bench:client:0', 10 ** 9, 60)
+            ratelimit.sliding_window(f'bench:user:0:{user}', 10 ** 9, 60)
+            ratelimit.conversation_quota(client, user, organization)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{options['requests']} checks: p50 {statistics.median(timings):.3f} ms, "
+            f"p99 {p99:.3f} ms, max {timings[-1]:.3f} ms")
@@ -0,0 +1,66 @@
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import retrieval
+
+
+WORDS = (
+    'অর্ডার ডেলিভারি পেমেন্ট বিকাশ নগদ রিটার্ন রিফান্ড সাইজ রং কটন টি-শার্ট জুতো শাড়ি পাঞ্জাবি '
+    'ব্যাগ ঘড়ি মোবাইল চার্জার কভার দাম ছাড় অফার স্টক ঢাকা চট্টগ্রাম সিলেট ক্যাশ অন '
+    'warranty size color cotton leather shoes bag watch charger cover discount offer'
+).split()
+
+QUERIES = [
+    'কটন টি-শার্টের দাম কত?',
+    'ডেলিভারি ঢাকায় কত দিনে হবে',
+    'বিকাশে পেমেন্ট করা যাবে?',
+    'leather bag discount',
+    'রিটার্ন রিফান্ড নিয়ম',
+    'SKU-4242 স্টকে আছে?',
+]
+
+
+def _documents(n, seed):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = rng.choices(WORDS, k=rng.randint(8, 40))
+        yield f'product:{i}', f"পণ্য {i} (SKU-{i}) - {rng.randint(100, 5000)} BDT. {' '.join(words)}"
+
+
+class Command(BaseCommand):
+    help = "Build a synthetic per-tenant retrieval index and measure query latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--dense-dim', type=int, default=64,
+                            help='Dense vector size (0 disables dense scoring)')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        if retrieval.np is None:
+            raise CommandError('numpy is required for the retrieval index')
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            retrieval.write_generation(directory, _documents(options['docs'], options['seed']),
+                                       dim=options['dense_dim'])
+            self.stdout.write(f"built {options['docs']} documents in {time.perf_counter() - start:.1f}s")
+
+            retrieval._loaded.pop(directory, None)
+            index = retrieval._open(retrieval.Path(directory))
+            index.search(QUERIES[0], 5)  # page in the arrays
+
+            timings = []
+            for i in range(options['queries']):
+                start = time.perf_counter()
+                index.search(QUERIES[i % len(QUERIES)], 5)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{options['queries']} queries: p50 {statistics.median(timings):.2f} ms, "
+                f"p95 {p95:.2f} ms, max {timings[-1]:.2f} ms")
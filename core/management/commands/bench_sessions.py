@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = "Compare logged-in page throughput across session backends (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Page to load (repeatable; default: /client-dashboard/ and /profile/)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/client-dashboard/', '/profile/']
+        with transaction.atomic():
+            user = get_user_model().objects.create(username='bench-sessions')
+            for backend, engine in settings.SESSION_ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    self._run(backend, user, paths, options['requests'])
+            transaction.set_rollback(True)
+
+    def _run(self, backend, user, paths, requests):
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+        for path in paths:
+            client.get(path)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for i in range(requests):
+                client.get(paths[i % len(paths)])
+            elapsed = time.perf_counter() - start
+        session_queries = sum('django_session' in query['sql'] for query in queries.captured_queries)
+        self.stdout.write(
+            f"{backend}: {requests / elapsed:.0f} pages/s, "
+            f"{session_queries / requests:.2f} session queries per page, "
+            f"{len(queries.captured_queries) / requests:.2f} queries per page")
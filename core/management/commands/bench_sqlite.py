@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.db.utils import ConnectionHandler
+
+MODES = {
+    'django': ('django.db.backends.sqlite3', {}),
+    'core': ('core.db.sqlite3', None),  # OPTIONS from settings
+}
+
+
+def _connection(engine, options, path):
+    return ConnectionHandler({'default': {'ENGINE': engine, 'NAME': path, 'OPTIONS': options}})['default']
+
+
+def _writer(engine, options, path, seconds, results):
+    # One chat turn per transaction, like chat_send: the message and the reply
+    connection = _connection(engine, options, path)
+    commits = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            with connection.cursor() as cursor:
+                cursor.execute("INSERT INTO bench_message (conversation, body) VALUES (%s, %s)", [os.getpid(), 'প্রশ্ন'])
+                cursor.execute("INSERT INTO bench_message (conversation, body) VALUES (%s, %s)", [os.getpid(), 'উত্তর'])
+            connection.commit()
+            commits += 1
+        except DatabaseError:
+            connection.rollback()
+            errors += 1
+        finally:
+            connection.set_autocommit(True)
+    connection.close()
+    results.put(('write', commits, errors, []))
+
+
+def _reader(engine, options, path, seconds, results):
+    connection = _connection(engine, options, path)
+    reads = errors = 0
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM bench_message WHERE conversation = %s", [reads % 8])
+                cursor.fetchone()
+            reads += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        except DatabaseError:
+            errors += 1
+    connection.close()
+    results.put(('read', reads, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = "Sustained concurrent SQLite writes and reads: Django's backend vs core.db.sqlite3 (temporary database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--timeout', type=float, default=5,
+                            help="Busy timeout in seconds for Django's backend (its default)")
+
+    def handle(self, *args, **options):
+        core_options = dict(settings.DATABASES['default'].get('OPTIONS', {}))
+        if settings.DATABASES['default']['ENGINE'] != 'core.db.sqlite3':
+            core_options = {'transaction_mode': 'IMMEDIATE'}
+        context = multiprocessing.get_context('fork')
+        for mode, (engine, mode_options) in MODES.items():
+            mode_options = core_options if mode_options is None else {'timeout': options['timeout']}
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                connection = _connection(engine, mode_options, path)
+                with connection.cursor() as cursor:
+                    cursor.execute("CREATE TABLE bench_message (id INTEGER PRIMARY KEY, conversation INTEGER, body TEXT)")
+                    cursor.execute("CREATE INDEX bench_message_conversation ON bench_message (conversation)")
+                connection.close()
+
+                results = context.Queue()
+                processes = [
+                    context.Process(target=target, args=(engine, mode_options, path, options['seconds'], results))
+                    for target, count in ((_writer, options['writers']), (_reader, options['readers']))
+                    for _ in range(count)
+                ]
+                for process in processes:
+                    process.start()
+                collected = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+
+            totals = {'write': [0, 0], 'read': [0, 0]}
+            latencies = []
+            for kind, done, errors, timings in collected:
+                totals[kind][0] += done
+                totals[kind][1] += errors
+                latencies.extend(timings)
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+            self.stdout.write(
+                f"{mode} ({engine}): {totals['write'][0] / options['seconds']:.0f} write txn/s, "
+                f"{totals['write'][1]} failed; {totals['read'][0] / options['seconds']:.0f} reads/s, "
+                f"{totals['read'][1]} failed, read p50 "
+                f"{statistics.median(latencies) if latencies else 0:.2f} ms, p99 {p99:.2f} ms")
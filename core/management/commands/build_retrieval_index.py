@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import retrieval
+from core.models import Client
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-client knowledge retrieval indexes from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client', type=int, action='append', dest='clients',
+                            help='Client id to rebuild (repeatable; default: all active clients)')
+
+    def handle(self, *args, **options):
+        if retrieval.np is None:
+            raise CommandError('numpy is required for the retrieval index')
+        client_ids = options['clients'] or list(
+            Client.objects.filter(is_active=True).values_list('id', flat=True))
+        for client_id in client_ids:
+            generation = retrieval.build_client_index(client_id)
+            meta = retrieval.fastjson.loads((generation / 'meta.json').read_bytes())
+            self.stdout.write(f"client {client_id}: {meta['n_docs']} documents -> {generation}")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(client_ids)} index(es)."))
@@ -0,0 +1,66 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Organization
+from core.importers import (
+    CHUNK_SIZE, FORMATS, ImportFormatError, IntentImporter, ProductImporter, detect_format, iter_records,
+)
+from core.models import Client
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products (on sku) or intents (on client + name) from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['products', 'intents'])
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--organization', type=int,
+                            help='Organization id owning imported products (required for products)')
+        parser.add_argument('--client', type=int,
+                            help='Client id used for rows without a client_id column')
+        parser.add_argument('--format', dest='file_format', choices=FORMATS,
+                            help='Input format (default: detected from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Rows validated and written per statement (default: {CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        client = None
+        if options['client']:
+            client = Client.objects.filter(id=options['client']).first()
+            if client is None:
+                raise CommandError(f"Client {options['client']} not found")
+
+        if options['kind'] == 'products':
+            if not options['organization']:
+                raise CommandError('--organization is required when importing products')
+            organization = Organization.objects.filter(id=options['organization']).first()
+            if organization is None:
+                raise CommandError(f"Organization {options['organization']} not found")
+            importer = ProductImporter(organization, client=client, chunk_size=options['chunk_size'])
+        else:
+            importer = IntentImporter(client=client, chunk_size=options['chunk_size'])
+
+        path = options['path']
+        fmt = options['file_format'] or detect_format(filename=path)
+        if fmt is None:
+            raise CommandError('Could not detect the input format; pass --format csv or --format ndjson')
+
+        try:
+            if path == '-':
+                result = importer.run(iter_records(sys.stdin.buffer, fmt))
+            else:
+                with open(path, 'rb') as f:
+                    result = importer.run(iter_records(f, fmt))
+        except (OSError, ImportFormatError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {error['errors']}"))
+        if result['errors_truncated']:
+            self.stdout.write(self.style.WARNING(
+                f"... {result['error_count'] - len(result['errors'])} more errors not shown"))
+        style = self.style.SUCCESS if not result['error_count'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Processed {result['processed']} rows: {result['upserted']} upserted, "
+            f"{result['error_count']} rejected"))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core.db import partitions, sharding
+
+
+class Command(BaseCommand):
+    help = ("Create the coming monthly partitions of the conversation tables and detach expired ones "
+            "(PostgreSQL; run from cron, e.g. daily)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='Database alias (repeatable; default: every alias in DATABASE_SHARDS)')
+        parser.add_argument('--ahead', type=int, default=None,
+                            help='Months to create after the current one (default: PARTITION_MONTHS_AHEAD)')
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Detach partitions that ended more than this many months ago; 0 keeps '
+                                 'everything (default: PARTITION_RETAIN_MONTHS)')
+
+    def handle(self, *args, **options):
+        ahead = options['ahead'] if options['ahead'] is not None else getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+        retain = options['retain_months']
+        if retain is None:
+            retain = getattr(settings, 'PARTITION_RETAIN_MONTHS', 0)
+        if ahead < 0 or retain < 0:
+            raise CommandError("--ahead and --retain-months cannot be negative")
+        current = partitions.month_start(timezone.now())
+
+        for alias in options['databases'] or sharding.shard_aliases():
+            connection = connections[alias]
+            if connection.vendor != 'postgresql':
+                self.stdout.write(f"{alias}: {connection.vendor} tables are not partitioned; skipped.")
+                continue
+            for table, column in partitions.partitioned_tables():
+                for name, moved in partitions.ensure_partitions(connection, table, column, ahead):
+                    self.stdout.write(f"{alias}: created {name}" + (f", moved {moved} row(s) into it" if moved else ''))
+                if retain:
+                    before = partitions.add_months(current, -retain)
+                    for name in partitions.detach_partitions(connection, table, before):
+                        self.stdout.write(f"{alias}: detached {name}")
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
@@ -0,0 +1,146 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from accounts.models import Organization
+from core.db import partitions, sharding
+from core.models import Client, TenantShard
+
+
+class Command(BaseCommand):
+    help = ("Move an organization's (or a standalone client's) conversation data to another shard "
+            "in batches while it keeps serving; writes pause only for the final catch-up")
+
+    def add_arguments(self, parser):
+        tenant = parser.add_mutually_exclusive_group(required=True)
+        tenant.add_argument('--organization', type=int)
+        tenant.add_argument('--client', type=int)
+        parser.add_argument('--to', required=True, help='Target database alias from DATABASE_SHARDS')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches so live traffic gets the databases')
+        parser.add_argument('--settle', type=float, default=None,
+                            help='Seconds for every worker to see a shard map change '
+                                 '(default: INVALIDATION_POLL_INTERVAL + 5)')
+
+    def handle(self, *args, **options):
+        organization_id, client_id, target = options['organization'], options['client'], options['to']
+        aliases = sharding.shard_aliases()
+        if target not in aliases:
+            raise CommandError(f"{target!r} is not one of DATABASE_SHARDS: {', '.join(aliases)}")
+        if organization_id is not None and not Organization.objects.filter(id=organization_id).exists():
+            raise CommandError(f"Organization {organization_id} does not exist")
+        if client_id is not None:
+            client = Client.objects.filter(id=client_id).only('organization_id').first()
+            if client is None:
+                raise CommandError(f"Client {client_id} does not exist")
+            if client.organization_id:
+                raise CommandError(f"Client {client_id} follows organization {client.organization_id}; move that")
+        source = sharding.shard_for(organization_id, client_id)
+        if source == target:
+            raise CommandError(f"The tenant is already on {target}")
+        if connections[target].vendor == 'sqlite' and aliases.index(target) < aliases.index(source):
+            # SQLite allocates ids above the largest one in the table, which would then
+            # be in the source shard's range
+            raise CommandError("On SQLite, tenants can only move to a shard later in DATABASE_SHARDS")
+
+        self.batch_size, self.pause = options['batch_size'], options['pause']
+        settle = options['settle']
+        if settle is None:
+            settle = getattr(settings, 'INVALIDATION_POLL_INTERVAL', 1.0) + 5
+        tenant = {'organization_id': organization_id} if organization_id is not None else {'client_id': client_id}
+
+        # Copy while the tenant keeps using the source, then again for what changed meanwhile
+        self.stdout.write(f"Copied {self._sync(source, target, tenant)} row(s) from {source} to {target}.")
+        self.stdout.write(f"Caught up {self._sync(source, target, tenant)} changed row(s).")
+
+        # Refuse the tenant's writes until the last changes are copied. The pause lets
+        # every worker see the frozen state and requests already writing finish.
+        self._place(tenant, source, 'frozen')
+        try:
+            time.sleep(settle)
+            changed = self._sync(source, target, tenant)
+        except BaseException:
+            self._place(tenant, source, 'active')
+            raise
+        self._place(tenant, target, 'active')
+        self.stdout.write(f"Copied {changed} row(s) while frozen; the tenant is now on {target}.")
+
+        # Workers that have not seen the switch yet still read the source
+        time.sleep(settle)
+        deleted = self._delete(source, tenant)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} row(s) from {source}."))
+
+    def _place(self, tenant, alias, state):
+        TenantShard.objects.update_or_create(**tenant, defaults={'alias': alias, 'state': state})
+
+    def _sync(self, source, target, tenant):
+        """Make the tenant's rows on ``target`` equal those on ``source``; rows written or deleted."""
+        changed = 0
+        for (model, source_rows), (_, target_rows) in zip(sharding.tenant_querysets(source, **tenant),
+                                                          sharding.tenant_querysets(target, **tenant)):
+            changed += self._sync_model(model, source_rows, target_rows, target)
+        return changed
+
+    def _sync_model(self, model, source_rows, target_rows, target):
+        fields = model._meta.concrete_fields
+        names = [field.attname for field in fields]
+        pk = names.index(model._meta.pk.attname)
+        changed = 0
+        last = None
+        while True:
+            rows = source_rows.order_by('pk')
+            if last is not None:
+                rows = rows.filter(pk__gt=last)
+            rows = list(rows.values_list(*names)[:self.batch_size])
+            if not rows:
+                break
+            existing = {row[pk]: row for row in target_rows.filter(
+                pk__gte=rows[0][pk], pk__lte=rows[-1][pk]).values_list(*names)}
+            different = [row for row in rows if existing.get(row[pk]) != row]
+            if different:
+                self._upsert(connections[target], model, fields, different)
+            gone = set(existing) - {row[pk] for row in rows}
+            if gone:
+                model._base_manager.using(target).filter(pk__in=gone).delete()
+            changed += len(different) + len(gone)
+            last = rows[-1][pk]
+            time.sleep(self.pause)
+        # Deleted from the source after they were copied
+        stale = target_rows if last is None else target_rows.filter(pk__gt=last)
+        while True:
+            pks = list(stale.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            model._base_manager.using(target).filter(pk__in=pks).delete()
+            changed += len(pks)
+        return changed
+
+    def _upsert(self, connection, model, fields, rows):
+        # Plain SQL: bulk_create() would overwrite auto_now and auto_now_add timestamps
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        values = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+        updates = ', '.join(f"{quote(field.column)} = excluded.{quote(field.column)}"
+                            for field in fields if not field.primary_key)
+        params = [field.get_db_prep_save(value, connection) for row in rows for field, value in zip(fields, row)]
+        # A partitioned table's unique key includes its partition column
+        conflict = [model._meta.pk.column, partitions.partition_key(model, connection)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES {values} "
+                f"ON CONFLICT ({', '.join(quote(c) for c in conflict if c)}) DO UPDATE SET {updates}", params)
+
+    def _delete(self, source, tenant):
+        deleted = 0
+        # Children first, so each batch deletes only its own rows
+        for model, rows in reversed(list(sharding.tenant_querysets(source, **tenant))):
+            while True:
+                pks = list(rows.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+                if not pks:
+                    break
+                deleted += model._base_manager.using(source).filter(pk__in=pks).delete()[0]
+                time.sleep(self.pause)
+        return deleted
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core import purge
+
+
+class Command(BaseCommand):
+    help = ("Delete soft-deleted organizations, clients and AI agents with their dependent rows "
+            "in small batches (run from cron, e.g. every minute)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches so live traffic gets the databases')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        while True:
+            job = purge.claim_job()
+            if job is None:
+                break
+            self.stdout.write(f"Purging {job.target} {job.object_id} ({job.name})...")
+            if purge.run_job(job, options['batch_size'], options['pause']):
+                job.refresh_from_db()
+                self.stdout.write(f"  deleted {job.rows_deleted} row(s)")
+                done += 1
+            else:
+                failed += 1
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f"Purged {done} object(s); {failed} failed (see the Purge Jobs admin)."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core import search
+from core.db import sharding
+
+
+class Command(BaseCommand):
+    help = ("Recompute the full-text search terms of messages and conversations in batches, e.g. after "
+            "upgrading or changing the tokenizer, and create missing full-text indexes")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches so live traffic gets the databases')
+
+    def handle(self, *args, **options):
+        batch_size, pause = options['batch_size'], options['pause']
+        for alias in sharding.shard_aliases():
+            for table in search.ensure_indexes(alias):
+                self.stdout.write(f"{alias}: created the full-text index of {table}")
+        for model in search.searchable_models():
+            aliases = sharding.shard_aliases() if sharding.is_sharded(model) else (DEFAULT_DB_ALIAS,)
+            for alias in aliases:
+                rows = model._base_manager.using(alias).only('pk', 'search_terms', *model.SEARCH_FIELDS)
+                updated, last = 0, None
+                while True:
+                    batch = list((rows if last is None else rows.filter(pk__gt=last)).order_by('pk')[:batch_size])
+                    if not batch:
+                        break
+                    changed = []
+                    for row in batch:
+                        terms = row.get_search_terms()
+                        if terms != row.search_terms:
+                            row.search_terms = terms
+                            changed.append(row)
+                    if changed:
+                        model._base_manager.using(alias).bulk_update(changed, ['search_terms'])
+                    updated += len(changed)
+                    last = batch[-1].pk
+                    time.sleep(pause)
+                self.stdout.write(f"{alias}: {model._meta.label}: updated {updated} row(s)")
+        self.stdout.write(self.style.SUCCESS("Search terms are up to date."))
@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+from core.db import partitions
+
+
+class Command(BaseCommand):
+    help = "Load a tenant's archived conversation data back into its database"
+
+    def add_arguments(self, parser):
+        tenant = parser.add_mutually_exclusive_group(required=True)
+        tenant.add_argument('--organization', type=int)
+        tenant.add_argument('--client', type=int)
+        parser.add_argument('--month', action='append', default=[],
+                            help='YYYY-MM to restore (repeatable; default: every archived month)')
+        parser.add_argument('paths', nargs='*', help="Archive files (default: the tenant's files)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        tenant = {'organization_id': options['organization'], 'client_id': options['client']}
+        paths = options['paths']
+        if not paths:
+            for value in options['month'] or [None]:
+                start = end = None
+                if value is not None:
+                    try:
+                        start = datetime.datetime.strptime(value, '%Y-%m').replace(tzinfo=datetime.timezone.utc)
+                    except ValueError:
+                        raise CommandError(f"--month takes YYYY-MM, not {value!r}")
+                    end = partitions.add_months(start, 1)
+                paths += archive.archive_files(**tenant, start=start, end=end)
+        if not paths:
+            raise CommandError(f"No archive files for {archive.tenant_key(**tenant)}")
+        total = 0
+        for path in paths:
+            restored = archive.restore(path, **tenant, batch_size=options['batch_size'])
+            self.stdout.write(f"{path}: restored {restored} row(s)")
+            total += restored
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {total} row(s). The archive files are kept; delete them once no longer needed."))
@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from accounts.models import User, Organization
-from core.models import Client, BanglaIntent, Product
+from core.models import Client
+from core.importers import IntentImporter, ProductImporter
 
 class Command(BaseCommand):
     help = "Seed demo data: organization, client, intents, products, and approve org"
@@ -36,49 +37,42 @@ class Command(BaseCommand):
             }
         )
 
-        # Intents
-        BanglaIntent.objects.get_or_create(
-            client=client,
-            name='order_status',
-            defaults={
+        # Intents and products go through the bulk importers, so re-running the command
+        # updates the demo rows in place
+        IntentImporter(client=client).run(enumerate([
+            {
+                'name': 'order_status',
                 'training_phrase': 'অর্ডারের অবস্থা জানতে চাই',
                 'ai_response_template': 'আপনার অর্ডারের অবস্থা: {{status}}',
                 'description': 'Order status inquiry',
-                'examples': ['আমার অর্ডার কোথায়?', 'অর্ডার স্ট্যাটাস'],
+                'examples': ['আমার অর্ডার কোথায়?', 'অর্ডার স্ট্যাটাস'],
                 'responses': ['আপনার অর্ডার প্রক্রিয়াধীন আছে'],
                 'is_active': True,
-            }
-        )
+            },
+        ], start=1))
 
-        # Products
-        Product.objects.get_or_create(
-            sku='SKU-100',
-            defaults={
-                'client': client,
-                'organization': org,
+        ProductImporter(org, client=client).run(enumerate([
+            {
+                'sku': 'SKU-100',
                 'name': 'টি-শার্ট',
                 'description': 'উচ্চমানের কটন টি-শার্ট',
                 'price': 499,
                 'currency': 'BDT',
                 'in_stock': True,
-                'stock_qty': 50,
+                'qty': 50,
                 'is_active': True,
-            }
-        )
-        Product.objects.get_or_create(
-            sku='SKU-200',
-            defaults={
-                'client': client,
-                'organization': org,
+            },
+            {
+                'sku': 'SKU-200',
                 'name': 'জুতো',
                 'description': 'দীর্ঘস্থায়ী এবং আরামদায়ক',
                 'price': 1299,
                 'currency': 'BDT',
                 'in_stock': False,
-                'stock_qty': 0,
+                'qty': 0,
                 'is_active': True,
-            }
-        )
+            },
+        ], start=1))
 
         self.stdout.write(self.style.SUCCESS('Demo data seeded successfully.'))
 
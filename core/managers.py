@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class LiveManager(models.Manager):
+    """
+    Default manager of models deleted through ``core.purge.schedule``: rows waiting to be
+    purged are hidden. Related-object access and deletion use ``_base_manager``, which
+    still sees them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
@@ -0,0 +1,173 @@
+"""
+Usage metering with in-memory per-tenant counters flushed to ``Usage`` in batches.
+
+``record()`` adds to a counter in process memory and never touches the database.
+The counts are written as one batched upsert that adds to each tenant's row for
+the day:
+
+- from the ``request_finished`` signal, at most every ``USAGE_FLUSH_INTERVAL``
+  seconds (default 5), after the response has been sent;
+- at process exit;
+- whenever ``flush()`` is called (management commands, tests).
+
+A worker killed without a clean shutdown loses at most what it recorded since its
+last flush. A failed flush keeps the counts for the next one.
+
+Usage is kept for the client and, when known, its organization, so quotas and
+billing can be read at either level. ``get_usage`` and ``get_daily_usage`` include
+this process's unflushed counts.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+METRICS = ('chats', 'tokens', 'voice_seconds', 'tts_characters')
+# Counts kept across failed flushes before new ones are dropped
+MAX_PENDING_KEYS = 50000
+
+# (scope, scope_id, metric, date) -> amount
+_pending = Counter()
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+# Database the pending counts were recorded against
+_database = None
+
+
+def record(metric, amount=1, client_id=None, organization_id=None):
+    """Count ``amount`` of ``metric`` for a client and/or organization."""
+    global _database
+    if metric not in METRICS:
+        raise ValueError(f"Unknown usage metric: {metric}")
+    amount = int(round(amount or 0))
+    if not amount:
+        return
+    today = timezone.now().date()
+    with _lock:
+        if client_id:
+            _pending[('client', int(client_id), metric, today)] += amount
+        if organization_id:
+            _pending[('organization', int(organization_id), metric, today)] += amount
+        _database = connection.settings_dict.get('NAME')
+
+
+def _upsert(batch):
+    from core.models import Usage
+    now = timezone.now()
+    if connection.vendor in ('sqlite', 'postgresql'):
+        quote = connection.ops.quote_name
+        table = quote(Usage._meta.db_table)
+        columns = ', '.join(quote(Usage._meta.get_field(name).column)
+                            for name in ('scope', 'scope_id', 'metric', 'date', 'value', 'updated_at'))
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT ({quote('scope')}, {quote('scope_id')}, {quote('metric')}, {quote('date')}) "
+            f"DO UPDATE SET {quote('value')} = {table}.{quote('value')} + EXCLUDED.{quote('value')}, "
+            f"{quote('updated_at')} = EXCLUDED.{quote('updated_at')}"
+        )
+        updated_at = connection.ops.adapt_datetimefield_value(now)
+        params = [
+            (scope, scope_id, metric, connection.ops.adapt_datefield_value(day), value, updated_at)
+            for (scope, scope_id, metric, day), value in batch.items()
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        return
+    with transaction.atomic():
+        for (scope, scope_id, metric, day), value in batch.items():
+            bucket = Usage.objects.filter(scope=scope, scope_id=scope_id, metric=metric, date=day)
+            if not bucket.update(value=F('value') + value, updated_at=now):
+                Usage.objects.create(scope=scope, scope_id=scope_id, metric=metric, date=day, value=value)
+
+
+def flush():
+    """Write pending counts to ``Usage``; returns the number of buckets written."""
+    global _last_flush
+    with _flush_lock:
+        with _lock:
+            batch = dict(_pending)
+            _pending.clear()
+        _last_flush = time.monotonic()
+        if not batch:
+            return 0
+        try:
+            _upsert(batch)
+        except Exception as e:
+            logger.error(f"Usage flush failed, keeping {len(batch)} buckets for the next one: {str(e)}")
+            with _lock:
+                if len(_pending) + len(batch) <= MAX_PENDING_KEYS:
+                    _pending.update(batch)
+            return 0
+        return len(batch)
+
+
+@receiver(request_finished, dispatch_uid='metering_flush_after_request')
+def _flush_after_request(sender, **kwargs):
+    if _pending and time.monotonic() - _last_flush >= getattr(settings, 'USAGE_FLUSH_INTERVAL', 5):
+        flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    # The test runner points the connection back at the development database before
+    # exit; counts recorded against the test database must not land there
+    if _pending and connection.settings_dict.get('NAME') == _database:
+        flush()
+
+
+# Reading
+
+def _pending_for(scope, scope_id, start, end):
+    with _lock:
+        return [
+            (metric, day, value)
+            for (pending_scope, pending_id, metric, day), value in _pending.items()
+            if pending_scope == scope and pending_id == int(scope_id) and start <= day <= end
+        ]
+
+
+def billing_period(start=None, end=None):
+    """``(start, end)`` dates, defaulting to the current month to date."""
+    today = timezone.now().date()
+    return start or today.replace(day=1), end or today
+
+
+def get_usage(scope, scope_id, start=None, end=None):
+    """
+    ``{metric: total}`` for a ``'client'`` or ``'organization'`` between ``start`` and
+    ``end`` (dates, inclusive). Defaults to the current month to date.
+    """
+    from core.models import Usage
+    start, end = billing_period(start, end)
+    totals = dict.fromkeys(METRICS, 0)
+    rows = (Usage.objects.filter(scope=scope, scope_id=scope_id, date__range=(start, end))
+            .values_list('metric').annotate(total=Sum('value')).order_by())
+    for metric, total in rows:
+        totals[metric] = totals.get(metric, 0) + total
+    for metric, _, value in _pending_for(scope, scope_id, start, end):
+        totals[metric] += value
+    return totals
+
+
+def get_daily_usage(scope, scope_id, start=None, end=None):
+    """``[{'date', metric: value, ...}]`` per day for billing, oldest first."""
+    from core.models import Usage
+    start, end = billing_period(start, end)
+    days = {}
+    rows = Usage.objects.filter(scope=scope, scope_id=scope_id, date__range=(start, end)).values_list(
+        'metric', 'date', 'value')
+    for metric, day, value in [*rows, *_pending_for(scope, scope_id, start, end)]:
+        days.setdefault(day, dict.fromkeys(METRICS, 0))[metric] += value
+    return [{'date': day.isoformat(), **days[day]} for day in sorted(days)]
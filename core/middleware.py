@@ -0,0 +1,178 @@
+"""
+Route-aware middleware.
+
+Session, CSRF, authentication and message middleware that skip stateless routes.
+
+These are drop-in subclasses of Django's middleware, listed in ``MIDDLEWARE`` in
+place of the originals. On a stateless route each one passes the request straight
+through:
+
+- ``WEBHOOK_PATH_PREFIXES`` (Twilio, WhatsApp, Facebook and other webhooks) are
+  always stateless. They authenticate by URL or signature and never use a session.
+- ``API_PATH_PREFIXES`` are stateless unless the request carries the session
+  cookie. Token and API key clients skip the session stack, and the in-app
+  pages that call ``/api/`` with the browser session keep working.
+
+``request.user`` is ``AnonymousUser`` on stateless routes until DRF authenticates the
+request. DRF views enforce CSRF for session-authenticated requests themselves.
+
+``StatementTimeoutMiddleware`` sets the Postgres ``statement_timeout`` of each request
+from ``DB_STATEMENT_TIMEOUTS`` by route class: webhook, api, admin or page.
+
+``TenantShardMiddleware`` pins each request's conversation queries to its tenant's
+shard (core/db/sharding.py).
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware as BaseMessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.middleware.csrf import CsrfViewMiddleware as BaseCsrfViewMiddleware
+
+from core.db import sharding
+from core.http import JsonResponse
+
+
+def is_stateless(request):
+    """True when ``request`` is for a webhook, or an API call without a session cookie."""
+    try:
+        return request._stateless_route
+    except AttributeError:
+        pass
+    path = request.path_info
+    stateless = path.startswith(tuple(getattr(settings, 'WEBHOOK_PATH_PREFIXES', ()))) or (
+        path.startswith(tuple(getattr(settings, 'API_PATH_PREFIXES', ())))
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+    request._stateless_route = stateless
+    return stateless
+
+
+class _StatelessRouteMixin:
+    def __call__(self, request):
+        if is_stateless(request):
+            self.skip(request)
+            return self.get_response(request)
+        return super().__call__(request)
+
+    def skip(self, request):
+        pass
+
+
+class SessionMiddleware(_StatelessRouteMixin, BaseSessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(_StatelessRouteMixin, BaseCsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_stateless(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(_StatelessRouteMixin, BaseAuthenticationMiddleware):
+    def skip(self, request):
+        request.user = AnonymousUser()
+
+
+class MessageMiddleware(_StatelessRouteMixin, BaseMessageMiddleware):
+    pass
+
+
+# Statement timeouts
+
+def route_class(request):
+    """``'webhook'``, ``'api'``, ``'admin'`` or ``'page'``."""
+    path = request.path_info
+    for name, prefixes in (('webhook', 'WEBHOOK_PATH_PREFIXES'), ('api', 'API_PATH_PREFIXES'),
+                           ('admin', 'ADMIN_PATH_PREFIXES')):
+        if path.startswith(tuple(getattr(settings, prefixes, ()))):
+            return name
+    return 'page'
+
+
+class _StatementTimeout:
+    """Execute wrapper that sets ``statement_timeout`` before the first query that needs it."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.set_in_transaction = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context['connection']
+        if getattr(connection, '_statement_timeout', None) != self.timeout:
+            # The raw cursor, so this statement does not come back through the wrapper
+            context['cursor'].cursor.execute(f"SET statement_timeout = {int(self.timeout)}")
+            connection._statement_timeout = self.timeout
+            if connection.in_atomic_block:
+                self.set_in_transaction.add(connection.alias)
+        return execute(sql, params, many, context)
+
+
+class StatementTimeoutMiddleware:
+    """
+    Postgres ``statement_timeout`` per route class. A connection kept open across
+    requests only gets a ``SET`` when the route class changes; a pooled connection
+    gets one per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.aliases = [alias for alias in connections if connections[alias].vendor == 'postgresql']
+        if not self.aliases or not getattr(settings, 'DB_STATEMENT_TIMEOUTS', None):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        wrapper = _StatementTimeout(settings.DB_STATEMENT_TIMEOUTS.get(route_class(request), 0))
+        try:
+            with ExitStack() as stack:
+                for alias in self.aliases:
+                    stack.enter_context(connections[alias].execute_wrapper(wrapper))
+                return self.get_response(request)
+        finally:
+            # A rolled back transaction also undoes its SET
+            for alias in wrapper.set_in_transaction:
+                connections[alias]._statement_timeout = None
+
+
+@receiver(connection_created, dispatch_uid='statement_timeout_new_connection')
+def _new_connection(sender, connection, **kwargs):
+    # New and pooled connections may have any timeout
+    connection._statement_timeout = None
+
+
+# Tenant shards
+
+class TenantShardMiddleware:
+    """
+    Pins the request to the ``organization_id`` of its URL (webhooks) or, at the first
+    sharded query, to the authenticated user's organization. Writes for a tenant
+    frozen by ``move_tenant`` get a 503 with ``Retry-After``. Unused with one shard.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if len(sharding.shard_aliases()) == 1:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        with sharding.request_scope(request):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if 'organization_id' in view_kwargs:
+            sharding.pin(organization_id=view_kwargs['organization_id'])
+        return None
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, sharding.TenantMoving):
+            response = JsonResponse({'error': 'Tenant data is being moved, retry shortly'}, status=503)
+            response['Retry-After'] = str(int(getattr(settings, 'INVALIDATION_POLL_INTERVAL', 1)) + 5)
+            return response
+        return None
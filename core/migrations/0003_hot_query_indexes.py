@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(fields=['client', 'user_name', '-created_at'], name='bconv_client_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(condition=models.Q(('ai_confidence__lt', 0.5)), fields=['client', 'user_name'], name='bconv_low_conf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(fields=['user_name', '-created_at'], name='bconv_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(fields=['-created_at'], name='bconv_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(fields=['status'], name='bconv_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banglaconversation',
+            index=models.Index(condition=models.Q(('is_escalated', True)), fields=['is_escalated'], name='bconv_escalated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['client', '-timestamp'], name='calllog_client_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['-timestamp'], name='calllog_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['caller_name'], name='calllog_caller_idx'),
+        ),
+    ]
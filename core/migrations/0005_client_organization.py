@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hot_query_indexes'),
+        ('core', '0004_invalidation_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clients', to='accounts.organization'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_client_organization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Usage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('client', 'Client'), ('organization', 'Organization')], max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField()),
+                ('metric', models.CharField(choices=[('chats', 'Chat messages'), ('tokens', 'AI tokens'), ('voice_seconds', 'Voice seconds'), ('tts_characters', 'TTS characters')], max_length=30)),
+                ('date', models.DateField()),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Usage',
+                'verbose_name_plural': 'Usage',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'scope_id', 'metric', 'date'), name='usage_bucket_unique')],
+            },
+        ),
+    ]
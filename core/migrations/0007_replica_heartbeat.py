@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaHeartbeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('written_at', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Replica Heartbeat',
+                'verbose_name_plural': 'Replica Heartbeats',
+            },
+        ),
+    ]
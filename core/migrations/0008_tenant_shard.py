@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_organization_api_key'),
+        ('core', '0007_replica_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banglaconversation',
+            name='client',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='core.client'),
+        ),
+        migrations.AlterField(
+            model_name='calllog',
+            name='client',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='call_logs', to='core.client'),
+        ),
+        migrations.CreateModel(
+            name='TenantShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(help_text='Database alias listed in DATABASE_SHARDS', max_length=64)),
+                ('state', models.CharField(choices=[('active', 'Active'), ('frozen', 'Frozen for a move')], default='active', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shard', to='core.client')),
+                ('organization', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shard', to='accounts.organization')),
+            ],
+            options={
+                'verbose_name': 'Tenant Shard',
+                'verbose_name_plural': 'Tenant Shards',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('client__isnull', True), ('organization__isnull', False)), models.Q(('client__isnull', False), ('organization__isnull', True)), _connector='OR'), name='tenantshard_one_tenant')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from core.db import partitions
+
+
+def partition_tables(apps, schema_editor):
+    # Range partitioning exists on PostgreSQL only; other databases keep plain tables
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in partitions.partitioned_tables(apps):
+        partitions.partition_table(schema_editor.connection, table, column)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_tenant_shard'),
+        ('chat', '0003_shard_foreign_keys'),
+        ('social_media', '0003_shard_foreign_keys'),
+        ('voice', '0005_speechsynthesis_message_no_constraint'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned tables work with the earlier schema too
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
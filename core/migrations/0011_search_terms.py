@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banglaconversation',
+            name='search_terms',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
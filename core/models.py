@@ -3,6 +3,9 @@ from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from core.managers import LiveManager
+from core.search import Searchable
+
 
 class Client(models.Model):
     """Client model for multi-business support"""
@@ -18,13 +21,22 @@ class Client(models.Model):
     website = models.URLField(blank=True)
     phone = models.CharField(max_length=15, blank=True)
     
+    # Owning organization; its subscription quota applies to all of its clients
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.SET_NULL,
+                                     null=True, blank=True, related_name='clients')
+    
     # Settings
+    # New conversations (distinct chat users) per calendar month
     max_conversations = models.PositiveIntegerField(default=1000)
     max_voice_minutes = models.PositiveIntegerField(default=100)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the client is deleted; purge_deleted then removes it and its data (core/purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
     
     class Meta:
         verbose_name = _('Client')
@@ -35,8 +47,10 @@ class Client(models.Model):
         return self.name
 
 
-class BanglaConversation(models.Model):
+class BanglaConversation(Searchable):
     """Simplified conversation model for BanglaChatPro requirements"""
+
+    SEARCH_FIELDS = ('user_name', 'user_message', 'ai_response')
     
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -45,7 +59,8 @@ class BanglaConversation(models.Model):
         ('abandoned', 'Abandoned'),
     ]
     
-    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='conversations')
+    # Control rows live on the default database, so no constraint (core/db/sharding.py)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='conversations', db_constraint=False)
     user_name = models.CharField(max_length=100)
     user_message = models.TextField()
     ai_response = models.TextField()
@@ -67,6 +82,19 @@ class BanglaConversation(models.Model):
         verbose_name = _('Bangla Conversation')
         verbose_name_plural = _('Bangla Conversations')
         ordering = ['-created_at']
+        indexes = [
+            # Chat history lookup: filter(client, user_name).order_by('-created_at')
+            models.Index(fields=['client', 'user_name', '-created_at'], name='bconv_client_user_created_idx'),
+            # Escalation check only ever counts low-confidence rows
+            models.Index(fields=['client', 'user_name'], name='bconv_low_conf_idx',
+                         condition=models.Q(ai_confidence__lt=0.5)),
+            # Client dashboard: per-user counts and recent conversations
+            models.Index(fields=['user_name', '-created_at'], name='bconv_user_created_idx'),
+            models.Index(fields=['-created_at'], name='bconv_created_idx'),
+            models.Index(fields=['status'], name='bconv_status_idx'),
+            models.Index(fields=['is_escalated'], name='bconv_escalated_idx',
+                         condition=models.Q(is_escalated=True)),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id} - {self.user_name}"
@@ -89,7 +117,8 @@ class CallLog(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     
     # Additional fields for better tracking
-    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='call_logs')
+    # Control rows live on the default database, so no constraint (core/db/sharding.py)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='call_logs', db_constraint=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     transcription = models.TextField(blank=True)
     ai_text_response = models.TextField(blank=True)
@@ -103,6 +132,11 @@ class CallLog(models.Model):
         verbose_name = _('Call Log')
         verbose_name_plural = _('Call Logs')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['client', '-timestamp'], name='calllog_client_ts_idx'),
+            models.Index(fields=['-timestamp'], name='calllog_ts_idx'),
+            models.Index(fields=['caller_name'], name='calllog_caller_idx'),
+        ]
     
     def __str__(self):
         return f"Call {self.id} - {self.caller_name}"
@@ -297,3 +331,152 @@ class Product(models.Model):
 
     def __str__(self):
         return f"{self.sku} - {self.name}"
+
+
+class InvalidationEvent(models.Model):
+    """Cache invalidation read by every worker (core.invalidation.DatabaseBus)."""
+    topic = models.CharField(max_length=50)
+    key = models.CharField(max_length=255, blank=True)
+    # Publishing process, which has already applied the event
+    origin = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('Invalidation Event')
+        verbose_name_plural = _('Invalidation Events')
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.topic}:{self.key or '*'}"
+
+
+class Usage(models.Model):
+    """Metered usage per tenant, metric and day, written in batches by core.metering."""
+
+    SCOPE_CHOICES = [
+        ('client', 'Client'),
+        ('organization', 'Organization'),
+    ]
+
+    METRIC_CHOICES = [
+        ('chats', 'Chat messages'),
+        ('tokens', 'AI tokens'),
+        ('voice_seconds', 'Voice seconds'),
+        ('tts_characters', 'TTS characters'),
+    ]
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveBigIntegerField()
+    metric = models.CharField(max_length=30, choices=METRIC_CHOICES)
+    date = models.DateField()
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Usage')
+        verbose_name_plural = _('Usage')
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id', 'metric', 'date'], name='usage_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.metric} {self.date} = {self.value}"
+
+
+class ReplicaHeartbeat(models.Model):
+    """Single row written on the primary; how far the replica's copy trails it is the replication lag (core.db.routers)."""
+    # time.time() on the primary; a plain number so raw SQL can compare it on any backend
+    written_at = models.FloatField()
+
+    class Meta:
+        verbose_name = _('Replica Heartbeat')
+        verbose_name_plural = _('Replica Heartbeats')
+
+    def __str__(self):
+        return f"heartbeat {self.written_at:.0f}"
+
+
+class TenantShard(models.Model):
+    """Database alias holding an organization's or a standalone client's conversation data (core.db.sharding)."""
+
+    STATE_CHOICES = [
+        ('active', 'Active'),
+        ('frozen', 'Frozen for a move'),
+    ]
+
+    organization = models.OneToOneField('accounts.Organization', on_delete=models.CASCADE,
+                                        null=True, blank=True, related_name='shard')
+    # Only for clients without an organization; the others follow their organization
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, null=True, blank=True, related_name='shard')
+    alias = models.CharField(max_length=64, help_text="Database alias listed in DATABASE_SHARDS")
+    # Frozen while move_tenant copies the last changes; writes for the tenant are refused
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='active')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Tenant Shard')
+        verbose_name_plural = _('Tenant Shards')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(organization__isnull=False, client__isnull=True)
+                | models.Q(organization__isnull=True, client__isnull=False),
+                name='tenantshard_one_tenant'),
+        ]
+
+    def __str__(self):
+        tenant = f"organization {self.organization_id}" if self.organization_id else f"client {self.client_id}"
+        return f"{tenant} -> {self.alias}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from core.db.sharding import shard_aliases, shard_for, tenant_querysets
+        if self.alias not in shard_aliases():
+            raise ValidationError({'alias': f"Not one of DATABASE_SHARDS: {', '.join(shard_aliases())}."})
+        if self.client_id and self.client.organization_id:
+            raise ValidationError({'client': "This client follows its organization's shard."})
+        if self.pk is None:
+            current = shard_for(self.organization_id, self.client_id)
+            if current != self.alias and any(
+                    rows.exists() for _, rows in tenant_querysets(current, self.organization_id, self.client_id)):
+                raise ValidationError({'alias': f"The tenant has data on {current}; use manage.py move_tenant."})
+
+
+class PurgeJob(models.Model):
+    """Batched deletion of a soft-deleted organization, client or AI agent and its dependent rows (core.purge)."""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    target = models.CharField(max_length=100, help_text="Model label, e.g. core.client")
+    object_id = models.PositiveBigIntegerField()
+    name = models.CharField(max_length=255, help_text="The deleted object, as it was displayed")
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    # Model whose rows the job is deleting now
+    current_model = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed after every batch; a running job that stops updating is picked up again
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Purge Job')
+        verbose_name_plural = _('Purge Jobs')
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'object_id'], name='purgejob_one_per_object'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='purgejob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target} {self.object_id} ({self.name}): {self.status}"
@@ -0,0 +1,156 @@
+"""
+Deleting organizations, clients and AI agents in the background.
+
+Deleting a large tenant in one request cascades through millions of conversations,
+messages and call logs under one transaction. It holds locks for minutes and times
+out. ``schedule`` instead soft-deletes the object: it sets ``deleted_at``, which hides
+it from the default manager (``core.managers.LiveManager``), deactivates it, and
+queues a ``PurgeJob``.
+
+``manage.py purge_deleted`` (cron, every minute) runs the queued jobs. A job walks the
+object's ``on_delete`` relations depth first. It deletes ``CASCADE`` dependents and
+clears ``SET_NULL`` references in batches of ``batch_size`` rows, each batch in its
+own short transaction, and sleeps ``pause`` seconds between batches. Sharded
+dependents are handled on every shard. The object itself is deleted last, once
+nothing depends on it, so the job's final ``delete()`` sends the usual signals but
+has nothing left to cascade to. A job that stops part way, for example because the
+process was killed, is picked up again after ``STALE_AFTER`` and continues with
+whatever rows are left.
+"""
+import datetime
+import logging
+import time
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.db import sharding
+from core.runtime import invalidate_runtime
+
+logger = logging.getLogger(__name__)
+
+
+# Models deleted through schedule()
+PURGED_MODELS = ('accounts.organization', 'core.client', 'chat.aiagent')
+
+# A running job not updated for this long is assumed dead and run again
+STALE_AFTER = datetime.timedelta(minutes=10)
+
+
+def schedule(instance, user=None):
+    """Soft-delete ``instance`` and queue the deletion of it and its dependents; returns the ``PurgeJob``."""
+    from core.models import PurgeJob
+    label = instance._meta.label_lower
+    if label not in PURGED_MODELS:
+        raise ValueError(f"{label} is not deleted in the background")
+    with transaction.atomic():
+        instance.deleted_at = timezone.now()
+        update_fields = ['deleted_at', 'updated_at']
+        if hasattr(instance, 'is_active'):
+            instance.is_active = False
+            update_fields.append('is_active')
+        elif hasattr(instance, 'status'):
+            instance.status = 'inactive'
+            update_fields.append('status')
+        # Saving also drops the cached runtimes through the invalidation bus
+        instance.save(update_fields=update_fields)
+        job, _ = PurgeJob.objects.get_or_create(
+            target=label, object_id=instance.pk,
+            defaults={'name': str(instance)[:255], 'requested_by': user})
+    return job
+
+
+def _dependents(model):
+    """``(related model, foreign key)`` of the rows whose ``on_delete`` deleting ``model`` rows applies."""
+    relations = [relation for relation in model._meta.related_objects
+                 if (relation.one_to_many or relation.one_to_one)
+                 and relation.on_delete in (models.CASCADE, models.SET_NULL)]
+    # Deleted rows no longer need their references cleared
+    relations.sort(key=lambda relation: relation.on_delete is not models.CASCADE)
+    return [(relation.related_model, relation.field) for relation in relations]
+
+
+def _aliases(model, related_model, alias):
+    # Sharded rows referencing a control row may be on any shard
+    if alias == DEFAULT_DB_ALIAS and sharding.is_sharded(related_model) and not sharding.is_sharded(model):
+        return sharding.shard_aliases()
+    return (alias,)
+
+
+class Purge:
+    """Deletes rows and what depends on them in bounded batches, reporting progress to a ``PurgeJob``."""
+
+    def __init__(self, job, batch_size=500, pause=0.05):
+        self.job = job
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def _progress(self, model, deleted=0):
+        from core.models import PurgeJob
+        PurgeJob.objects.filter(pk=self.job.pk).update(
+            rows_deleted=F('rows_deleted') + deleted, current_model=model._meta.label_lower,
+            updated_at=timezone.now())
+
+    def delete(self, rows):
+        """Delete the rows of the queryset ``rows`` and their dependents."""
+        model = rows.model
+        while True:
+            pks = list(rows.order_by().values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return
+            for related_model, field in _dependents(model):
+                for alias in _aliases(model, related_model, rows.db):
+                    dependents = related_model._base_manager.using(alias).filter(**{f'{field.name}__in': pks})
+                    if field.remote_field.on_delete is models.CASCADE:
+                        self.delete(dependents)
+                    else:
+                        self.clear(dependents, field)
+            with transaction.atomic(using=rows.db):
+                deleted, _ = model._base_manager.using(rows.db).filter(pk__in=pks).delete()
+            self._progress(model, deleted)
+            time.sleep(self.pause)
+
+    def clear(self, rows, field):
+        """Set ``field`` to NULL on the rows of ``rows``."""
+        while True:
+            pks = list(rows.order_by().values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return
+            rows.model._base_manager.using(rows.db).filter(pk__in=pks).update(**{field.attname: None})
+            self._progress(rows.model)
+            time.sleep(self.pause)
+
+
+def claim_job():
+    """Mark the next pending or stale job running and return it; None if there is none."""
+    from core.models import PurgeJob
+    stale = timezone.now() - STALE_AFTER
+    waiting = PurgeJob.objects.filter(Q(status='pending') | Q(status='running', updated_at__lt=stale))
+    for job in waiting.order_by('created_at')[:10]:
+        # Only one process wins the update
+        if waiting.filter(pk=job.pk).update(status='running', updated_at=timezone.now()):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job, batch_size=500, pause=0.05):
+    """Delete the job's object and its dependents; marks the job done or failed."""
+    from core.models import PurgeJob
+    model = apps.get_model(job.target)
+    client_ids = []
+    try:
+        if job.target == 'accounts.organization':
+            client_ids = sharding.keep_client_placements(job.object_id)
+        Purge(job, batch_size, pause).delete(model._base_manager.filter(pk=job.object_id))
+    except Exception as e:
+        logger.exception(f"Purge of {job.target} {job.object_id} failed")
+        PurgeJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), updated_at=timezone.now())
+        return False
+    # The organization's clients outlive it, but their cached runtimes still name it
+    for client_id in client_ids:
+        invalidate_runtime('client', client_id)
+    PurgeJob.objects.filter(pk=job.pk).update(status='done', error='', finished_at=timezone.now())
+    return True
@@ -0,0 +1,204 @@
+"""
+Query-plan audit for the hot queries behind chat, voice, social and dashboard requests.
+
+Each entry in ``HOT_QUERIES`` builds the queryset a view actually runs, using rows from
+``seed_dataset``. ``find_full_scans`` reads the EXPLAIN output for that queryset and
+reports table scans and sorts that are not served by an index.
+"""
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import Organization, User
+from chat.models import Conversation, Message
+from core.models import BanglaConversation, CallLog, BanglaIntent, Client, Product
+from social_media.models import SocialMediaAccount, SocialMediaMessage
+from voice.models import VoiceSession
+
+
+# Per-vendor patterns: (full table scan, sort that no index satisfies)
+PLAN_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)'),
+        re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT)'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan on (\w+)'),
+        re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE),
+    ),
+}
+
+
+def partial_index_names():
+    """Names of all conditional indexes declared on installed models."""
+    return {
+        index.name
+        for model in apps.get_models()
+        for index in model._meta.indexes
+        if index.condition is not None
+    }
+
+
+def find_full_scans(plan, vendor, partial_indexes=()):
+    """
+    Return (scanned_tables, has_sort) for an EXPLAIN plan string.
+
+    Walking a partial index end to end only touches the rows matching its condition,
+    so scans through one of ``partial_indexes`` are not reported.
+    """
+    try:
+        scan_re, sort_re = PLAN_PATTERNS[vendor]
+    except KeyError:
+        raise ValueError(f"Query-plan audit does not support the '{vendor}' backend")
+    scanned = [
+        match.group(1)
+        for match in scan_re.finditer(plan)
+        if not any(name in plan[match.end():].split('\n', 1)[0] for name in partial_indexes)
+    ]
+    return scanned, bool(sort_re.search(plan))
+
+
+def _today_start():
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# (name, builder) pairs; builders receive the sample dict returned by seed_dataset.
+HOT_QUERIES = [
+    ('chat_send: conversation history', lambda s: BanglaConversation.objects.filter(
+        client=s['client'], user_name=s['user_name']).order_by('-created_at')[:5]),
+    ('chat_send: low-confidence escalation count', lambda s: BanglaConversation.objects.filter(
+        client=s['client'], user_name=s['user_name'], ai_confidence__lt=0.5).order_by()),
+    ('client dashboard: user conversations', lambda s: BanglaConversation.objects.filter(
+        user_name=s['user_name']).order_by('-created_at')[:10]),
+    ('client dashboard: user voice calls', lambda s: CallLog.objects.filter(
+        caller_name=s['caller_name']).order_by()),
+    ('dashboards: escalated conversations', lambda s: BanglaConversation.objects.filter(
+        is_escalated=True).order_by()),
+    ('dashboards: active conversations', lambda s: BanglaConversation.objects.filter(
+        status='active').order_by()),
+    ('dashboards: conversations per day', lambda s: BanglaConversation.objects.filter(
+        created_at__gte=_today_start(), created_at__lt=_today_start() + timedelta(days=1)).order_by()),
+    ('dashboards: calls per day', lambda s: CallLog.objects.filter(
+        timestamp__gte=_today_start(), timestamp__lt=_today_start() + timedelta(days=1)).order_by()),
+    ('call logs per client', lambda s: CallLog.objects.filter(
+        client=s['client']).order_by('-timestamp')[:20]),
+    ('intents per client', lambda s: BanglaIntent.objects.filter(
+        client=s['client'], is_active=True).order_by()),
+    ('product availability by sku', lambda s: Product.objects.filter(
+        sku=s['sku'], is_active=True)),
+    ('twilio/social: conversation messages', lambda s: Message.objects.filter(
+        conversation=s['conversation'], timestamp__gte=s['conversation'].started_at).order_by('-timestamp')[:10]),
+    ('twilio: voice session by call sid', lambda s: VoiceSession.objects.filter(
+        session_id=s['session_id'])),
+    ('voice: user sessions', lambda s: VoiceSession.objects.filter(
+        user=s['user']).order_by('-started_at')[:20]),
+    ('voice: active sessions for user', lambda s: VoiceSession.objects.filter(
+        user=s['user'], status='active').order_by()),
+    ('social: account messages', lambda s: SocialMediaMessage.objects.filter(
+        social_account=s['social_account']).order_by('-received_at')[:20]),
+    ('social: organization messages', lambda s: SocialMediaMessage.objects.filter(
+        organization=s['organization']).order_by('-received_at')[:10]),
+    ('admin: organizations pending approval', lambda s: Organization.objects.filter(
+        approval_status='pending').order_by()),
+]
+
+
+def seed_dataset(rows, tenants=50):
+    """
+    Bulk-insert a synthetic multi-tenant dataset of roughly ``rows`` rows per hot table
+    and return a dict of sample values for the HOT_QUERIES builders.
+    """
+    tenants = max(2, min(tenants, rows))
+    statuses = ['approved', 'pending', 'rejected', 'suspended']
+    organizations = Organization.objects.bulk_create([
+        Organization(name=f'audit-org-{i}', approval_status='approved' if i % 10 else statuses[(i // 10) % 4])
+        for i in range(tenants)
+    ])
+    clients = Client.objects.bulk_create([
+        Client(name=f'audit-client-{i}', domain=f'audit{i}.test', contact_email=f'c{i}@audit.test')
+        for i in range(tenants)
+    ])
+    users = User.objects.bulk_create([
+        User(username=f'audit-user-{i}', organization=organizations[i % tenants])
+        for i in range(tenants * 4)
+    ])
+
+    BanglaConversation.objects.bulk_create([
+        BanglaConversation(
+            client=clients[i % tenants],
+            user_name=f'visitor-{i % (tenants * 20)}',
+            user_message='অর্ডার কোথায়?',
+            ai_response='আপনার অর্ডার প্রক্রিয়াধীন।',
+            ai_confidence=0.3 if i % 17 == 0 else 0.9,
+            is_escalated=i % 97 == 0,
+            status='active' if i % 13 == 0 else 'completed',
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+    CallLog.objects.bulk_create([
+        CallLog(client=clients[i % tenants], caller_name=f'caller-{i % (tenants * 20)}',
+                question='?', status='completed')
+        for i in range(rows)
+    ], batch_size=1000)
+    Product.objects.bulk_create([
+        Product(client=clients[i % tenants], organization=organizations[i % tenants],
+                name=f'Product {i}', sku=f'AUDIT-SKU-{i}')
+        for i in range(rows)
+    ], batch_size=1000)
+
+    conversations = Conversation.objects.bulk_create([
+        Conversation(user=users[i % len(users)], organization=organizations[i % tenants])
+        for i in range(max(tenants, rows // 10))
+    ], batch_size=1000)
+    Message.objects.bulk_create([
+        Message(conversation=conversations[i % len(conversations)], sender_type='user', content='হ্যালো')
+        for i in range(rows)
+    ], batch_size=1000)
+    VoiceSession.objects.bulk_create([
+        VoiceSession(conversation=conversation, user=conversation.user,
+                     session_id=f'CA{conversation.pk:032d}', status='completed')
+        for conversation in conversations
+    ], batch_size=1000)
+
+    accounts = SocialMediaAccount.objects.bulk_create([
+        SocialMediaAccount(organization=organizations[i % tenants], platform='whatsapp',
+                           account_name=f'wa-{i}', account_id=f'audit-wa-{i}')
+        for i in range(tenants * 2)
+    ])
+    SocialMediaMessage.objects.bulk_create([
+        SocialMediaMessage(
+            social_account=accounts[i % len(accounts)],
+            organization=accounts[i % len(accounts)].organization,
+            conversation=conversations[i % len(conversations)],
+            platform_message_id=f'wamid.audit.{i}', sender_id=f'8801{i % 5000:07d}', content='দাম কত?',
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return {
+        'organization': organizations[1],
+        'client': clients[1],
+        'user': users[1],
+        'user_name': 'visitor-1',
+        'caller_name': 'caller-1',
+        'sku': 'AUDIT-SKU-1',
+        'conversation': conversations[1],
+        'session_id': f'CA{conversations[1].pk:032d}',
+        'social_account': accounts[1],
+    }
+
+
+def audit_hot_queries(sample):
+    """EXPLAIN every hot query; yield (name, plan, scanned_tables, has_sort)."""
+    vendor = connection.vendor
+    partial_indexes = partial_index_names()
+    for name, build in HOT_QUERIES:
+        plan = build(sample).explain()
+        scanned, has_sort = find_full_scans(plan, vendor, partial_indexes)
+        yield name, plan, scanned, has_sort
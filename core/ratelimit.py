@@ -0,0 +1,249 @@
+"""
+Rate limits and plan quotas for the anonymous chat endpoint.
+
+Three kinds of check:
+
+- ``token_bucket``: allows short bursts per key (per IP for chat) and refills at a
+  steady rate.
+- ``sliding_window``: caps sustained traffic per key over a window (per client and
+  per client user). It keeps two fixed-window counters and weights the previous
+  one by the part of it still inside the window.
+- ``conversation_quota``: caps new conversations per calendar month. A new
+  conversation is a user_name's first message to a client in the month. The cap
+  is ``Client.max_conversations`` for the client and, for all of an organization's
+  clients together, the active ``Subscription`` quota (falling back to
+  ``Organization.max_conversations``). When a month counter is missing, it is
+  seeded from ``BanglaConversation`` with one query.
+
+Each check returns 0 to allow the request, or the seconds to wait before retrying.
+
+Counters live in the shared Django cache so every worker enforces the same limit.
+If the cache raises, a per-process in-memory store is used for
+``FALLBACK_SECONDS``, so limits become per-worker instead of switching off. A
+check is a few cache round trips, with no database query once the month's
+counters exist. The ``bench_ratelimit`` command measures the cost.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.bangla import key_digest, normalize_many
+
+logger = logging.getLogger(__name__)
+
+
+# How long to stay on the local store after the shared cache fails
+FALLBACK_SECONDS = 30
+LOCAL_MAX_ENTRIES = 100000
+# Month counters outlive the month so late requests still see them
+QUOTA_TTL = 35 * 24 * 3600
+
+
+class _LocalStore:
+    """In-process stand-in for the cache operations the limiter uses."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] < now:
+            del self._data[key]
+            return None
+        return item
+
+    def _put(self, key, value, timeout, now):
+        if len(self._data) >= self.max_entries and key not in self._data:
+            # Expired entries first; if none, start over rather than grow without bound
+            for stale in [k for k, (expires, _) in self._data.items() if expires < now]:
+                del self._data[stale]
+            if len(self._data) >= self.max_entries:
+                self._data.clear()
+        self._data[key] = (now + timeout, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._live(key, time.monotonic())
+        return default if item is None else item[1]
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            items = {key: self._live(key, now) for key in keys}
+        return {key: item[1] for key, item in items.items() if item is not None}
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._put(key, value, timeout, time.monotonic())
+
+    def add(self, key, value, timeout):
+        now = time.monotonic()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._put(key, value, timeout, now)
+            return True
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            item = self._live(key, time.monotonic())
+            if item is None:
+                raise ValueError(f"Key '{key}' not found")
+            self._data[key] = (item[0], item[1] + delta)
+            return item[1] + delta
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = _LocalStore(LOCAL_MAX_ENTRIES)
+_fallback_until = 0.0
+
+
+def _run(operation):
+    """Run ``operation(store)`` on the shared cache, or the local store while it is failing."""
+    global _fallback_until
+    if time.monotonic() >= _fallback_until:
+        try:
+            return operation(cache)
+        except Exception as e:
+            logger.error(f"Rate limit cache unavailable, using local counters: {str(e)}")
+            _fallback_until = time.monotonic() + FALLBACK_SECONDS
+    return operation(_local)
+
+
+def _incr(store, key, timeout):
+    try:
+        return store.incr(key)
+    except ValueError:
+        if store.add(key, 1, timeout):
+            return 1
+        return store.incr(key)
+
+
+# Limits
+
+def token_bucket(key, capacity, rate):
+    """Take one token from ``key``'s bucket of ``capacity`` refilled at ``rate`` per second."""
+    if capacity <= 0 or rate <= 0:
+        return 0
+    cache_key = f'rl:tb:{key}'
+
+    def take(store):
+        now = time.time()
+        tokens, stamp = store.get(cache_key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - stamp) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # Workers racing on this read-modify-write can let a few extra requests
+        # through; the sliding windows count with atomic increments
+        store.set(cache_key, (tokens - 1, now), math.ceil(capacity / rate) + 1)
+        return 0
+
+    return _run(take)
+
+
+def sliding_window(key, limit, window):
+    """Count one request for ``key``, at most ``limit`` per ``window`` seconds."""
+    if limit <= 0:
+        return 0
+    now = time.time()
+    slot = int(now // window)
+    elapsed = now - slot * window
+    current_key, previous_key = f'rl:sw:{key}:{slot}', f'rl:sw:{key}:{slot - 1}'
+
+    def hit(store):
+        counts = store.get_many([previous_key, current_key])
+        previous, current = counts.get(previous_key, 0), counts.get(current_key, 0)
+        if current >= limit:
+            return window - elapsed
+        weight = (window - elapsed) / window
+        if previous * weight + current + 1 > limit:
+            # Wait until enough of the previous window has slid out
+            needed = 1 - (limit - 1 - current) / previous
+            return max(needed * window - elapsed, 0.001)
+        _incr(store, current_key, 2 * window)
+        return 0
+
+    return _run(hit)
+
+
+def _month_start(now):
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _seconds_to_next_month(now):
+    start = _month_start(now)
+    following = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return (following - now).total_seconds()
+
+
+def _count_client_conversations(client_id, since):
+    from core.db.sharding import shard_for
+    from core.models import BanglaConversation
+    # Throttles run before the view pins the request to the client's shard
+    names = BanglaConversation.objects.using(shard_for(client_id=client_id)).filter(
+        client_id=client_id, created_at__gte=since).values_list('user_name', flat=True).distinct()
+    # Users are told apart by normalized name, like the seen keys
+    return len(set(normalize_many(list(names))))
+
+
+def _count_organization_conversations(organization_id, since):
+    from core.db.sharding import shard_for
+    from core.models import BanglaConversation, Client
+    # Clients are on the default database, conversations on the organization's shard
+    client_ids = list(Client.objects.filter(organization_id=organization_id).values_list('id', flat=True))
+    rows = list(BanglaConversation.objects.using(shard_for(organization_id=organization_id)).filter(
+        client_id__in=client_ids, created_at__gte=since
+    ).values_list('client_id', 'user_name').distinct())
+    return len(set(zip((client_id for client_id, _ in rows), normalize_many([name for _, name in rows]))))
+
+
+def conversation_quota(client, user_name, organization=None):
+    """
+    Admit ``user_name``'s message to ``client`` (a ``ClientRuntime``) against the monthly
+    conversation quotas of the client and of ``organization`` (an ``OrganizationRuntime``).
+    """
+    now = timezone.now()
+    month = now.strftime('%Y%m')
+    user = key_digest(user_name)
+    seen_key = f'quota:seen:{client.id}:{month}:{user}'
+    # Users admitted before names were normalized are seen under the digest of the raw
+    # name; honour that for the rest of the month
+    legacy_user = hashlib.sha1(str(user_name).encode('utf-8')).hexdigest()
+    seen_keys = [seen_key] + ([f'quota:seen:{client.id}:{month}:{legacy_user}'] if legacy_user != user else [])
+    since = _month_start(now)
+
+    scopes = [(f'quota:client:{client.id}:{month}', client.max_conversations,
+               lambda: _count_client_conversations(client.id, since))]
+    if organization is not None:
+        scopes.append((f'quota:org:{organization.id}:{month}', organization.max_conversations,
+                       lambda: _count_organization_conversations(organization.id, since)))
+
+    def admit(store):
+        # Conversations already started this month are never cut off
+        if any(store.get_many(seen_keys).values()):
+            return 0
+        counts = store.get_many([key for key, _, _ in scopes])
+        for key, limit, count in scopes:
+            if key not in counts:
+                store.add(key, count(), QUOTA_TTL)
+                counts[key] = store.get(key, 0)
+            if counts[key] >= limit:
+                return _seconds_to_next_month(now)
+        if store.add(seen_key, 1, QUOTA_TTL):
+            for key, _, _ in scopes:
+                _incr(store, key, QUOTA_TTL)
+        return 0
+
+    return _run(admit)
@@ -0,0 +1,551 @@
+"""
+Per-client retrieval index over client knowledge: the client description, active
+intents (training phrase, examples, responses) and active products.
+
+Each client's index is a directory of memory-mapped NumPy arrays: a CSR inverted
+index for BM25 (term offsets, posting doc ids and term frequencies, per-document
+length norms) plus optional hashed character-trigram vectors for a dense cosine
+score that still matches inflected Bangla forms BM25 misses. Queries touch only
+the postings of the query terms and, when dense scoring is on, one
+``(n_docs x dim)`` matrix-vector product.
+
+Indexes are immutable generations. Model saves append to the current
+generation's ``delta.jsonl`` (a change log scored in memory next to the main
+arrays); once the log grows past a fraction of the index, or after a bulk
+import, the generation is rebuilt from the database in a background thread and
+swapped in atomically.
+Builds of one client hold a lock file, so only one runs at a time, and each
+deletes just the generation it replaced. A client without an index is built in
+a background thread on its first query, which goes without client knowledge.
+
+Settings: ``RETRIEVAL_INDEX_DIR``, ``RETRIEVAL_DENSE_DIM`` (0 disables dense
+scoring), ``RETRIEVAL_DENSE_WEIGHT``, ``RETRIEVAL_TOP_K``,
+``RETRIEVAL_TOKEN_BUDGET``.
+"""
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import fastjson
+from core.bangla import tokenize
+from core.models import BanglaIntent, Client, Product
+from core.signals import catalog_imported
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are serialized within one process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SNIPPET_CHARS = 600
+MIN_SCORE = 0.15
+# BM25 candidates re-ranked by the dense score: max(k * RERANK_FACTOR, RERANK_MIN)
+RERANK_FACTOR = 20
+RERANK_MIN = 200
+# Rebuild once the change log reaches this fraction of the indexed text
+DELTA_REBUILD_RATIO = 0.1
+DELTA_REBUILD_MIN_BYTES = 256 * 1024
+
+
+def estimate_tokens(text):
+    """Rough LLM token count: about four UTF-8 bytes per token (Bangla is 3 bytes/char)."""
+    return math.ceil(len(text.encode('utf-8')) / 4)
+
+
+def _dense_vector(terms, dim):
+    """L2-normalized feature-hashed character trigrams of ``terms``."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for term in terms:
+        padded = f'#{term}#'
+        for i in range(max(1, len(padded) - 2)):
+            vector[zlib.crc32(padded[i:i + 3].encode('utf-8')) % dim] += 1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+# Documents
+
+def _clip(text):
+    text = ' '.join(text.split())
+    return text if len(text) <= MAX_SNIPPET_CHARS else text[:MAX_SNIPPET_CHARS - 1] + '…'
+
+
+def client_document(client):
+    if not client.description:
+        return None
+    return _clip(f'{client.name}: {client.description}')
+
+
+def intent_document(intent):
+    if not intent.is_active:
+        return None
+    responses = [str(r) for r in intent.responses or []] or [intent.ai_response_template]
+    parts = [intent.training_phrase, *map(str, intent.examples or []), *responses]
+    return _clip(' | '.join(p for p in parts if p))
+
+
+def product_document(product):
+    if not product.is_active:
+        return None
+    stock = 'in stock' if product.in_stock else 'out of stock'
+    return _clip(f'{product.name} ({product.sku}) - {product.price} {product.currency}, {stock}. '
+                 f'{product.description}')
+
+
+def iter_client_documents(client_id):
+    """Yield ``(key, text)`` for everything indexed for one client."""
+    client = Client.objects.filter(id=client_id).only('name', 'description').first()
+    if client is not None:
+        text = client_document(client)
+        if text:
+            yield f'client:{client.id}', text
+    intents = BanglaIntent.objects.filter(client_id=client_id, is_active=True).only(
+        'training_phrase', 'examples', 'responses', 'ai_response_template', 'is_active')
+    for intent in intents.iterator(chunk_size=2000):
+        yield f'intent:{intent.id}', intent_document(intent)
+    products = Product.objects.filter(client_id=client_id, is_active=True).only(
+        'name', 'sku', 'price', 'currency', 'in_stock', 'description', 'is_active')
+    for product in products.iterator(chunk_size=2000):
+        yield f'product:{product.id}', product_document(product)
+
+
+# On-disk generations
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def index_root():
+    """Index directory for the current database, so test databases never share it."""
+    name = Path(str(connection.settings_dict['NAME'])).name or 'default'
+    return Path(_setting('RETRIEVAL_INDEX_DIR', Path(settings.BASE_DIR) / 'retrieval_index')) \
+        / re.sub(r'[^\w.-]+', '_', name)
+
+
+def client_dir(client_id):
+    return index_root() / f'client_{int(client_id)}'
+
+
+def current_generation(directory):
+    try:
+        name = (Path(directory) / 'CURRENT').read_text().strip()
+    except FileNotFoundError:
+        return None
+    return Path(directory) / name
+
+
+def write_generation(directory, documents, dim=None):
+    """
+    Build a new index generation from ``(key, text)`` pairs and make it current.
+    Returns the generation path.
+    """
+    directory = Path(directory)
+    dim = _setting('RETRIEVAL_DENSE_DIM', 64) if dim is None else dim
+    generation = directory / f'gen-{time.time_ns()}'
+    tmp = directory / f'.{generation.name}.tmp'
+    tmp.mkdir(parents=True)
+
+    keys, lengths, vocab, postings = [], [], {}, []
+    text_chunks, text_offsets, offset = [], [0], 0
+    vectors = []
+    for key, text in documents:
+        if not text:
+            continue
+        terms = tokenize(text)
+        doc = len(keys)
+        keys.append(key)
+        lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            term_id = vocab.setdefault(term, len(vocab))
+            if term_id == len(postings):
+                postings.append([])
+            postings[term_id].append((doc, tf))
+        encoded = text.encode('utf-8')
+        text_chunks.append(encoded)
+        offset += len(encoded)
+        text_offsets.append(offset)
+        if dim:
+            vectors.append(_dense_vector(terms, dim))
+
+    n_docs = len(keys)
+    lengths = np.asarray(lengths, dtype=np.float32)
+    avgdl = float(lengths.mean()) if n_docs else 0.0
+    doc_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl) if avgdl else lengths + BM25_K1
+
+    term_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    term_offsets[1:] = np.cumsum([len(p) for p in postings])
+    post_docs = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(term_offsets[-1]))
+    post_tf = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(term_offsets[-1]))
+    df = np.diff(term_offsets).astype(np.float32)
+    idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    np.save(tmp / 'term_offsets.npy', term_offsets)
+    np.save(tmp / 'post_docs.npy', post_docs)
+    np.save(tmp / 'post_tf.npy', post_tf)
+    np.save(tmp / 'idf.npy', idf)
+    np.save(tmp / 'doc_norm.npy', doc_norm.astype(np.float32))
+    np.save(tmp / 'text_offsets.npy', np.asarray(text_offsets, dtype=np.int64))
+    np.save(tmp / 'vectors.npy', np.vstack(vectors) if vectors else np.zeros((n_docs, dim), dtype=np.float32))
+    (tmp / 'texts.bin').write_bytes(b''.join(text_chunks))
+    (tmp / 'vocab.json').write_bytes(fastjson.dumps(vocab))
+    (tmp / 'keys.json').write_bytes(fastjson.dumps(keys))
+    (tmp / 'meta.json').write_bytes(fastjson.dumps({'n_docs': n_docs, 'avgdl': avgdl, 'dim': dim}))
+    (tmp / 'delta.jsonl').touch()
+    os.replace(tmp, generation)
+
+    current = directory / 'CURRENT'
+    pointer = directory / '.CURRENT.tmp'
+    pointer.write_text(generation.name)
+    os.replace(pointer, current)
+    return generation
+
+
+class _Index:
+    """One loaded generation plus its change log, scored in memory."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        load = lambda name: np.load(generation / name, mmap_mode='r')
+        self.term_offsets = load('term_offsets.npy')
+        self.post_docs = load('post_docs.npy')
+        self.post_tf = load('post_tf.npy')
+        self.idf = load('idf.npy')
+        self.doc_norm = load('doc_norm.npy')
+        self.text_offsets = load('text_offsets.npy')
+        self.vectors = load('vectors.npy')
+        self.texts = np.memmap(generation / 'texts.bin', dtype=np.uint8, mode='r') \
+            if (generation / 'texts.bin').stat().st_size else np.zeros(0, dtype=np.uint8)
+        self.vocab = fastjson.loads((generation / 'vocab.json').read_bytes())
+        self.keys = fastjson.loads((generation / 'keys.json').read_bytes())
+        self.meta = fastjson.loads((generation / 'meta.json').read_bytes())
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.delta_size = -1
+        self.refresh_delta()
+
+    def refresh_delta(self):
+        """Reload delta.jsonl if it grew; later lines replace earlier ones for a key."""
+        path = self.generation / 'delta.jsonl'
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size == self.delta_size:
+            return
+        changes = {}
+        if size:
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = fastjson.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from a concurrent append
+                    changes[entry['key']] = entry.get('text')
+        n_docs = self.meta['n_docs']
+        self.deleted = np.zeros(n_docs, dtype=bool)
+        for key in changes:
+            if key in self.key_index:
+                self.deleted[self.key_index[key]] = True
+        dim = self.meta['dim']
+        self.delta = []
+        for key, text in changes.items():
+            if text:
+                terms = tokenize(text)
+                self.delta.append((key, text, Counter(terms), len(terms),
+                                   _dense_vector(terms, dim) if dim else None))
+        self.delta_size = size
+
+    def _idf(self, term):
+        term_id = self.vocab.get(term)
+        if term_id is not None:
+            return float(self.idf[term_id])
+        n_docs = self.meta['n_docs'] + len(self.delta)
+        return math.log(1 + (n_docs - 0.5) / 1.5)
+
+    def text(self, doc):
+        start, end = int(self.text_offsets[doc]), int(self.text_offsets[doc + 1])
+        return bytes(self.texts[start:end]).decode('utf-8')
+
+    def search(self, query, k):
+        terms = Counter(tokenize(query))
+        n_docs = self.meta['n_docs']
+        if not terms or not (n_docs or self.delta):
+            return []
+
+        bm25 = np.zeros(n_docs, dtype=np.float32)
+        for term in terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.post_docs[start:end]
+            tf = self.post_tf[start:end]
+            bm25[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self.doc_norm[docs])
+        bm25[self.deleted] = 0
+
+        avgdl = self.meta['avgdl'] or 1.0
+        delta_bm25 = np.zeros(len(self.delta), dtype=np.float32)
+        for i, (_, _, counts, length, _) in enumerate(self.delta):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    delta_bm25[i] += self._idf(term) * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = max(float(bm25.max(initial=0)), float(delta_bm25.max(initial=0)))
+        scores = bm25 / top if top else bm25
+        delta_scores = delta_bm25 / top if top else delta_bm25
+
+        # Candidate documents: the best BM25 hits. The dense score re-ranks them, and
+        # only when BM25 finds too few (e.g. an inflected form) does it scan every vector.
+        pool = _top(scores, max(k * RERANK_FACTOR, RERANK_MIN))
+        pool = pool[scores[pool] > 0]
+        dim = self.meta['dim']
+        weight = _setting('RETRIEVAL_DENSE_WEIGHT', 0.3)
+        if dim and weight:
+            query_vector = _dense_vector(list(terms), dim)
+            if len(pool) < k and n_docs:
+                dense = np.asarray(self.vectors @ query_vector)
+                dense[self.deleted] = 0
+                pool = np.union1d(pool, _top(dense, k))
+            else:
+                pool = np.sort(pool)
+                dense = np.zeros(n_docs, dtype=np.float32)
+                if len(pool):
+                    dense[pool] = self.vectors[pool] @ query_vector
+            scores = (1 - weight) * scores + weight * np.maximum(dense, 0)
+            if self.delta:
+                delta_dense = np.array([v @ query_vector for *_, v in self.delta], dtype=np.float32)
+                delta_scores = (1 - weight) * delta_scores + weight * np.maximum(delta_dense, 0)
+
+        results = [
+            (float(scores[doc]), self.keys[doc], self.text(int(doc)))
+            for doc in pool[np.argsort(-scores[pool])][:k] if scores[doc] >= MIN_SCORE
+        ]
+        results += [
+            (float(score), key, text)
+            for score, (key, text, *_) in zip(delta_scores, self.delta) if score >= MIN_SCORE
+        ]
+        results.sort(key=lambda r: r[0], reverse=True)
+        return [{'key': key, 'text': text, 'score': round(score, 4)} for score, key, text in results[:k]]
+
+
+def _top(scores, n):
+    """Indices of the ``n`` highest scores, unordered."""
+    if len(scores) <= n:
+        return np.arange(len(scores))
+    return np.argpartition(-scores, n)[:n]
+
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def _open(directory):
+    generation = current_generation(directory)
+    if generation is None:
+        return None
+    with _lock:
+        index = _loaded.get(directory)
+        if index is None or index.generation != generation:
+            index = _loaded[directory] = _Index(generation)
+        else:
+            index.refresh_delta()
+        return index
+
+
+_build_locks = {}
+
+
+@contextmanager
+def _build_lock(directory):
+    """Held while a client's index is built, by threads of this process and, through flock, others."""
+    with _lock:
+        lock = _build_locks.setdefault(directory, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(directory / '.build.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the flock
+
+
+def build_client_index(client_id):
+    """Rebuild a client's index from the database and drop the generation it replaces."""
+    directory = client_dir(client_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _build_lock(directory):
+        # No other build is running, so these are left over from builds that died
+        for path in directory.glob('.gen-*.tmp'):
+            shutil.rmtree(path, ignore_errors=True)
+        old = current_generation(directory)
+        old_delta = old / 'delta.jsonl' if old else None
+        carried_from = old_delta.stat().st_size if old_delta and old_delta.exists() else 0
+
+        generation = write_generation(directory, iter_client_documents(client_id))
+
+        # Changes logged to the old generation while we were reading the database
+        if old_delta and old_delta.exists() and old_delta.stat().st_size > carried_from:
+            with open(old_delta, 'rb') as src, open(generation / 'delta.jsonl', 'ab') as dst:
+                src.seek(carried_from)
+                dst.write(src.read())
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    return generation
+
+
+_scheduled = set()
+
+
+def schedule_build(client_id):
+    """
+    Rebuild a client's index in a background thread, unless one is already pending.
+    The thread starts once the current transaction commits, since it reads what it did.
+    """
+    transaction.on_commit(lambda: _start_build(client_id))
+
+
+def _start_build(client_id):
+    with _lock:
+        if client_id in _scheduled:
+            return
+        _scheduled.add(client_id)
+    threading.Thread(target=_build_in_background, args=(client_id,),
+                     name=f'retrieval-build-{client_id}', daemon=True).start()
+
+
+def _build_in_background(client_id):
+    try:
+        build_client_index(client_id)
+    except Exception as e:
+        logger.error(f"Building the retrieval index of client {client_id} failed: {str(e)}")
+    finally:
+        with _lock:
+            _scheduled.discard(client_id)
+        connections.close_all()
+
+
+def retrieve(client_id, query, k=None):
+    """Top-``k`` knowledge snippets for ``query`` as ``[{'key', 'text', 'score'}]``."""
+    if np is None:
+        return []
+    k = k or _setting('RETRIEVAL_TOP_K', 5)
+    directory = client_dir(client_id)
+    try:
+        index = _open(directory)
+        if index is None:
+            # Never build on the request path; answer without client knowledge this once
+            schedule_build(client_id)
+            return []
+        return index.search(query, k)
+    except (OSError, ValueError) as e:
+        logger.error(f"Retrieval index for client {client_id} unavailable: {str(e)}")
+        return []
+
+
+def select_snippets(results, token_budget=None):
+    """Keep the best-scoring snippet texts that fit in ``token_budget`` tokens."""
+    budget = _setting('RETRIEVAL_TOKEN_BUDGET', 600) if token_budget is None else token_budget
+    chosen, used = [], 0
+    for result in results:
+        cost = estimate_tokens(result['text'])
+        if used + cost <= budget:
+            chosen.append(result['text'])
+            used += cost
+    return chosen
+
+
+# Incremental updates
+
+def record_change(client_id, key, text):
+    """Append one document change (``text=None`` deletes) to the client's index log."""
+    if np is None:
+        return
+    directory = client_dir(client_id)
+    generation = current_generation(directory)
+    if generation is None:
+        return  # built from the database on first query
+    line = fastjson.dumps({'key': key, 'text': text}) + b'\n'
+    delta = generation / 'delta.jsonl'
+    try:
+        # One O_APPEND write per line keeps concurrent writers from interleaving
+        fd = os.open(delta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        size = delta.stat().st_size
+        indexed = (generation / 'texts.bin').stat().st_size
+    except FileNotFoundError:
+        size = indexed = None
+    if size is None or current_generation(directory) != generation:
+        # A build replaced the generation after we read CURRENT; it may lack this change
+        schedule_build(client_id)
+    elif size > max(DELTA_REBUILD_MIN_BYTES, DELTA_REBUILD_RATIO * indexed):
+        schedule_build(client_id)
+
+
+def _on_commit_change(client_id, key, text):
+    transaction.on_commit(lambda: record_change(client_id, key, text))
+
+
+@receiver(post_save, sender=Product, dispatch_uid='retrieval_product_saved')
+def _product_saved(sender, instance, **kwargs):
+    _on_commit_change(instance.client_id, f'product:{instance.pk}', product_document(instance))
+
+
+@receiver(post_save, sender=BanglaIntent, dispatch_uid='retrieval_intent_saved')
+def _intent_saved(sender, instance, **kwargs):
+    _on_commit_change(instance.client_id, f'intent:{instance.pk}', intent_document(instance))
+
+
+@receiver(post_save, sender=Client, dispatch_uid='retrieval_client_saved')
+def _client_saved(sender, instance, **kwargs):
+    _on_commit_change(instance.pk, f'client:{instance.pk}', client_document(instance))
+
+
+@receiver(post_delete, sender=Product, dispatch_uid='retrieval_product_deleted')
+@receiver(post_delete, sender=BanglaIntent, dispatch_uid='retrieval_intent_deleted')
+def _document_deleted(sender, instance, **kwargs):
+    prefix = 'product' if sender is Product else 'intent'
+    _on_commit_change(instance.client_id, f'{prefix}:{instance.pk}', None)
+
+
+@receiver(post_delete, sender=Client, dispatch_uid='retrieval_client_deleted')
+def _client_deleted(sender, instance, **kwargs):
+    directory = client_dir(instance.pk)
+    transaction.on_commit(lambda: shutil.rmtree(directory, ignore_errors=True))
+
+
+@receiver(catalog_imported, dispatch_uid='retrieval_catalog_imported')
+def _catalog_imported(sender, client_ids=(), **kwargs):
+    if np is None:
+        return
+    for client_id in client_ids:
+        if current_generation(client_dir(client_id)) is not None:
+            schedule_build(client_id)
@@ -0,0 +1,309 @@
+"""
+Compiled, immutable per-tenant runtime configuration for the chat, social and voice hot paths.
+
+``get_client_runtime`` returns a ``ClientRuntime`` (client metadata, per-language
+system prompts, intent matcher) and ``get_organization_runtime`` an
+``OrganizationRuntime`` (organization metadata, AI agents with compiled prompts and
+handoff triggers, the voice agent, social accounts). Both are built once from the
+database and kept in process memory, so a request that already has a compiled
+runtime makes no configuration queries.
+
+Saving or deleting a source model publishes an invalidation on
+``core.invalidation``; every process drops its copy within the bus poll interval and
+rebuilds on next use.
+"""
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Pattern, Tuple
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Organization, Subscription
+from core import invalidation
+from chat.models import AIAgent
+from core.models import BanglaIntent, Client
+from core.bangla import normalize, normalize_many, tokenize
+from core.signals import catalog_imported
+from services.openai_service import build_system_prompt
+from social_media.models import SocialMediaAccount
+
+
+# Minimum share of an intent's phrase terms a message must contain to match it
+INTENT_MATCH_THRESHOLD = 0.5
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    id: int
+    name: str
+    model_name: str
+    temperature: float
+    max_tokens: int
+    system_prompt: str
+    # system_prompt compiled for this organization
+    prompt: str
+    voice_enabled: bool
+    max_consecutive_responses: int
+    handoff_triggers: Tuple[str, ...]
+    handoff_re: Optional[Pattern] = field(repr=False, default=None)
+
+    def wants_handoff(self, text):
+        """The handoff trigger found in ``text``, or None."""
+        if self.handoff_re is None or not text:
+            return None
+        match = self.handoff_re.search(normalize(text))
+        return match.group(0) if match else None
+
+
+@dataclass(frozen=True)
+class SocialAccountConfig:
+    id: int
+    organization_id: int
+    platform: str
+    account_id: str
+    access_token: str = field(repr=False)
+    webhook_secret: str = field(repr=False)
+    auto_reply_enabled: bool
+    ai_agent_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class OrganizationRuntime:
+    id: int
+    name: str
+    is_active: bool
+    approval_status: str
+    agents: Mapping[int, AgentConfig]
+    voice_agent_id: Optional[int]
+    social_accounts: Tuple[SocialAccountConfig, ...]
+    # Monthly new-conversation quota from the active subscription, else the organization
+    max_conversations: int
+
+    @property
+    def voice_agent(self):
+        return self.agents.get(self.voice_agent_id)
+
+    def accounts(self, platform):
+        return tuple(a for a in self.social_accounts if a.platform == platform)
+
+    def account(self, platform, account_id):
+        for a in self.social_accounts:
+            if a.platform == platform and a.account_id == account_id:
+                return a
+        return None
+
+
+@dataclass(frozen=True)
+class ClientRuntime:
+    id: int
+    name: str
+    is_active: bool
+    description: str
+    organization_id: Optional[int]
+    max_conversations: int
+    # Default system prompt per detected language ('english', 'bangla')
+    prompts: Mapping[str, str]
+    # (intent name, phrase terms) for every training phrase and example
+    intent_phrases: Tuple[Tuple[str, frozenset], ...] = field(repr=False)
+    # term -> indexes into intent_phrases
+    intent_index: Mapping[str, Tuple[int, ...]] = field(repr=False)
+
+    def match_intent(self, message):
+        """Name of the intent whose training phrase or example best covers ``message``, or ''."""
+        hits = defaultdict(int)
+        for term in set(tokenize(message)):
+            for phrase in self.intent_index.get(term, ()):
+                hits[phrase] += 1
+        best, best_score = '', 0.0
+        for phrase, count in hits.items():
+            name, terms = self.intent_phrases[phrase]
+            score = count / len(terms)
+            if score > best_score:
+                best, best_score = name, score
+        return best if best_score >= INTENT_MATCH_THRESHOLD else ''
+
+
+# Builders
+
+def _compile_triggers(triggers):
+    # Messages are normalized before matching (``wants_handoff``), so the phrases are too
+    phrases = [phrase for phrase in normalize_many(str(t) for t in triggers or []) if phrase]
+    if not phrases:
+        return None
+    return re.compile('|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)), re.IGNORECASE)
+
+
+def _agent_config(agent, organization_name):
+    triggers = tuple(str(t) for t in agent.handoff_triggers or [])
+    return AgentConfig(
+        id=agent.id,
+        name=agent.name,
+        model_name=agent.model_name,
+        temperature=agent.temperature,
+        max_tokens=agent.max_tokens,
+        system_prompt=agent.system_prompt,
+        prompt=f"{agent.system_prompt or ''} You are responding on behalf of {organization_name}.",
+        voice_enabled=agent.voice_enabled,
+        max_consecutive_responses=agent.max_consecutive_responses,
+        handoff_triggers=triggers,
+        handoff_re=_compile_triggers(triggers),
+    )
+
+
+def build_organization_runtime(organization_id):
+    organization = Organization.objects.filter(id=organization_id).only(
+        'name', 'is_active', 'approval_status', 'max_conversations').first()
+    if organization is None:
+        return None
+    subscription = Subscription.objects.filter(
+        organization_id=organization_id, status__in=('active', 'trial')).only('max_conversations').first()
+    agents = {
+        agent.id: _agent_config(agent, organization.name)
+        for agent in AIAgent.objects.filter(organization_id=organization_id, status='active').order_by('id')
+    }
+    voice_agent_id = next((agent.id for agent in agents.values() if agent.voice_enabled), None)
+    accounts = tuple(
+        SocialAccountConfig(
+            id=account.id,
+            organization_id=organization_id,
+            platform=account.platform,
+            account_id=account.account_id,
+            access_token=account.access_token,
+            webhook_secret=account.webhook_secret,
+            auto_reply_enabled=account.auto_reply_enabled,
+            ai_agent_id=account.ai_agent_id,
+        )
+        for account in SocialMediaAccount.objects.filter(organization_id=organization_id, is_active=True).order_by('id')
+    )
+    return OrganizationRuntime(
+        id=organization.id,
+        name=organization.name,
+        is_active=organization.is_active,
+        approval_status=organization.approval_status,
+        agents=MappingProxyType(agents),
+        voice_agent_id=voice_agent_id,
+        social_accounts=accounts,
+        max_conversations=(subscription or organization).max_conversations,
+    )
+
+
+def build_client_runtime(client_id):
+    client = Client.objects.filter(id=client_id).only(
+        'name', 'is_active', 'description', 'organization_id', 'max_conversations').first()
+    if client is None:
+        return None
+    phrases, index = [], defaultdict(list)
+    intents = BanglaIntent.objects.filter(client_id=client_id, is_active=True).values_list(
+        'name', 'training_phrase', 'examples')
+    for name, training_phrase, examples in intents:
+        for phrase in [training_phrase, *map(str, examples or [])]:
+            terms = frozenset(tokenize(phrase))
+            if terms:
+                for term in terms:
+                    index[term].append(len(phrases))
+                phrases.append((name, terms))
+    return ClientRuntime(
+        id=client.id,
+        name=client.name,
+        is_active=client.is_active,
+        description=client.description,
+        organization_id=client.organization_id,
+        max_conversations=client.max_conversations,
+        prompts=MappingProxyType({
+            language: build_system_prompt(language, client.name) for language in ('english', 'bangla')
+        }),
+        intent_phrases=tuple(phrases),
+        intent_index=MappingProxyType({term: tuple(ids) for term, ids in index.items()}),
+    )
+
+
+# Process cache
+
+_BUILDERS = {
+    'client': build_client_runtime,
+    'organization': build_organization_runtime,
+}
+_runtimes = {}
+# Bumped on every drop, so a build that raced an invalidation is not stored
+_generation = 0
+_lock = threading.Lock()
+
+
+def _get(kind, tenant_id):
+    invalidation.sync()
+    tenant_id = int(tenant_id)
+    runtime = _runtimes.get((kind, tenant_id))
+    if runtime is not None:
+        return runtime
+    generation = _generation
+    runtime = _BUILDERS[kind](tenant_id)
+    with _lock:
+        if runtime is not None and generation == _generation:
+            _runtimes[(kind, tenant_id)] = runtime
+    return runtime
+
+
+def get_client_runtime(client_id):
+    """Compiled runtime for a ``Client`` id, or None if it does not exist."""
+    return _get('client', client_id)
+
+
+def get_organization_runtime(organization_id):
+    """Compiled runtime for an ``Organization`` id, or None if it does not exist."""
+    return _get('organization', organization_id)
+
+
+def _dropper(kind):
+    def drop(key):
+        global _generation
+        with _lock:
+            _generation += 1
+            if key is None:
+                for cached in [cached for cached in _runtimes if cached[0] == kind]:
+                    del _runtimes[cached]
+            else:
+                _runtimes.pop((kind, int(key)), None)
+    return drop
+
+
+for _kind in _BUILDERS:
+    invalidation.subscribe(f'runtime.{_kind}', _dropper(_kind))
+
+
+def invalidate_runtime(kind, tenant_id):
+    """Drop a tenant's runtime in every process; it is rebuilt on next use."""
+    invalidation.publish(f'runtime.{kind}', tenant_id)
+
+
+# Invalidation
+
+@receiver([post_save, post_delete], sender=Client, dispatch_uid='runtime_client_changed')
+def _client_changed(sender, instance, **kwargs):
+    invalidate_runtime('client', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=BanglaIntent, dispatch_uid='runtime_intent_changed')
+def _intent_changed(sender, instance, **kwargs):
+    invalidate_runtime('client', instance.client_id)
+
+
+@receiver(catalog_imported, sender=BanglaIntent, dispatch_uid='runtime_intents_imported')
+def _intents_imported(sender, client_ids=(), **kwargs):
+    for client_id in client_ids:
+        invalidate_runtime('client', client_id)
+
+
+@receiver([post_save, post_delete], sender=Organization, dispatch_uid='runtime_organization_changed')
+def _organization_changed(sender, instance, **kwargs):
+    invalidate_runtime('organization', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AIAgent, dispatch_uid='runtime_agent_changed')
+@receiver([post_save, post_delete], sender=Subscription, dispatch_uid='runtime_subscription_changed')
+@receiver([post_save, post_delete], sender=SocialMediaAccount, dispatch_uid='runtime_social_account_changed')
+def _organization_child_changed(sender, instance, **kwargs):
+    invalidate_runtime('organization', instance.organization_id)
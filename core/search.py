@@ -0,0 +1,155 @@
+"""
+Full-text search over conversation text: chat messages, Bangla conversations and
+social media messages.
+
+Searchable models derive from ``Searchable`` and name their text fields in
+``SEARCH_FIELDS``. Saving a row stores the terms of those fields
+(``core.bangla.tokenize``: NFC, folded digits, lightly stemmed Bangla) in
+``search_terms``, separated by spaces, and the database indexes that column:
+
+- SQLite: an FTS5 external-content table ``<table>_fts``, kept in sync by triggers
+  on insert, update and delete.
+- PostgreSQL: a GIN index on ``array_to_tsvector(string_to_array(search_terms, ' '))``.
+  The terms are indexed as they are, without a text search configuration, so both
+  databases match exactly what the tokenizer produced.
+
+``ensure_indexes`` runs after every ``migrate`` on every database. It creates what is
+missing and refills an SQLite index whose triggers were lost, as happens when a
+migration rebuilds the table. Rows saved before ``search_terms`` existed, or written
+with ``bulk_create()``/``update()``, are filled by ``manage.py rebuild_search_index``.
+
+``matching(queryset, text)`` keeps the rows containing every term of ``text``. The
+last term also matches as a prefix, so results can follow a search box as it is
+typed.
+"""
+from django.apps import apps
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+from core.bangla import tokenize
+
+
+class Searchable(models.Model):
+    """Abstract base of models searched through ``matching``."""
+
+    # Text fields whose terms are indexed
+    SEARCH_FIELDS = ()
+
+    search_terms = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        abstract = True
+
+    def get_search_terms(self):
+        text = ' '.join(str(getattr(self, name) or '') for name in self.SEARCH_FIELDS)
+        return ' '.join(dict.fromkeys(tokenize(text)))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.SEARCH_FIELDS):
+            self.search_terms = self.get_search_terms()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_terms'}
+        super().save(*args, **kwargs)
+
+
+def searchable_models():
+    return [model for model in apps.get_models() if issubclass(model, Searchable)]
+
+
+def _fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def _pg_vector(connection, model):
+    qn = connection.ops.quote_name
+    column = f"{qn(model._meta.db_table)}.{qn('search_terms')}"
+    return f"array_to_tsvector(string_to_array({column}, ' '))"
+
+
+def _ensure_sqlite(connection, model):
+    qn = connection.ops.quote_name
+    table, fts = model._meta.db_table, _fts_table(model)
+    pk = qn(model._meta.pk.column)
+    triggers = {f"{fts}_insert", f"{fts}_delete", f"{fts}_update"}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+        if triggers <= {row[0] for row in cursor.fetchall()}:
+            return False
+        # The 'ascii' tokenizer splits on ASCII punctuation and spaces only, so the
+        # stored terms, Bangla included, come back unchanged
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {qn(fts)} USING fts5("
+                       f"search_terms, content='{table}', content_rowid='{model._meta.pk.column}', tokenize='ascii')")
+        for trigger in triggers:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {qn(trigger)}")
+        cursor.execute(
+            f"CREATE TRIGGER {qn(fts + '_insert')} AFTER INSERT ON {qn(table)} BEGIN "
+            f"INSERT INTO {qn(fts)} (rowid, search_terms) VALUES (new.{pk}, new.search_terms); END")
+        cursor.execute(
+            f"CREATE TRIGGER {qn(fts + '_delete')} AFTER DELETE ON {qn(table)} BEGIN "
+            f"INSERT INTO {qn(fts)} ({qn(fts)}, rowid, search_terms) VALUES ('delete', old.{pk}, old.search_terms); "
+            f"END")
+        cursor.execute(
+            f"CREATE TRIGGER {qn(fts + '_update')} AFTER UPDATE OF search_terms ON {qn(table)} "
+            f"WHEN old.search_terms IS NOT new.search_terms BEGIN "
+            f"INSERT INTO {qn(fts)} ({qn(fts)}, rowid, search_terms) VALUES ('delete', old.{pk}, old.search_terms); "
+            f"INSERT INTO {qn(fts)} (rowid, search_terms) VALUES (new.{pk}, new.search_terms); END")
+        # Changes made without the triggers are missing from the index
+        cursor.execute(f"INSERT INTO {qn(fts)} ({qn(fts)}) VALUES ('rebuild')")
+    return True
+
+
+def _ensure_postgresql(connection, model):
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    index = f"{table[:50]}_search_idx"
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [index])
+        if cursor.fetchone():
+            return False
+        # On a partitioned table this creates the index on every partition
+        cursor.execute(f"CREATE INDEX {qn(index)} ON {qn(table)} USING GIN "
+                       f"((array_to_tsvector(string_to_array(search_terms, ' '))))")
+    return True
+
+
+def ensure_indexes(using):
+    """Create the full-text indexes missing on database ``using``; returns the tables indexed."""
+    connection = connections[using]
+    ensure = {'sqlite': _ensure_sqlite, 'postgresql': _ensure_postgresql}.get(connection.vendor)
+    if ensure is None:
+        return []
+    with connection.cursor() as cursor:
+        tables = set(connection.introspection.table_names(cursor))
+    return [model._meta.db_table for model in searchable_models()
+            if model._meta.db_table in tables and ensure(connection, model)]
+
+
+def ensure_indexes_after_migrate(sender, using, **kwargs):
+    ensure_indexes(using)
+
+
+def matching(queryset, text):
+    """Rows of ``queryset`` containing every term of ``text``, the last one possibly as a prefix."""
+    terms = list(dict.fromkeys(tokenize(text)))
+    if not terms:
+        return queryset.none()
+    model = queryset.model
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f"'{term}'" for term in terms) + ':*'
+        condition = RawSQL(f"{_pg_vector(connection, model)} @@ %s::tsquery", [query],
+                           output_field=models.BooleanField())
+    elif connection.vendor == 'sqlite':
+        query = ' '.join(f'"{term}"' for term in terms) + '*'
+        condition = RawSQL(
+            f"{qn(model._meta.db_table)}.{qn(model._meta.pk.column)} IN "
+            f"(SELECT rowid FROM {qn(_fts_table(model))} WHERE {qn(_fts_table(model))} MATCH %s)", [query],
+            output_field=models.BooleanField())
+    else:
+        condition = models.Q()
+        for term in terms[:-1]:
+            condition &= models.Q(search_terms__regex=rf'(^| ){term}( |$)')
+        condition &= models.Q(search_terms__regex=rf'(^| ){terms[-1]}')
+    return queryset.filter(condition)
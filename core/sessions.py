@@ -0,0 +1,59 @@
+"""
+Database sessions read through a per-process cache, kept consistent across workers.
+
+Django's ``cached_db`` engine reads sessions from the ``SESSION_CACHE_ALIAS``
+cache and falls back to the ``django_session`` table. With a per-process cache
+(``LocMemCache``, the default here), a session changed or deleted by one worker,
+for example on logout, would still be served from the other workers' memory.
+This engine publishes the session key on ``core.invalidation`` whenever a session
+is saved or deleted. Every worker then drops its copy within the bus poll interval.
+
+Page loads for a logged-in user then cost no session query once the worker has
+cached the session. Writes still go to the database.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from core import invalidation
+
+
+def _local_cache():
+    """The session cache if it lives in process memory, else None."""
+    cache = caches[settings.SESSION_CACHE_ALIAS]
+    # A shared cache (Redis, Memcached) is updated by the writer itself
+    return cache if isinstance(cache, LocMemCache) else None
+
+
+class SessionStore(cached_db.SessionStore):
+    def load(self):
+        invalidation.sync()
+        return super().load()
+
+    def save(self, must_create=False):
+        super().save(must_create=must_create)
+        # Sent after the write, on commit inside a transaction, so no worker can
+        # re-cache the old row. A new key is not cached anywhere yet, and this
+        # worker already holds the new data.
+        if not must_create and self.session_key and _local_cache():
+            invalidation.publish('session', self.session_key, local=False)
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key and _local_cache():
+            invalidation.publish('session', session_key)
+
+
+def _drop(key):
+    cache = _local_cache()
+    if cache is None:
+        return
+    if key is None:
+        cache.clear()
+    else:
+        cache.delete(SessionStore.cache_key_prefix + key)
+
+
+invalidation.subscribe('session', _drop)
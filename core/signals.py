@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+
+# Sent once at the end of a bulk catalog import (core.importers). bulk_create() does
+# not send post_save, so caches and indexes built from Product/BanglaIntent listen
+# here to rebuild once per import.
+# Arguments: sender (Product or BanglaIntent), client_ids (frozenset of Client ids),
+# keys (frozenset of upserted conflict-key tuples: (sku,) or (client_id, name))
+catalog_imported = Signal()
@@ -1,4 +1,7 @@
-from django.test import TestCase
+import json
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 from .models import Client, BanglaConversation, CallLog, BanglaIntent, AdminProfile
 
@@ -93,3 +96,1518 @@ class AdminProfileModelTest(TestCase):
         self.assertEqual(self.admin_profile.user.username, "testadmin")
         self.assertEqual(self.admin_profile.role, "super_admin")
         self.assertTrue(self.admin_profile.can_manage_clients)
+
+
+class QueryPlanAuditTest(TestCase):
+    def test_find_full_scans_sqlite(self):
+        from .query_audit import find_full_scans
+        scanned, has_sort = find_full_scans('3 0 0 SCAN core_calllog\n9 0 0 USE TEMP B-TREE FOR ORDER BY', 'sqlite')
+        self.assertEqual(scanned, ['core_calllog'])
+        self.assertTrue(has_sort)
+        scanned, has_sort = find_full_scans(
+            '3 0 0 SEARCH core_calllog USING INDEX calllog_client_ts_idx (client_id=?)', 'sqlite'
+        )
+        self.assertEqual(scanned, [])
+        self.assertFalse(has_sort)
+
+    def test_partial_index_scan_is_not_reported(self):
+        from .query_audit import find_full_scans
+        plan = '3 0 0 SCAN core_banglaconversation USING INDEX bconv_escalated_idx'
+        self.assertEqual(find_full_scans(plan, 'sqlite', {'bconv_escalated_idx'})[0], [])
+        self.assertEqual(find_full_scans(plan, 'sqlite')[0], ['core_banglaconversation'])
+
+    def test_audit_command_passes_on_seeded_data(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('audit_query_plans', rows=500, strict=True, stdout=out)
+        self.assertIn('hot queries use indexes', out.getvalue())
+        self.assertFalse(BanglaConversation.objects.exists())
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Client.objects.create(name=f"Client {i}", domain=f"c{i}.com", contact_email=f"c{i}@test.com")
+
+    def test_pages_cover_all_rows_once(self):
+        from .pagination import paginate_keyset
+        qs = Client.objects.values('id', 'name')
+        seen, cursor = [], None
+        while True:
+            rows, cursor = paginate_keyset(qs, {'limit': 2, 'cursor': cursor})
+            seen.extend(row['id'] for row in rows)
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted(Client.objects.values_list('id', flat=True)))
+
+    def test_descending_composite_key(self):
+        from .pagination import paginate_keyset
+        qs = Client.objects.all()
+        first, cursor = paginate_keyset(qs, {'limit': 3}, keys=('created_at', 'id'), descending=True)
+        rest, end = paginate_keyset(qs, {'cursor': cursor}, keys=('created_at', 'id'), descending=True)
+        self.assertIsNone(end)
+        ordered = list(Client.objects.order_by('-created_at', '-id'))
+        self.assertEqual(first + rest, ordered)
+
+    def test_invalid_cursor(self):
+        from .pagination import paginate_keyset, InvalidCursor
+        with self.assertRaises(InvalidCursor):
+            paginate_keyset(Client.objects.all(), {'cursor': 'not-a-cursor'})
+
+
+class FastJSONTest(TestCase):
+    def test_json_response_emits_raw_utf8(self):
+        from decimal import Decimal
+        from django.utils import timezone
+        from .http import JsonResponse
+        now = timezone.now()
+        response = JsonResponse({'msg': 'ধন্যবাদ', 'price': Decimal('499.50'), 'at': now})
+        self.assertIn('ধন্যবাদ'.encode('utf-8'), response.content)
+        data = json.loads(response.content)
+        self.assertEqual(data['price'], '499.50')
+        self.assertEqual(data['at'], json.loads(json.dumps(now, cls=DjangoJSONEncoder)))
+
+    def test_renderer_matches_drf(self):
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+        payload = {'name': 'টি-শার্ট', 'price': Decimal('1.5'), 'sep': ' ', 1: [None, True]}
+        self.assertEqual(json.loads(FastJSONRenderer().render(payload)), json.loads(JSONRenderer().render(payload)))
+        self.assertNotIn(b'\xe2\x80\xa8', FastJSONRenderer().render(payload))
+
+
+class CatalogImportTest(TestCase):
+    def setUp(self):
+        from accounts.models import Organization
+        self.org = Organization.objects.create(name="Import Org")
+        self.other_org = Organization.objects.create(name="Other Org")
+        self.client_obj = Client.objects.create(name="Shop", domain="shop.com", contact_email="s@shop.com")
+
+    def test_csv_product_upsert_and_row_errors(self):
+        from .importers import ProductImporter, iter_records
+        from .models import Product
+        from .signals import catalog_imported
+        Product.objects.create(client=self.client_obj, organization=self.org, sku="A1", name="Old", price=1)
+        Product.objects.create(client=self.client_obj, organization=self.other_org, sku="X9", name="Theirs", price=1)
+        received = []
+        handler = lambda sender, client_ids, **kwargs: received.append((sender, client_ids))
+        catalog_imported.connect(handler)
+        self.addCleanup(catalog_imported.disconnect, handler)
+
+        lines = [
+            b"sku,name,price,qty\n",
+            "A1,টি-শার্ট,499,5\n".encode("utf-8"),
+            b"B2,Shoes,1299,0\n",
+            b"C3,Bad price,abc,1\n",
+            b"X9,Hijack,10,1\n",
+        ]
+        result = ProductImporter(self.org, client=self.client_obj, chunk_size=2).run(iter_records(lines, "csv"))
+
+        self.assertEqual(result["processed"], 4)
+        self.assertEqual(result["upserted"], 2)
+        self.assertEqual([e["row"] for e in result["errors"]], [4, 5])
+        self.assertEqual(Product.objects.get(sku="A1").name, "টি-শার্ট")
+        self.assertEqual(Product.objects.get(sku="A1").stock_qty, 5)
+        self.assertEqual(Product.objects.get(sku="X9").name, "Theirs")
+        self.assertEqual(received, [(Product, frozenset({self.client_obj.id}))])
+
+    def test_partial_reimport_keeps_other_columns(self):
+        from .importers import IntentImporter, ProductImporter, iter_records
+        from .models import Product
+        Product.objects.create(client=self.client_obj, organization=self.org, sku="A1", name="Shirt", price=499,
+                               description="১০০% কটন", currency="USD", stock_qty=7)
+        lines = [b"sku,name,price\n", b"A1,Shirt,450\n", b"B2,Shoes,1299\n"]
+        result = ProductImporter(self.org, client=self.client_obj).run(iter_records(lines, "csv"))
+        self.assertEqual(result["upserted"], 2)
+        product = Product.objects.get(sku="A1")
+        self.assertEqual((product.price, product.description, product.currency, product.stock_qty),
+                         (450, "১০০% কটন", "USD", 7))
+        self.assertEqual(Product.objects.get(sku="B2").currency, "BDT")
+
+        BanglaIntent.objects.create(client=self.client_obj, name="greet", training_phrase="হ্যালো",
+                                    ai_response_template="হাই", examples=["hi"], confidence_threshold=0.5)
+        lines = [
+            json.dumps({"name": "greet", "training_phrase": "হ্যালো", "ai_response_template": "নমস্কার"}),
+            json.dumps({"name": "bye", "training_phrase": "বিদায়", "ai_response_template": "আবার আসবেন",
+                        "examples": ["bye"]}),
+        ]
+        IntentImporter(client=self.client_obj).run(iter_records(lines, "ndjson"))
+        intent = BanglaIntent.objects.get(name="greet")
+        self.assertEqual((intent.ai_response_template, intent.examples, intent.confidence_threshold),
+                         ("নমস্কার", ["hi"], 0.5))
+        self.assertEqual(BanglaIntent.objects.get(name="bye").examples, ["bye"])
+
+    def test_ndjson_intent_upsert(self):
+        from .importers import IntentImporter, iter_records
+        lines = [
+            json.dumps({"name": "greet", "training_phrase": "হ্যালো", "ai_response_template": "হাই",
+                        "examples": ["hi", "hello"]}),
+            "{not json",
+            json.dumps({"name": "greet", "training_phrase": "হ্যালো", "ai_response_template": "নমস্কার"}),
+        ]
+        result = IntentImporter(client=self.client_obj).run(iter_records(lines, "ndjson"))
+        self.assertEqual(result["error_count"], 1)
+        intent = BanglaIntent.objects.get(client=self.client_obj, name="greet")
+        self.assertEqual(intent.ai_response_template, "নমস্কার")
+        self.assertEqual(BanglaIntent.objects.filter(client=self.client_obj).count(), 1)
+
+    def test_import_api_is_scoped_to_the_organization(self):
+        from rest_framework.test import APIClient
+        from accounts.models import User
+        own = Client.objects.create(name="Own", domain="own.example", contact_email="a@own.example",
+                                    organization=self.other_org)
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(User.objects.create(username="other_importer", organization=self.other_org))
+        body = json.dumps({"name": "greet", "training_phrase": "হ্যালো", "ai_response_template": "হাই"})
+        response = api.post(f"/api/intents/import/?client_id={self.client_obj.id}", body,
+                            content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 404)
+        body = json.dumps({"client_id": self.client_obj.id, "name": "greet", "training_phrase": "হ্যালো",
+                           "ai_response_template": "হাই"})
+        response = api.post(f"/api/intents/import/?client_id={own.id}", body, content_type="application/x-ndjson")
+        self.assertEqual(response.json()["errors"][0]["errors"], {"client_id": ["Client not found."]})
+        self.assertFalse(BanglaIntent.objects.exists())
+
+    def test_import_api_rejects_input_that_is_not_utf8(self):
+        from rest_framework.test import APIClient
+        from accounts.models import User
+        from .importers import ImportFormatError, iter_records
+        self.client_obj.organization = self.org
+        self.client_obj.save()
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(User.objects.create(username="latin1_importer", organization=self.org))
+        body = "sku,name,price\nA1,Café,5\n".encode("latin-1")
+        response = api.post(f"/api/products/import/?client_id={self.client_obj.id}", body,
+                            content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Line 2", response.json()["error"])
+        response = api.post(f"/api/intents/import/?client_id={self.client_obj.id}", b'{"name": "gr\xe9et"}\n',
+                            content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaisesMessage(ImportFormatError, "Line 2"):
+            list(iter_records(["sku,name\n", "A1," + "x" * 200000 + "\n"], "csv"))
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class ProductAvailabilityCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from accounts.models import Organization
+        from . import availability, invalidation
+        from .models import Product
+        cache.clear()
+        availability._hot.clear()
+        invalidation.sync(force=True)
+        org = Organization.objects.create(name="Stock Org")
+        client = Client.objects.create(name="Shop", domain="shop.com", contact_email="s@shop.com")
+        for i in range(3):
+            Product.objects.create(client=client, organization=org, sku=f"S{i}", name=f"P{i}", price=10, stock_qty=i)
+
+    def test_batch_lookup_is_one_query_then_cached(self):
+        from .availability import get_availability
+        with self.assertNumQueries(1):
+            found = get_availability(["S0", "S1", "S2", "NOPE"])
+        self.assertEqual(sorted(found), ["S0", "S1", "S2"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_availability(["S1", "NOPE"])["S1"]["qty"], 1)
+
+    def test_save_invalidates(self):
+        from .availability import get_availability
+        from .models import Product
+        get_availability(["S1"])
+        product = Product.objects.get(sku="S1")
+        product.stock_qty = 42
+        product.save()
+        self.assertEqual(get_availability(["S1"])["S1"]["qty"], 42)
+        product.is_active = False
+        product.save()
+        self.assertEqual(get_availability(["S1"]), {})
+
+    def test_sku_rename_invalidates_old_sku(self):
+        from .availability import get_availability
+        from .models import Product
+        self.assertIn("S2", get_availability(["S2"]))
+        product = Product.objects.get(sku="S2")
+        product.sku = "S2-NEW"
+        product.save()
+        self.assertEqual(get_availability(["S2"]), {})
+        self.assertEqual(get_availability(["S2-NEW"])["S2-NEW"]["qty"], 2)
+
+
+class ChatToolExecutorTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from accounts.models import Organization
+        from . import availability
+        from .models import Product
+        cache.clear()
+        availability._hot.clear()
+        org = Organization.objects.create(name="Tool Org")
+        self.client_obj = Client.objects.create(name="Shop", domain="shop.com", contact_email="s@shop.com")
+        other = Client.objects.create(name="Other", domain="other.com", contact_email="o@other.com")
+        Product.objects.create(client=self.client_obj, organization=org, sku="SKU-12", name="Shirt", price=10, stock_qty=3)
+        Product.objects.create(client=other, organization=org, sku="SKU-99", name="Hidden", price=10)
+
+    def test_availability_is_scoped_and_cached(self):
+        from services.chat_tools import ChatToolExecutor
+        executor = ChatToolExecutor(self.client_obj, "visitor")
+        call = ("c1", "check_product_availability", '{"skus": ["SKU-12", "SKU-99"]}')
+        result = json.loads(executor.execute([call])["c1"])
+        self.assertEqual([p["sku"] for p in result["products"]], ["SKU-12"])
+        self.assertEqual(result["not_found"], ["SKU-99"])
+        with self.assertNumQueries(0):
+            ChatToolExecutor(self.client_obj, "visitor").execute([call])
+
+    def test_parallel_calls_and_bad_arguments(self):
+        from services.chat_tools import ChatToolExecutor
+        results = ChatToolExecutor(self.client_obj, "visitor").execute([
+            ("a", "get_order_status", '{"order_id": "1"}'),
+            ("b", "get_payment_status", '{"payment_id": "PMT2"}'),
+            ("c", "get_order_status", "not json"),
+        ])
+        self.assertEqual(json.loads(results["a"])["tracking_number"], "TRK123456")
+        self.assertEqual(json.loads(results["b"])["status"], "pending")
+        self.assertIn("error", json.loads(results["c"]))
+
+    def test_chat_response_runs_tool_round_trip(self):
+        from types import SimpleNamespace
+        from services.chat_tools import CHAT_TOOLS, ChatToolExecutor
+        from services.openai_service import OpenAIService
+
+        def completion(message):
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                usage=SimpleNamespace(total_tokens=10),
+            )
+
+        tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(
+            name="check_product_availability", arguments='{"skus": ["SKU-12"]}'))
+        replies = iter([
+            completion(SimpleNamespace(content=None, tool_calls=[tool_call])),
+            completion(SimpleNamespace(content="Yes, 3 in stock.", tool_calls=None)),
+        ])
+        sent = []
+
+        def create(**kwargs):
+            sent.append(list(kwargs["messages"]))
+            return next(replies)
+
+        service = OpenAIService()
+        service.api_key = "test"
+        service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        result = service.generate_chat_response(
+            "Is SKU-12 in stock?", tools=CHAT_TOOLS, tool_executor=ChatToolExecutor(self.client_obj, "visitor"))
+
+        self.assertEqual(result["response"], "Yes, 3 in stock.")
+        self.assertEqual(result["tools_used"], ["check_product_availability"])
+        self.assertEqual(result["tokens_used"], 20)
+        tool_message = sent[1][-1]
+        self.assertEqual(tool_message["role"], "tool")
+        self.assertEqual(json.loads(tool_message["content"])["products"][0]["qty"], 3)
+
+
+class RetrievalIndexTest(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        from accounts.models import Organization
+        from .models import Product
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = override_settings(RETRIEVAL_INDEX_DIR=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        org = Organization.objects.create(name="Knowledge Org")
+        self.client_obj = Client.objects.create(
+            name="Shop", domain="shop.com", contact_email="s@shop.com",
+            description="ঢাকার ভিতরে ডেলিভারি ২ দিনে, বাইরে ৫ দিনে। ক্যাশ অন ডেলিভারি আছে।")
+        BanglaIntent.objects.create(
+            client=self.client_obj, name="return", training_phrase="পণ্য ফেরত দিতে চাই",
+            ai_response_template="৭ দিনের মধ্যে রিটার্ন করা যাবে", examples=["রিটার্ন পলিসি কী?"])
+        Product.objects.create(client=self.client_obj, organization=org, sku="TS-1",
+                               name="কটন টি-শার্ট", price=499, description="১০০% কটন")
+
+    def test_tokenize_normalizes_bangla(self):
+        from .retrieval import tokenize
+        self.assertEqual(tokenize("অর্ডারের ১২ SKU-12"), ["অর্ডার", "12", "sku", "12"])
+
+    def test_first_query_schedules_build_and_ranks(self):
+        from unittest import mock
+        from . import retrieval
+        from .retrieval import build_client_index, retrieve
+        with mock.patch.object(retrieval, "schedule_build") as schedule_build:
+            self.assertEqual(retrieve(self.client_obj.id, "রিটার্ন পলিসি"), [])
+        schedule_build.assert_called_once_with(self.client_obj.id)
+        build_client_index(self.client_obj.id)
+        results = retrieve(self.client_obj.id, "রিটার্ন পলিসি")
+        self.assertEqual(results[0]["key"], f"intent:{BanglaIntent.objects.get().id}")
+        self.assertEqual(retrieve(self.client_obj.id, "ডেলিভারি কত দিনে")[0]["key"], f"client:{self.client_obj.id}")
+
+    def test_incremental_update_on_save(self):
+        from .models import Product
+        from .retrieval import build_client_index, retrieve
+        build_client_index(self.client_obj.id)
+        product = Product.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "লেদার ব্যাগ"
+            product.save()
+        self.assertEqual(retrieve(self.client_obj.id, "ব্যাগ")[0]["key"], f"product:{product.id}")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(retrieve(self.client_obj.id, "ব্যাগ"), [])
+
+    def test_rebuild_drops_only_the_replaced_generation(self):
+        import shutil
+        from unittest import mock
+        from . import retrieval
+        first = retrieval.build_client_index(self.client_obj.id)
+        stale_tmp = first.parent / ".gen-1.tmp"
+        stale_tmp.mkdir()
+        second = retrieval.build_client_index(self.client_obj.id)
+        self.assertFalse(first.exists())
+        self.assertFalse(stale_tmp.exists())
+        self.assertEqual(retrieval.current_generation(first.parent), second)
+
+        # A save that read CURRENT just before a concurrent build deleted that generation
+        shutil.rmtree(second)
+        with mock.patch.object(retrieval, "schedule_build") as schedule_build:
+            retrieval.record_change(self.client_obj.id, "product:1", "নতুন পণ্য")
+        schedule_build.assert_called_once_with(self.client_obj.id)
+
+    def test_import_schedules_rebuild_off_the_request(self):
+        from unittest import mock
+        from rest_framework.test import APIClient
+        from accounts.models import User
+        from . import retrieval
+        from .models import Product
+        retrieval.build_client_index(self.client_obj.id)
+        self.addCleanup(retrieval._scheduled.discard, self.client_obj.id)
+        org = Product.objects.get().organization
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(User.objects.create(username="index_importer", is_superuser=True, organization=org))
+        body = "sku,name,price\nTS-2,লেদার ব্যাগ,900\n".encode("utf-8")
+        with mock.patch.object(retrieval, "build_client_index") as build, \
+                mock.patch.object(retrieval.threading, "Thread") as thread:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = api.post(f"/api/products/import/?client_id={self.client_obj.id}", body,
+                                    content_type="text/csv")
+        self.assertEqual(response.status_code, 200)
+        build.assert_not_called()
+        thread.assert_called_once_with(target=retrieval._build_in_background, args=(self.client_obj.id,),
+                                       name=f"retrieval-build-{self.client_obj.id}", daemon=True)
+
+    def test_snippets_fit_token_budget(self):
+        from .retrieval import estimate_tokens, select_snippets
+        results = [{"text": "ক" * 40}, {"text": "খ" * 400}, {"text": "গ" * 20}]
+        chosen = select_snippets(results, token_budget=60)
+        self.assertEqual(chosen, ["ক" * 40, "গ" * 20])
+        self.assertLessEqual(sum(map(estimate_tokens, chosen)), 60)
+
+    def test_empty_client_index(self):
+        from .retrieval import build_client_index, retrieve
+        empty = Client.objects.create(name="Empty", domain="e.com", contact_email="e@e.com")
+        build_client_index(empty.id)
+        self.assertEqual(retrieve(empty.id, "কিছু"), [])
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class TenantRuntimeTest(TestCase):
+    def setUp(self):
+        from accounts.models import Organization
+        from chat.models import AIAgent
+        from . import invalidation
+        invalidation.sync(force=True)
+        self.client_obj = Client.objects.create(name="Runtime Shop", domain="rt.com", contact_email="r@rt.com")
+        BanglaIntent.objects.create(
+            client=self.client_obj, name="delivery", training_phrase="ডেলিভারি কবে হবে",
+            ai_response_template="২-৩ দিনে", examples=["পণ্য কখন পাবো"])
+        self.org = Organization.objects.create(name="Runtime Org")
+        self.agent = AIAgent.objects.create(
+            organization=self.org, name="Helper", system_prompt="Be brief.",
+            voice_enabled=True, handoff_triggers=["human", "মানুষ"])
+
+    def test_warm_lookup_makes_no_queries(self):
+        from .runtime import get_client_runtime, get_organization_runtime
+        get_client_runtime(self.client_obj.id)
+        get_organization_runtime(self.org.id)
+        with self.assertNumQueries(0):
+            client = get_client_runtime(self.client_obj.id)
+            org = get_organization_runtime(self.org.id)
+        self.assertIn("Runtime Shop", client.prompts["bangla"])
+        self.assertEqual(org.voice_agent.prompt, "Be brief. You are responding on behalf of Runtime Org.")
+
+    def test_rebuilds_after_save(self):
+        from .runtime import get_client_runtime, get_organization_runtime
+        self.assertEqual(get_client_runtime(self.client_obj.id).name, "Runtime Shop")
+        get_organization_runtime(self.org.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_obj.name = "Renamed Shop"
+            self.client_obj.save()
+            self.agent.status = "inactive"
+            self.agent.save()
+        self.assertEqual(get_client_runtime(self.client_obj.id).name, "Renamed Shop")
+        self.assertIsNone(get_organization_runtime(self.org.id).voice_agent)
+        self.assertIsNone(get_client_runtime(999999))
+
+    def test_match_intent(self):
+        from .runtime import get_client_runtime
+        client = get_client_runtime(self.client_obj.id)
+        self.assertEqual(client.match_intent("আমার ডেলিভারি কবে হবে?"), "delivery")
+        self.assertEqual(client.match_intent("দাম কত"), "")
+
+    def test_handoff_trigger_transfers_conversation(self):
+        from accounts.models import User
+        from chat.models import Conversation
+        from services.social_media_service import SocialMediaService
+        user = User.objects.create(username="rt_user", organization=self.org)
+        conversation = Conversation.objects.create(user=user, organization=self.org, ai_agent=self.agent)
+        SocialMediaService(self.org)._generate_ai_response(conversation, "I want to talk to a HUMAN")
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.status, "transferred")
+        self.assertEqual(conversation.transfer_reason, "Handoff trigger: human")
+
+    def test_handoff_trigger_matches_other_encodings(self):
+        from .runtime import get_organization_runtime
+        agent = get_organization_runtime(self.org.id).agents[self.agent.id]
+        self.assertEqual(agent.wants_handoff("একজন মা\u200cনুষের সাথে কথা বলতে চাই"), "মানুষ")
+        self.assertIsNone(agent.wants_handoff("ধন্যবাদ"))
+
+
+class InvalidationBusTest(TestCase):
+    def test_database_bus_delivers_other_workers_events(self):
+        from .invalidation import DatabaseBus
+        writer, reader = DatabaseBus(), DatabaseBus()
+        self.assertEqual(reader.poll(), [])
+        writer.publish("runtime.client", "7")
+        writer.publish("availability", None)
+        self.assertEqual(reader.poll(), [("runtime.client", "7"), ("availability", None)])
+        self.assertEqual(reader.poll(), [])
+        self.assertEqual(writer.poll(), [])
+        writer.publish("availability", "S1")
+        self.assertEqual(writer.poll(), [])
+
+    def test_sync_drops_entries_published_elsewhere(self):
+        from . import invalidation, runtime
+        client = Client.objects.create(name="Bus Shop", domain="bus.com", contact_email="b@bus.com")
+        # A fresh process bus; ids of events from earlier, rolled-back tests are reused
+        self.addCleanup(setattr, invalidation, "_bus", invalidation._bus)
+        invalidation._bus = invalidation.DatabaseBus()
+        invalidation.sync(force=True)
+        self.assertEqual(runtime.get_client_runtime(client.id).name, "Bus Shop")
+        # Another node renames the client; this process sees only the bus event
+        Client.objects.filter(id=client.id).update(name="Renamed Elsewhere")
+        invalidation.DatabaseBus().publish("runtime.client", str(client.id))
+        self.assertEqual(runtime.get_client_runtime(client.id).name, "Bus Shop")
+        invalidation.sync(force=True)
+        self.assertEqual(runtime.get_client_runtime(client.id).name, "Renamed Elsewhere")
+
+    def test_lagging_worker_drops_everything(self):
+        from .invalidation import DatabaseBus
+        reader = DatabaseBus()
+        reader.poll()
+        reader.polled_at -= 7200
+        self.assertIsNone(reader.poll())
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class ChatRateLimitTest(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.core.cache import cache
+        from accounts.models import Organization, Subscription
+        from . import invalidation, ratelimit
+        cache.clear()
+        ratelimit._local.clear()
+        invalidation.sync(force=True)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = override_settings(RETRIEVAL_INDEX_DIR=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        org = Organization.objects.create(name="Quota Org")
+        Subscription.objects.create(organization=org, plan_name="Starter", amount=10, max_conversations=1)
+        self.client_obj = Client.objects.create(
+            name="Quota Shop", domain="q.com", contact_email="q@q.com", organization=org)
+
+    def test_token_bucket_allows_burst_then_waits(self):
+        from .ratelimit import token_bucket
+        self.assertEqual([token_bucket("ip:1.2.3.4", 2, 0.5) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(token_bucket("ip:1.2.3.4", 2, 0.5), 2, delta=0.1)
+        self.assertEqual(token_bucket("ip:5.6.7.8", 2, 0.5), 0)
+
+    def test_sliding_window_limit(self):
+        from .ratelimit import sliding_window
+        self.assertEqual([sliding_window("user:1:a", 3, 60) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(sliding_window("user:1:a", 3, 60), 0)
+
+    def test_plan_quota_returns_429_with_retry_after(self):
+        from rest_framework.test import APIClient
+        api = APIClient(SERVER_NAME="localhost")
+        payload = {"client_id": self.client_obj.id, "user_name": "rahim", "message": "হ্যালো"}
+        self.assertEqual(api.post("/api/chat/", payload, format="json").status_code, 201)
+        # The same user keeps chatting; a second new user exceeds the plan's quota of one
+        self.assertEqual(api.post("/api/chat/", payload, format="json").status_code, 201)
+        response = api.post("/api/chat/", {**payload, "user_name": "karim"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_quota_counts_normalized_names_and_honours_raw_name_keys(self):
+        import hashlib
+        from django.core.cache import cache
+        from django.utils import timezone
+        from .ratelimit import _count_client_conversations, _month_start, conversation_quota
+        from .runtime import get_client_runtime, get_organization_runtime
+        for name in ("Rahim", "rahim", "করিম"):
+            BanglaConversation.objects.create(client=self.client_obj, user_name=name, user_message="হ্যালো",
+                                              ai_response="হাই")
+        since = _month_start(timezone.now())
+        self.assertEqual(_count_client_conversations(self.client_obj.id, since), 2)
+
+        # A user admitted this month before the seen keys were normalized
+        cache.clear()
+        month = timezone.now().strftime("%Y%m")
+        raw = hashlib.sha1("Karim".encode("utf-8")).hexdigest()
+        cache.set(f"quota:seen:{self.client_obj.id}:{month}:{raw}", 1)
+        client = get_client_runtime(self.client_obj.id)
+        organization = get_organization_runtime(self.client_obj.organization_id)
+        self.assertEqual(conversation_quota(client, "Karim", organization), 0)
+        self.assertGreater(conversation_quota(client, "Jamal", organization), 0)
+
+    @override_settings(CHAT_RATE_IP_BURST=1)
+    def test_ip_burst_limit_on_endpoint(self):
+        from rest_framework.test import APIClient
+        api = APIClient(SERVER_NAME="localhost")
+        api.post("/api/chat/", {"client_id": 999999, "user_name": "x", "message": "y"}, format="json")
+        response = api.post("/api/chat/", {"client_id": 999999, "user_name": "x", "message": "y"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+
+    @override_settings(CHAT_RATE_IP_BURST=1)
+    def test_forwarded_for_header_is_not_trusted_by_default(self):
+        from rest_framework.test import APIClient
+        api = APIClient(SERVER_NAME="localhost")
+        payload = {"client_id": 999999, "user_name": "x", "message": "y"}
+        api.post("/api/chat/", payload, format="json", HTTP_X_FORWARDED_FOR="10.0.0.1")
+        response = api.post("/api/chat/", payload, format="json", HTTP_X_FORWARDED_FOR="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+
+    def test_created_clients_join_the_creators_organization(self):
+        from rest_framework.test import APIClient
+        from accounts.models import User
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(User.objects.create(username="quota_owner", organization=self.client_obj.organization))
+        response = api.post("/api/clients/", {"name": "Second", "domain": "second.example",
+                                              "contact_email": "a@second.example"}, format="json")
+        self.assertEqual(Client.objects.get(id=response.json()["id"]).organization_id,
+                         self.client_obj.organization_id)
+
+    def test_falls_back_to_local_counters(self):
+        from unittest import mock
+        from . import ratelimit
+        broken = mock.Mock(**{"get_many.side_effect": ConnectionError("cache down")})
+        with mock.patch.object(ratelimit, "cache", broken), mock.patch.object(ratelimit, "_fallback_until", 0.0):
+            self.assertEqual(ratelimit.sliding_window("client:9", 1, 60), 0)
+            self.assertGreater(ratelimit.sliding_window("client:9", 1, 60), 0)
+
+
+class UsageMeteringTest(TestCase):
+    def setUp(self):
+        from . import metering
+        metering._pending.clear()
+        self.addCleanup(metering._pending.clear)
+
+    def test_flush_adds_to_existing_rows(self):
+        from . import metering
+        from .models import Usage
+        metering.record('chats', 1, client_id=5, organization_id=2)
+        metering.record('chats', 2, client_id=5, organization_id=2)
+        metering.record('tokens', 120, client_id=5)
+        self.assertEqual(metering.flush(), 3)
+        metering.record('chats', 4, client_id=5)
+        self.assertEqual(metering.flush(), 1)
+        self.assertEqual(Usage.objects.get(scope='client', scope_id=5, metric='chats').value, 7)
+        self.assertEqual(Usage.objects.get(scope='organization', scope_id=2, metric='chats').value, 3)
+
+    def test_get_usage_includes_unflushed_counts(self):
+        from . import metering
+        metering.record('tts_characters', 300, client_id=6)
+        metering.flush()
+        metering.record('tts_characters', 50, client_id=6)
+        self.assertEqual(metering.get_usage('client', 6)['tts_characters'], 350)
+        daily = metering.get_daily_usage('client', 6)
+        self.assertEqual(len(daily), 1)
+        self.assertEqual(daily[0]['tts_characters'], 350)
+
+    def test_failed_flush_keeps_counts(self):
+        from unittest import mock
+        from . import metering
+        metering.record('voice_seconds', 61.6, organization_id=3)
+        with mock.patch.object(metering, '_upsert', side_effect=RuntimeError('db down')):
+            self.assertEqual(metering.flush(), 0)
+        self.assertEqual(metering.flush(), 1)
+        self.assertEqual(metering.get_usage('organization', 3)['voice_seconds'], 62)
+
+    def test_usage_endpoint(self):
+        from rest_framework.test import APIClient
+        from accounts.models import Organization, User
+        from . import metering
+        org = Organization.objects.create(name="Metered Org")
+        client = Client.objects.create(name="Metered", domain="m.com", contact_email="m@m.com", max_voice_minutes=30,
+                                       organization=org)
+        metering.record('chats', 2, client_id=client.id)
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(User.objects.create(username="billing", organization=org))
+        data = api.get(f"/api/usage/?client_id={client.id}").json()
+        self.assertEqual(data["usage"]["chats"], 2)
+        self.assertEqual(data["limits"]["max_voice_minutes"], 30)
+        self.assertEqual(api.get(f"/api/usage/?organization_id={org.id}").status_code, 200)
+        self.assertEqual(api.get("/api/usage/?client_id=1&start=May").status_code, 400)
+
+        other = Organization.objects.create(name="Other Metered Org")
+        api.force_authenticate(User.objects.create(username="other_billing", organization=other))
+        self.assertEqual(api.get(f"/api/usage/?client_id={client.id}").status_code, 404)
+        self.assertEqual(api.get(f"/api/usage/?organization_id={org.id}").status_code, 404)
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+        from accounts.models import Organization, User
+        from . import invalidation
+        invalidation.sync(force=True)
+        self.org = Organization.objects.create(name="Auth Org", approval_status="approved")
+        self.user = User.objects.create(username="token_user", organization=self.org)
+        self.token = Token.objects.create(user=self.user)
+
+    def _api(self):
+        from rest_framework.test import APIClient
+        api = APIClient(SERVER_NAME="localhost")
+        api.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return api
+
+    def test_cache_hit_makes_no_queries(self):
+        api = self._api()
+        self.assertTrue(api.get("/api/client/features/").json()["is_approved"])
+        with self.assertNumQueries(0):
+            self.assertTrue(api.get("/api/client/features/").json()["is_approved"])
+
+    def test_approval_change_and_token_delete_invalidate(self):
+        api = self._api()
+        api.get("/api/client/features/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.org.approval_status = "suspended"
+            self.org.save()
+        self.assertFalse(api.get("/api/client/features/").json()["is_approved"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(api.get("/api/client/features/").status_code, 401)
+
+    def test_admin_permissions_cached_and_invalidated(self):
+        from .authentication import get_admin_permissions
+        profile = AdminProfile.objects.create(user=self.user, role="moderator", can_view_analytics=True)
+        self.assertEqual(get_admin_permissions(self.user)[0], "Moderator")
+        with self.assertNumQueries(0):
+            self.assertTrue(get_admin_permissions(self.user)[1]["can_view_analytics"])
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.can_view_analytics = False
+            profile.save()
+        self.assertFalse(get_admin_permissions(self.user)[1]["can_view_analytics"])
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class OrganizationAPIKeyAuthenticationTest(TestCase):
+    def setUp(self):
+        from accounts.models import Organization, OrganizationAPIKey, User
+        from . import invalidation
+        invalidation.sync(force=True)
+        self.org = Organization.objects.create(name="Key Org", approval_status="approved")
+        self.user = User.objects.create(username="key_user", organization=self.org)
+        self.api_key, self.full_key = OrganizationAPIKey.create_key(self.org, self.user, "Integration")
+
+    def _api(self, key=None):
+        from rest_framework.test import APIClient
+        api = APIClient(SERVER_NAME="localhost")
+        api.credentials(HTTP_AUTHORIZATION=f"Api-Key {key or self.full_key}")
+        return api
+
+    def test_only_prefix_and_hash_are_stored(self):
+        prefix, secret = self.full_key.split(".", 1)
+        self.assertEqual(self.api_key.prefix, prefix)
+        self.assertNotIn(secret, self.api_key.hashed_key)
+
+    def test_cache_hit_makes_no_queries(self):
+        api = self._api()
+        self.assertTrue(api.get("/api/client/features/").json()["is_approved"])
+        with self.assertNumQueries(0):
+            self.assertTrue(api.get("/api/client/features/").json()["is_approved"])
+
+    def test_wrong_secret_rejected_even_when_cached(self):
+        self._api().get("/api/client/features/")
+        response = self._api(f"{self.api_key.prefix}.wrong").get("/api/client/features/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self._api("nosuchprefix.secret").get("/api/client/features/").status_code, 401)
+
+    def test_deactivation_invalidates(self):
+        api = self._api()
+        api.get("/api/client/features/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_key.is_active = False
+            self.api_key.save()
+        self.assertEqual(api.get("/api/client/features/").status_code, 401)
+
+    def test_last_used_written_in_batches(self):
+        from .authentication import flush_last_used
+        api = self._api()
+        api.get("/api/client/features/")
+        api.get("/api/client/features/")
+        self.api_key.refresh_from_db()
+        self.assertIsNone(self.api_key.last_used)
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_last_used(), 1)
+        self.api_key.refresh_from_db()
+        self.assertIsNotNone(self.api_key.last_used)
+
+
+class StatelessRouteMiddlewareTest(TestCase):
+    def test_route_classification(self):
+        from django.test import RequestFactory
+        from .middleware import is_stateless
+        factory = RequestFactory()
+        self.assertTrue(is_stateless(factory.post("/voice/twilio/voice/1/")))
+        self.assertTrue(is_stateless(factory.post("/social/webhook/whatsapp/1/", HTTP_COOKIE="sessionid=abc")))
+        self.assertTrue(is_stateless(factory.get("/api/usage/")))
+        self.assertFalse(is_stateless(factory.get("/api/usage/", HTTP_COOKIE="sessionid=abc")))
+        self.assertFalse(is_stateless(factory.get("/chat/")))
+
+    def test_session_users_can_still_call_the_api(self):
+        from accounts.models import Organization, User
+        org = Organization.objects.create(name="Session Org", approval_status="approved")
+        self.client.force_login(User.objects.create(username="session_user", organization=org))
+        response = self.client.get("/api/client/features/", SERVER_NAME="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_approved"])
+
+    def test_webhooks_get_no_session_or_csrf_cookie(self):
+        response = self.client.post("/voice/twilio/voice/999999/", SERVER_NAME="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertNotIn("csrftoken", response.cookies)
+
+
+@override_settings(INVALIDATION_POLL_INTERVAL=60)
+class CachedSessionTest(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        from accounts.models import User
+        from . import invalidation
+        invalidation.sync(force=True)
+        caches["sessions"].clear()
+        self.user = User.objects.create(username="session_cache_user")
+        self.client.force_login(self.user)
+
+    def test_page_loads_skip_the_session_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get("/profile/", SERVER_NAME="localhost")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/profile/", SERVER_NAME="localhost").status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if "django_session" in q["sql"]])
+
+    def test_delete_elsewhere_drops_cached_session(self):
+        from importlib import import_module
+        from django.conf import settings
+        self.client.get("/profile/", SERVER_NAME="localhost")
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        with self.captureOnCommitCallbacks(execute=True):
+            import_module(settings.SESSION_ENGINE).SessionStore().delete(session_key)
+        self.assertEqual(self.client.get("/profile/", SERVER_NAME="localhost").status_code, 302)
+
+    def test_save_publishes_after_the_write(self):
+        from importlib import import_module
+        from unittest import mock
+        from django.conf import settings
+        from django.contrib.sessions.models import Session
+        from django.core.cache import caches
+        from . import invalidation
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store["step"] = 1
+        store.create()
+        published = []
+
+        def record(topic, key):
+            published.append(Session.objects.get(session_key=key).get_decoded()["step"])
+
+        with mock.patch.object(invalidation.get_bus(), "publish", side_effect=record):
+            with self.captureOnCommitCallbacks(execute=True):
+                store["step"] = 2
+                store.save()
+                self.assertEqual(published, [])
+        self.assertEqual(published, [2])
+        self.assertIsNotNone(caches["sessions"].get(store.cache_key))
+
+    def test_purge_expired_sessions(self):
+        from datetime import timedelta
+        from django.contrib.sessions.models import Session
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        Session.objects.create(session_key="expired", session_data="", expire_date=timezone.now() - timedelta(days=1))
+        call_command("purge_expired_sessions", "--batch-size", "1", "--pause", "0", stdout=StringIO())
+        self.assertFalse(Session.objects.filter(session_key="expired").exists())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class StatementTimeoutTest(TestCase):
+    def test_route_classes(self):
+        from django.test import RequestFactory
+        from .middleware import route_class
+        factory = RequestFactory()
+        self.assertEqual(route_class(factory.post("/voice/twilio/sms/1/")), "webhook")
+        self.assertEqual(route_class(factory.get("/api/usage/")), "api")
+        self.assertEqual(route_class(factory.get("/admin-dashboard/")), "admin")
+        self.assertEqual(route_class(factory.get("/chat/")), "page")
+
+    def test_set_only_when_timeout_changes(self):
+        from types import SimpleNamespace
+        from .middleware import _StatementTimeout
+        sent = []
+        connection = SimpleNamespace(alias="default", in_atomic_block=False, _statement_timeout=None)
+        context = {"connection": connection, "cursor": SimpleNamespace(cursor=SimpleNamespace(execute=sent.append))}
+        execute = lambda sql, params, many, context: sql
+        for timeout in (5000, 5000, 30000):
+            _StatementTimeout(timeout)(execute, "SELECT 1", None, False, context)
+        self.assertEqual(sent, ["SET statement_timeout = 5000", "SET statement_timeout = 30000"])
+
+
+class SQLiteBackendTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.db.utils import ConnectionHandler
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.connection = ConnectionHandler({"default": {
+            "ENGINE": "core.db.sqlite3", "NAME": f"{self.directory.name}/test.sqlite3",
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "synchronous": "NORMAL"},
+        }})["default"]
+        self.addCleanup(self.connection.close)
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+
+    def test_wal_and_pragmas(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_writer_lock_held_for_the_transaction(self):
+        writer = self.connection.writer
+        self.connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        with self.connection.cursor() as cursor:
+            cursor.execute("INSERT INTO item (name) VALUES (%s)", ["a"])
+        self.assertIs(self.connection.held_writer, writer)
+        self.connection.rollback()
+        self.connection.set_autocommit(True)
+        self.assertIsNone(self.connection.held_writer)
+        self.assertEqual(writer._depth, 0)
+        with self.connection.cursor() as cursor:
+            cursor.execute("INSERT INTO item (name) VALUES (%s)", ["b"])
+            cursor.execute("SELECT name FROM item")
+            self.assertEqual(cursor.fetchall(), [("b",)])
+        self.assertEqual(writer._depth, 0)
+
+    def test_writer_lock_wait_is_bounded_by_timeout(self):
+        import time
+        from django.db import OperationalError
+        from .db.sqlite3.base import WriterLock
+        self.connection.settings_dict["OPTIONS"]["timeout"] = 0.2
+        # Another process's writer: flock conflicts between separately opened files
+        other = WriterLock(self.connection.writer.path)
+        other.acquire()
+        self.addCleanup(other.release)
+        started = time.monotonic()
+        with self.assertRaises(OperationalError):
+            with self.connection.cursor() as cursor:
+                cursor.execute("INSERT INTO item (name) VALUES (%s)", ["a"])
+        self.assertLess(time.monotonic() - started, 2)
+        with self.assertRaises(OperationalError):
+            self.connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        self.assertIsNone(self.connection.held_writer)
+        self.assertEqual(self.connection.writer._depth, 0)
+
+    def test_common_table_expression_writes_take_the_lock(self):
+        from .db.sqlite3.base import _is_write
+        self.assertTrue(_is_write("WITH old AS (SELECT id FROM item) DELETE FROM item WHERE id IN old"))
+        self.assertTrue(_is_write("with n(x) as (values (1)) insert into item (name) select x from n"))
+        self.assertFalse(_is_write("WITH n AS (SELECT updated_at FROM item) SELECT * FROM n"))
+        self.assertFalse(_is_write("SELECT 1"))
+
+
+class ReplicaRouterTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        from django.core.management import call_command
+        from django.db import connections
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["replica_test"] = {**connections.settings["default"],
+                                                "NAME": f"{cls.directory.name}/replica.sqlite3"}
+        cls.databases = cls.databases | {"replica_test"}
+        call_command("migrate", database="replica_test", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+        connections["replica_test"].close()
+        del connections["replica_test"]
+        del connections.settings["replica_test"]
+        cls.databases = cls.databases - {"replica_test"}
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def _sqlite(self, directory, name):
+        from django.db.utils import ConnectionHandler
+        from .models import ReplicaHeartbeat
+        connection = ConnectionHandler({"default": {"ENGINE": "core.db.sqlite3", "NAME": f"{directory}/{name}"}})["default"]
+        self.addCleanup(connection.close)
+        with connection.schema_editor() as editor:
+            editor.create_model(ReplicaHeartbeat)
+        return connection
+
+    def test_lag_from_heartbeat_on_two_sqlite_files(self):
+        import tempfile
+        from .db.routers import read_heartbeat, replica_lag, write_heartbeat
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = self._sqlite(directory, "primary.sqlite3"), self._sqlite(directory, "replica.sqlite3")
+            self.assertIsNone(replica_lag(primary, replica))
+            write_heartbeat(replica, read_heartbeat(primary) - 30)
+            self.assertGreaterEqual(replica_lag(primary, replica), 30)
+            write_heartbeat(replica, read_heartbeat(primary))
+            self.assertEqual(replica_lag(primary, replica), 0)
+
+            # An idle primary: its heartbeat is stale, but the replica has all of it
+            idle_since = read_heartbeat(primary) - 30
+            write_heartbeat(primary, idle_since)
+            write_heartbeat(replica, idle_since)
+            self.assertEqual(replica_lag(primary, replica), 0)
+            self.assertGreater(read_heartbeat(primary), idle_since)
+
+    def test_falls_back_to_primary_when_replica_lags(self):
+        from django.db import connections
+        from .db import routers
+        primary, replica = connections["default"], connections["replica_test"]
+        router = routers.ReplicaRouter()
+        decisions = []
+
+        @routers.read_from_replica
+        def view(request):
+            decisions.append(router.db_for_read(Client))
+
+        with override_settings(DATABASE_REPLICA_ALIAS="replica_test", REPLICA_MAX_LAG=10):
+            now = routers.write_heartbeat(primary)
+            for copied in (now - 30, now - 1):
+                routers.write_heartbeat(replica, copied)
+                routers._health.checked_at = None
+                view(None)
+        self.assertEqual(decisions, ["default", "replica_test"])
+
+    @override_settings(DATABASE_REPLICA_ALIAS="default")
+    def test_opted_in_views_read_from_replica(self):
+        from django.contrib.sessions.models import Session
+        from django.test import RequestFactory
+        from .db import routers
+        router = routers.ReplicaRouter()
+        routers._health.checked_at = None
+        decisions = {}
+
+        @routers.read_from_replica
+        def view(request):
+            decisions["client"] = router.db_for_read(Client)
+            decisions["session"] = router.db_for_read(Session)
+
+        self.assertIsNone(router.db_for_read(Client))
+        view(RequestFactory().get("/"))
+        self.assertEqual(decisions, {"client": "default", "session": None})
+        self.assertEqual(router.db_for_write(Client), "default")
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard_test"], INVALIDATION_POLL_INTERVAL=60)
+class TenantShardingTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        from django.core.management import call_command
+        from django.db import connections
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["shard_test"] = {**connections.settings["default"], "NAME": f"{cls.directory.name}/shard.sqlite3"}
+        # Flushed after each test like default
+        cls.databases = cls.databases | {"shard_test"}
+        call_command("migrate", database="shard_test", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+        connections["shard_test"].close()
+        del connections["shard_test"]
+        del connections.settings["shard_test"]
+        cls.databases = cls.databases - {"shard_test"}
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        from accounts.models import Organization, User
+        from core import invalidation
+        from .models import TenantShard
+        invalidation.sync(force=True)
+        self.sharded_org = Organization.objects.create(name="Big Shop")
+        TenantShard.objects.create(organization=self.sharded_org, alias="shard_test")
+        self.home_org = Organization.objects.create(name="Small Shop")
+        self.sharded_client = Client.objects.create(name="Big", domain="big.example", contact_email="a@big.example",
+                                                    organization=self.sharded_org)
+        self.home_client = Client.objects.create(name="Small", domain="small.example", contact_email="a@small.example",
+                                                 organization=self.home_org)
+        self.user = User.objects.create(username="shop_owner", organization=self.home_org)
+
+    def _conversation(self, client, **kwargs):
+        return BanglaConversation(client=client, user_name="rahim", user_message="দাম কত?", ai_response="৫০০ টাকা", **kwargs)
+
+    def test_queries_follow_the_pinned_tenant_and_related_instances(self):
+        from .db import sharding
+        with sharding.tenant(organization_id=self.sharded_org.id) as alias:
+            self.assertEqual(alias, "shard_test")
+            pinned = BanglaConversation.objects.create(client_id=self.sharded_client.id, user_name="rahim",
+                                                       user_message="হ্যালো", ai_response="নমস্কার")
+        # Ids on the second shard come from its own range
+        self.assertGreater(pinned.id, sharding.SHARD_ID_SPAN)
+        self._conversation(self.sharded_client).save()
+        newest = self._conversation(self.home_client)
+        newest.save()
+
+        self.assertEqual(BanglaConversation.objects.using("shard_test").count(), 2)
+        self.assertEqual(BanglaConversation.objects.count(), 1)
+        self.assertEqual(self.sharded_client.conversations.count(), 2)
+        self.assertEqual(BanglaConversation.objects.using("shard_test").first().client, self.sharded_client)
+        self.assertEqual(sharding.count(BanglaConversation.objects.all()), 3)
+        self.assertEqual([c.id for c in sharding.latest(BanglaConversation.objects.all(), "created_at", 1)], [newest.id])
+
+        # Deleting the client cascades to its rows on the other shard
+        self.sharded_client.delete()
+        self.assertEqual(BanglaConversation.objects.using("shard_test").count(), 0)
+
+    def test_middleware_pins_webhooks_and_users(self):
+        from django.test import RequestFactory
+        from chat.models import Conversation
+        from .db import sharding
+        from .middleware import TenantShardMiddleware
+        router = sharding.TenantShardRouter()
+        seen = []
+
+        def view(request, **kwargs):
+            seen.append(router.db_for_read(Conversation))
+
+        middleware = TenantShardMiddleware(lambda request: middleware.process_view(
+            request, view, (), request.kwargs) or view(request, **request.kwargs))
+        request = RequestFactory().post(f"/voice/twilio/voice/{self.sharded_org.id}/")
+        request.kwargs = {"organization_id": self.sharded_org.id}
+        middleware(request)
+        request = RequestFactory().get("/chat/")
+        request.user, request.kwargs = self.user, {}
+        middleware(request)
+        self.assertEqual(seen, ["shard_test", None])
+        self.assertIsNone(router.db_for_read(Conversation))
+
+    def test_writes_of_a_frozen_tenant_get_503(self):
+        from django.test import RequestFactory
+        from .db import sharding
+        from .middleware import TenantShardMiddleware
+        from .models import TenantShard
+        TenantShard.objects.filter(organization=self.sharded_org).update(state="frozen")
+        sharding._map.drop()
+        with sharding.tenant(organization_id=self.sharded_org.id):
+            self.assertFalse(BanglaConversation.objects.filter(client=self.sharded_client).exists())
+            with self.assertRaises(sharding.TenantMoving):
+                BanglaConversation.objects.create(client_id=self.sharded_client.id, user_name="rahim")
+        response = TenantShardMiddleware(lambda request: None).process_exception(
+            RequestFactory().post("/api/chat/"), sharding.TenantMoving())
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_purge_deletes_the_tenant_rows_on_its_shard(self):
+        from chat.models import Conversation
+        from . import purge
+        from .db import sharding
+        with sharding.tenant(organization_id=self.sharded_org.id):
+            Conversation.objects.create(user=self.user, organization=self.sharded_org, title="Order")
+        self._conversation(self.sharded_client).save()
+        purge.run_job(purge.schedule(self.sharded_org), batch_size=1, pause=0)
+        self.assertFalse(Conversation.objects.using("shard_test").exists())
+        # The client outlives its organization and keeps its rows where they are
+        self.assertEqual(sharding.shard_for(client_id=self.sharded_client.id), "shard_test")
+        self.assertEqual(BanglaConversation.objects.using("shard_test").count(), 1)
+
+    def test_move_tenant_copies_in_batches_and_switches(self):
+        import io
+        from django.core.management import call_command
+        from chat.models import Conversation, Message
+        from .db import sharding
+        conversation = Conversation.objects.create(user=self.user, organization=self.home_org, title="Order")
+        for text in ("হ্যালো", "অর্ডার কোথায়?", "আজ পৌঁছাবে"):
+            Message.objects.create(conversation=conversation, sender_type="user", content=text)
+        rows = [self._conversation(self.home_client) for _ in range(3)]
+        for row in rows:
+            row.save()
+        created = sorted(BanglaConversation.objects.values_list("id", "created_at"))
+
+        call_command("move_tenant", organization=self.home_org.id, to="shard_test",
+                     batch_size=2, pause=0, settle=0, stdout=io.StringIO())
+
+        self.assertEqual(sharding.shard_for(organization_id=self.home_org.id), "shard_test")
+        self.assertFalse(BanglaConversation.objects.exists())
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(sorted(BanglaConversation.objects.using("shard_test").values_list("id", "created_at")), created)
+        with sharding.tenant(organization_id=self.home_org.id):
+            moved = Conversation.objects.get(id=conversation.id)
+            self.assertEqual(moved.messages.count(), 3)
+            self.assertEqual(moved.user, self.user)
+
+
+class TablePartitionTest(TestCase):
+    def test_monthly_bounds_are_utc(self):
+        import datetime
+        from .db import partitions
+        dhaka = datetime.timezone(datetime.timedelta(hours=6))
+        month = partitions.month_start(datetime.datetime(2027, 1, 1, 3, 0, tzinfo=dhaka))
+        self.assertEqual(month, datetime.datetime(2026, 12, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(partitions.add_months(month, 1), datetime.datetime(2027, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(partitions.add_months(month, -12).year, 2025)
+        self.assertEqual(partitions.partition_name("chat_message", month), "chat_message_p202612")
+
+    def test_sqlite_tables_are_not_partitioned(self):
+        import io
+        from django.core.management import call_command
+        from django.db import connection
+        from chat.models import Message
+        from .db import partitions
+        self.assertIsNone(partitions.partition_key(Message, connection))
+        out = io.StringIO()
+        call_command("manage_partitions", stdout=out)
+        self.assertIn("default: sqlite tables are not partitioned", out.getvalue())
+
+
+class ConversationArchiveTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from accounts.models import Organization, User
+        from social_media.models import SocialMediaAccount, SocialMediaWebhook
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(ARCHIVE_DIR=directory.name, DATA_RETENTION_DAYS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.org = Organization.objects.create(name="Old Shop", retention_days=30)
+        self.client_obj = Client.objects.create(name="Old", domain="old.example", contact_email="a@old.example",
+                                                organization=self.org)
+        self.user = User.objects.create(username="old_owner", organization=self.org)
+        account = SocialMediaAccount.objects.create(organization=self.org, platform="facebook",
+                                                    account_name="page", account_id="p1")
+        self.webhook = SocialMediaWebhook.objects.create(social_account=account, event_type="message",
+                                                         event_id="e1", raw_payload={"text": "হ্যালো"})
+
+    def test_archive_old_rows_and_restore_them(self):
+        import io
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from chat.models import Conversation, Message
+        from social_media.models import SocialMediaWebhook
+        from . import archive
+        old = timezone.now() - timedelta(days=90)
+        stale = Conversation.objects.create(user=self.user, organization=self.org, title="Old order")
+        Message.objects.create(conversation=stale, sender_type="user", content="অর্ডার কোথায়?")
+        live = Conversation.objects.create(user=self.user, organization=self.org, title="Open order")
+        early = Message.objects.create(conversation=live, sender_type="user", content="প্রথম বার্তা")
+        recent = Message.objects.create(conversation=live, sender_type="ai", content="উত্তর")
+        Conversation.objects.filter(id=stale.id).update(last_message_at=old, started_at=old)
+        Message.objects.filter(conversation=stale).update(timestamp=old)
+        Message.objects.filter(id=early.id).update(timestamp=old)
+        call = CallLog.objects.create(client=self.client_obj, caller_name="রহিম", question="ডেলিভারি কবে?")
+        CallLog.objects.filter(id=call.id).update(timestamp=old)
+        SocialMediaWebhook.objects.filter(id=self.webhook.id).update(created_at=old)
+
+        out = io.StringIO()
+        call_command("archive_conversations", pause=0, stdout=out)
+
+        self.assertIn("Archived 5 row(s)", out.getvalue())
+        self.assertEqual(list(Conversation.objects.all()), [live])
+        self.assertEqual(list(Message.objects.all()), [recent])
+        self.assertFalse(CallLog.objects.exists())
+        self.assertFalse(SocialMediaWebhook.objects.exists())
+        records = list(archive.archived_records(organization_id=self.org.id, models={"social_media.socialmediawebhook"}))
+        self.assertEqual(records[0]["fields"]["raw_payload"], {"text": "হ্যালো"})
+
+        call_command("restore_archive", organization=self.org.id, month=[f"{old:%Y-%m}"], stdout=io.StringIO())
+        self.assertEqual(Conversation.objects.get(id=stale.id).last_message_at, old)
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(CallLog.objects.get().timestamp, old)
+        self.assertEqual(SocialMediaWebhook.objects.get().raw_payload, {"text": "হ্যালো"})
+
+
+class BackgroundPurgeTest(TestCase):
+    def setUp(self):
+        from accounts.models import Organization, User
+        from chat.models import AIAgent, Conversation, Intent, Message
+        self.org = Organization.objects.create(name="Closing Shop")
+        self.client_obj = Client.objects.create(name="Closing", domain="closing.example",
+                                                contact_email="a@closing.example", organization=self.org)
+        self.user = User.objects.create(username="closing_owner", organization=self.org, is_staff=True)
+        agent = AIAgent.objects.create(organization=self.org, name="Helper", system_prompt="Be kind")
+        Intent.objects.create(ai_agent=agent, name="greeting")
+        conversation = Conversation.objects.create(user=self.user, organization=self.org, ai_agent=agent)
+        for text in ("হ্যালো", "দাম কত?", "৫০০ টাকা"):
+            Message.objects.create(conversation=conversation, sender_type="user", content=text)
+        for _ in range(3):
+            BanglaConversation.objects.create(client=self.client_obj, user_name="rahim",
+                                              user_message="হ্যালো", ai_response="নমস্কার")
+        CallLog.objects.create(client=self.client_obj, caller_name="রহিম", question="ডেলিভারি কবে?")
+
+    def test_delete_returns_at_once_and_the_job_purges_in_batches(self):
+        import io
+        from django.core.management import call_command
+        from rest_framework.test import APIClient
+        from accounts.models import Organization, User
+        from chat.models import AIAgent, Conversation, Message
+        from . import purge
+        from .models import PurgeJob
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(self.user)
+        response = api.delete(f"/api/clients/{self.client_obj.id}/")
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Client.objects.filter(id=self.client_obj.id).exists())
+        self.assertEqual(BanglaConversation.objects.count(), 3)
+        job = PurgeJob.objects.get(id=response.json()["purge_job"])
+        self.assertEqual(job.status, "pending")
+        purge.schedule(self.org, self.user)
+        self.assertFalse(Organization.objects.exists())
+
+        out = io.StringIO()
+        call_command("purge_deleted", batch_size=2, pause=0, stdout=out)
+
+        self.assertIn("Purged 2 object(s); 0 failed", out.getvalue())
+        self.assertFalse(Client._base_manager.exists())
+        self.assertFalse(BanglaConversation.objects.exists() or CallLog.objects.exists())
+        self.assertFalse(Organization._base_manager.exists())
+        self.assertFalse(AIAgent._base_manager.exists() or Conversation.objects.exists() or Message.objects.exists())
+        self.assertIsNone(User.objects.get(id=self.user.id).organization)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_deleted), ("done", 5))
+        self.assertEqual(api.get(f"/api/purge-jobs/{job.id}/").json()["status"], "done")
+
+
+class FullTextSearchTest(TestCase):
+    def setUp(self):
+        from accounts.models import Organization, User
+        from chat.models import Conversation, Message
+        self.org = Organization.objects.create(name="Search Shop")
+        self.client_obj = Client.objects.create(name="Search", domain="search.example",
+                                                contact_email="a@search.example", organization=self.org)
+        self.user = User.objects.create(username="search_owner", organization=self.org)
+        conversation = Conversation.objects.create(user=self.user, organization=self.org)
+        self.messages = [Message.objects.create(conversation=conversation, sender_type="user", content=text)
+                         for text in ("অর্ডারের অবস্থা কী?", "Delivery to Dhaka", "শাড়ির দাম ১২০০ টাকা")]
+        BanglaConversation.objects.create(client=self.client_obj, user_name="রহিম",
+                                          user_message="ডেলিভারি কবে হবে?", ai_response="দুই দিনের মধ্যে")
+
+    def test_matches_normalized_terms_and_prefixes(self):
+        from chat.models import Message
+        from . import search
+        self.assertEqual(self.messages[0].search_terms, "অর্ডার অবস্থা")
+        found = lambda text: set(search.matching(Message.objects.all(), text).values_list("id", flat=True))
+        self.assertEqual(found("অর্ডার"), {self.messages[0].id})
+        self.assertEqual(found("1200 টাকা"), {self.messages[2].id})
+        self.assertEqual(found("deliv"), {self.messages[1].id})
+        self.assertEqual(found("dhaka delivery missing"), set())
+        self.assertEqual(found("the"), set())
+
+        message = self.messages[1]
+        message.content = "Pickup from Chattogram"
+        message.save(update_fields=["content"])
+        self.assertEqual(found("delivery"), set())
+        self.assertEqual(found("chattogram"), {message.id})
+        message.delete()
+        self.assertEqual(found("pickup"), set())
+
+    def test_rebuild_fills_rows_written_without_save(self):
+        import io
+        from django.core.management import call_command
+        from chat.models import Message
+        from . import search
+        Message.objects.filter(id=self.messages[1].id).update(search_terms="")
+        self.assertFalse(search.matching(Message.objects.all(), "dhaka").exists())
+        call_command("rebuild_search_index", pause=0, stdout=io.StringIO())
+        self.assertTrue(search.matching(Message.objects.all(), "dhaka").exists())
+
+    def test_admin_search_also_matches_exact_lookups(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from chat.models import Message
+        model_admin = site._registry[Message]
+        Message.objects.update(sender=self.user)
+        request = RequestFactory().get("/")
+        found = lambda term: set(model_admin.get_search_results(request, Message.objects.all(), term)[0]
+                                 .values_list("id", flat=True))
+        self.assertEqual(found("dhaka"), {self.messages[1].id})
+        self.assertEqual(found("search_owner"), {message.id for message in self.messages})
+        self.assertEqual(found("search_own"), set())
+
+    def test_search_api_is_scoped_to_the_tenant(self):
+        from rest_framework.test import APIClient
+        from accounts.models import Organization, User
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(self.user)
+        response = api.get("/api/search/", {"q": "ঢাকা delivery"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+        response = api.get("/api/search/", {"q": "delivery"})
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.messages[1].id])
+        response = api.get("/api/search/", {"q": "ডেলিভারি", "client_id": self.client_obj.id})
+        self.assertEqual(response.json()["in"], "bangla_conversations")
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(api.get("/api/search/").status_code, 400)
+
+        other = Organization.objects.create(name="Other Shop")
+        api.force_authenticate(User.objects.create(username="other_owner", organization=other))
+        self.assertEqual(api.get("/api/search/", {"q": "delivery"}).json()["results"], [])
+        self.assertEqual(api.get("/api/search/", {"q": "delivery", "organization_id": self.org.id}).status_code, 404)
+        self.assertEqual(api.get("/api/search/", {"q": "ডেলিভারি", "client_id": self.client_obj.id}).status_code,
+                         404)
+
+
+class BanglaNormalizerTest(TestCase):
+    def test_equivalent_spellings_normalize_equal(self):
+        from .bangla import key_digest, normalize
+        precomposed, decomposed = "বা\u09dcি ১২টা", "বা\u09a1\u09bcি 12টা"
+        self.assertEqual(normalize(precomposed), normalize(decomposed))
+        self.assertEqual(normalize("র\u200d্যাব"), "র্যাব")
+        self.assertEqual(normalize("  “Cash  on”\u2014Delivery!!!  ধন্যবাদ।। "), '"cash on"-delivery! ধন্যবাদ।')
+        self.assertEqual(key_digest(" রহিম\u200c"), key_digest("রহিম"))
+
+    def test_options_and_batch(self):
+        from .bangla import Normalizer, normalize, normalize_many
+        texts = ["HELLO  ১২৩", "", None, "কী??", "\U0001F600 ok"]
+        self.assertEqual(normalize_many(texts), [normalize(text) for text in texts])
+        keep = Normalizer(joiners="keep", fold_digits=False, casefold=False)
+        self.assertEqual(keep("র\u200d্যাব  ১২ OK"), "র\u200d্যাব ১২ OK")
+        with self.assertRaises(ValueError):
+            Normalizer(joiners="smart")
+
+    def test_auto_reply_keywords_are_stored_normalized(self):
+        from accounts.models import Organization
+        from social_media.models import SocialMediaAccount, SocialMediaAutoReply
+        org = Organization.objects.create(name="Reply Shop")
+        account = SocialMediaAccount.objects.create(organization=org, platform="facebook", account_id="1",
+                                                    account_name="Reply Shop", access_token="t")
+        reply = SocialMediaAutoReply.objects.create(social_account=account, response_text="৩ দিনে",
+                                                    trigger_keywords=[" Delivery ", "ডেলিভারি\u200c", ""])
+        self.assertEqual(reply.trigger_keywords, ["delivery", "ডেলিভারি"])
+
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from accounts.models import Organization, User
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.org = Organization.objects.create(name="Export Shop")
+        self.client_obj = Client.objects.create(name="Export", domain="export.example",
+                                                contact_email="a@export.example", organization=self.org)
+        self.user = User.objects.create(username="export_owner", organization=self.org)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_conversations_export_streams_archived_and_live_rows(self):
+        import json
+        from datetime import timedelta
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from . import archive
+        old = timezone.now() - timedelta(days=90)
+        archived = BanglaConversation.objects.create(client=self.client_obj, user_name="রহিম",
+                                                     user_message="পুরনো অর্ডার", ai_response="পাঠানো হয়েছে")
+        BanglaConversation.objects.filter(id=archived.id).update(created_at=old)
+        archive.archive_tenant(30, organization_id=self.org.id, pause=0)
+        live = BanglaConversation.objects.create(client=self.client_obj, user_name="করিম",
+                                                 user_message="ডেলিভারি কবে?", ai_response="কাল")
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(self.user)
+        url = f"/api/clients/{self.client_obj.id}/export/conversations/"
+
+        lines = self.content(api.get(url)).splitlines()
+        self.assertTrue(lines[0].startswith("\ufeffid,client_id,user_name,"))
+        self.assertNotIn("search_terms", lines[0])
+        self.assertEqual(len(lines), 2)
+
+        rows = [json.loads(line) for line in
+                self.content(api.get(url, {"file_format": "ndjson", "include_archived": "1"})).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [archived.id, live.id])
+        self.assertEqual(rows[0]["user_message"], "পুরনো অর্ডার")
+        self.assertEqual(rows[0]["client_id"], self.client_obj.id)
+
+        start = (timezone.now() - timedelta(days=1)).date().isoformat()
+        rows = self.content(api.get(url, {"file_format": "ndjson", "include_archived": "1", "start": start}))
+        self.assertEqual([json.loads(line)["id"] for line in rows.splitlines()], [live.id])
+
+    def test_call_log_export_formats_and_access(self):
+        from accounts.models import Organization, User
+        from rest_framework.test import APIClient
+        from . import exports
+        CallLog.objects.create(client=self.client_obj, caller_name="রহিম", question="দাম কত?", duration=42)
+        api = APIClient(SERVER_NAME="localhost")
+        api.force_authenticate(self.user)
+        url = f"/api/clients/{self.client_obj.id}/export/call-logs/"
+        self.assertIn("রহিম", self.content(api.get(url)))
+        self.assertEqual(api.get(url, {"file_format": "xlsx"}).status_code, 400)
+        if exports.pyarrow is None:
+            self.assertEqual(api.get(url, {"file_format": "parquet"}).status_code, 400)
+        else:
+            response = api.get(url, {"file_format": "parquet"})
+            self.assertEqual(b"".join(response.streaming_content)[:4], b"PAR1")
+        self.assertEqual(api.get(url, {"end": "yesterday"}).status_code, 400)
+        self.assertEqual(api.get(f"/api/clients/{self.client_obj.id}/export/payments/").status_code, 404)
+
+        other = Organization.objects.create(name="Other Export Shop")
+        api.force_authenticate(User.objects.create(username="other_export_owner", organization=other))
+        self.assertEqual(api.get(url).status_code, 404)
+
+    def test_analytics_export(self):
+        from datetime import timedelta
+        from django.urls import reverse
+        from django.utils import timezone
+        from social_media.models import SocialMediaAccount, SocialMediaAnalytics
+        account = SocialMediaAccount.objects.create(organization=self.org, platform="facebook",
+                                                    account_name="page", account_id="p1")
+        today = timezone.now().date()
+        for days, received in ((1, 12), (2, 7), (60, 99)):
+            SocialMediaAnalytics.objects.create(social_account=account, date=today - timedelta(days=days),
+                                                messages_received=received,
+                                                average_response_time=timedelta(seconds=90))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("social_media:export_analytics"))
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = self.content(response).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split(",")[:5], [(today - timedelta(days=2)).isoformat(), "daily", "facebook",
+                                                   "page", "7"])
+        self.assertIn(",90.0,", lines[1])
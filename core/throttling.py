@@ -0,0 +1,66 @@
+"""
+DRF throttles for the anonymous chat endpoint, backed by ``core.ratelimit``.
+
+A denied request gets ``429 Too Many Requests`` with a ``Retry-After`` header from
+DRF. Requests without a valid ``client_id`` are only subject to the per-IP bucket;
+the view rejects them afterwards.
+"""
+import math
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from core import ratelimit
+from core.bangla import key_digest
+from core.runtime import get_client_runtime, get_organization_runtime
+
+
+def _chat_client(request):
+    try:
+        client = get_client_runtime(request.data.get('client_id'))
+    except (TypeError, ValueError):
+        return None
+    return client if client is not None and client.is_active else None
+
+
+class ChatThrottle(BaseThrottle):
+    """
+    Per-IP token bucket, per-client and per-user sliding windows, then the monthly
+    conversation quota of the client and its organization's plan. Checks stop at the
+    first denial, so a rate-limited request does not use up quota.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = ratelimit.token_bucket(
+            f'ip:{self.get_ident(request)}',
+            getattr(settings, 'CHAT_RATE_IP_BURST', 20),
+            getattr(settings, 'CHAT_RATE_IP_PER_SECOND', 0.5),
+        )
+        if self.wait_seconds:
+            return False
+        client = _chat_client(request)
+        if client is None:
+            return True
+        self.wait_seconds = ratelimit.sliding_window(
+            f'client:{client.id}', getattr(settings, 'CHAT_RATE_CLIENT_PER_MINUTE', 600), 60)
+        if self.wait_seconds:
+            return False
+        user_name = request.data.get('user_name')
+        if not user_name:
+            return True
+        # Spellings of one name that differ only in encoding share a bucket
+        user = key_digest(user_name)
+        self.wait_seconds = ratelimit.sliding_window(
+            f'user:{client.id}:{user}', getattr(settings, 'CHAT_RATE_USER_PER_MINUTE', 20), 60)
+        if self.wait_seconds:
+            return False
+
+        organization = get_organization_runtime(client.organization_id) if client.organization_id else None
+        wait = ratelimit.conversation_quota(client, user_name, organization)
+        if wait:
+            raise Throttled(wait=math.ceil(wait), detail='Monthly conversation quota reached.')
+        return True
+
+    def wait(self):
+        return math.ceil(self.wait_seconds)
@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login
-from django.http import JsonResponse
+from core.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
@@ -15,7 +15,9 @@ import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from core.authentication import CachedTokenAuthentication, get_admin_permissions
+from core.db import sharding
+from core.db.routers import read_from_replica
 
 from core.models import Client, BanglaConversation, CallLog, BanglaIntent, AdminProfile, SystemSettings, Analytics
 from accounts.models import User, Organization, APIKey
@@ -28,38 +30,11 @@ from services.openai_service import openai_service
 
 def _get_admin_permissions(user):
     """Return role label and permissions for the given user based on AdminProfile or superuser."""
-    role_label = 'User'
-    perms = {
-        'can_manage_clients': False,
-        'can_manage_intents': False,
-        'can_view_analytics': False,
-        'can_handle_escalations': False,
-    }
-
-    if not user.is_authenticated:
-        return role_label, perms
-
-    if user.is_superuser:
-        role_label = 'Super Admin'
-        for k in list(perms.keys()):
-            perms[k] = True
-        return role_label, perms
-
-    profile = AdminProfile.objects.filter(user=user).first()
-    if profile:
-        role_map = {
-            'super_admin': 'Super Admin',
-            'admin': 'Admin',
-            'moderator': 'Moderator',
-        }
-        role_label = role_map.get(profile.role, 'User')
-        perms['can_manage_clients'] = bool(profile.can_manage_clients)
-        perms['can_manage_intents'] = bool(profile.can_manage_intents)
-        perms['can_view_analytics'] = bool(profile.can_view_analytics)
-        perms['can_handle_escalations'] = bool(profile.can_handle_escalations)
-    return role_label, perms
+    # Cached per process and attached by CachedTokenAuthentication; see core/authentication.py
+    return get_admin_permissions(user)
 
 
+@read_from_replica
 def bangla_admin_dashboard(request):
     """Unified admin dashboard with role-based access using AdminProfile."""
     if not request.user.is_authenticated:
@@ -74,23 +49,21 @@ def bangla_admin_dashboard(request):
     stats = {
         'total_users': User.objects.count(),
         'total_organizations': Organization.objects.count(),
-        'total_conversations': BanglaConversation.objects.count(),
-        'total_voice_calls': CallLog.objects.count(),
+        'total_conversations': sharding.count(BanglaConversation.objects.all()),
+        'total_voice_calls': sharding.count(CallLog.objects.all()),
         'total_clients': Client.objects.count(),
         'total_ai_agents': AIAgent.objects.count(),
         'total_intents': BanglaIntent.objects.count(),
         'total_social_accounts': SocialMediaAccount.objects.count(),
         'total_support_tickets': ClientSupportTicket.objects.count(),
-        'active_conversations': BanglaConversation.objects.filter(status='active').count(),
-        'escalated_conversations': BanglaConversation.objects.filter(is_escalated=True).count(),
-        'average_rating': BanglaConversation.objects.filter(satisfaction_rating__isnull=False).aggregate(
-            avg_rating=Avg('satisfaction_rating')
-        )['avg_rating'] or 0,
+        'active_conversations': sharding.count(BanglaConversation.objects.filter(status='active')),
+        'escalated_conversations': sharding.count(BanglaConversation.objects.filter(is_escalated=True)),
+        'average_rating': sharding.average(BanglaConversation.objects.all(), 'satisfaction_rating') or 0,
     }
     
     # Recent activity
-    recent_conversations = BanglaConversation.objects.order_by('-created_at')[:10]
-    recent_calls = CallLog.objects.order_by('-timestamp')[:10]
+    recent_conversations = sharding.latest(BanglaConversation.objects.all(), 'created_at', 10)
+    recent_calls = sharding.latest(CallLog.objects.all(), 'timestamp', 10)
     recent_users = User.objects.order_by('-date_joined')[:10]
     
     # System settings
@@ -133,6 +106,7 @@ class BanglaChatAPIView(View):
                 return JsonResponse({
                     'error': 'Client not found or inactive'
                 }, status=404)
+            sharding.pin(client_id=client.id)
             
             # Get conversation history for context
             recent_conversations = BanglaConversation.objects.filter(
@@ -224,6 +198,7 @@ class BanglaVoiceAPIView(View):
                 return JsonResponse({
                     'error': 'Client not found or inactive'
                 }, status=404)
+            sharding.pin(client_id=client.id)
             
             # Generate AI text response
             ai_result = openai_service.generate_chat_response(
@@ -362,6 +337,7 @@ class BanglaHandoffAPIView(View):
 
 # Admin API endpoints for the dashboard
 @login_required
+@read_from_replica
 def admin_api_dashboard_data(request):
     """Get dashboard data for admin"""
     role_label, perms = _get_admin_permissions(request.user)
@@ -372,34 +348,37 @@ def admin_api_dashboard_data(request):
     stats = {
         'total_users': User.objects.count(),
         'total_organizations': Organization.objects.count(),
-        'total_conversations': BanglaConversation.objects.count(),
-        'total_voice_calls': CallLog.objects.count(),
+        'total_conversations': sharding.count(BanglaConversation.objects.all()),
+        'total_voice_calls': sharding.count(CallLog.objects.all()),
         'total_clients': Client.objects.count(),
-        'active_conversations': BanglaConversation.objects.filter(status='active').count(),
-        'escalated_conversations': BanglaConversation.objects.filter(is_escalated=True).count(),
+        'active_conversations': sharding.count(BanglaConversation.objects.filter(status='active')),
+        'escalated_conversations': sharding.count(BanglaConversation.objects.filter(is_escalated=True)),
     }
     
     return JsonResponse(stats)
 
 
 @login_required
+@read_from_replica
 def admin_api_analytics_series(request):
     """Time series for dashboard charts (simple aggregate)."""
     role_label, perms = _get_admin_permissions(request.user)
     if not perms.get('can_view_analytics'):
         return JsonResponse({'error': 'Access denied'}, status=403)
-    # Simple daily aggregates for last 7 days
-    from django.utils import timezone
-    from datetime import timedelta
-    today = timezone.now().date()
-    days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+    # Simple daily aggregates for last 7 days. Half-open datetime ranges (rather than
+    # __date lookups) keep these counts on the created_at/timestamp indexes.
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
     series = []
-    for d in days:
+    for i in range(6, -1, -1):
+        start = today_start - timedelta(days=i)
+        end = start + timedelta(days=1)
         series.append({
-            'date': d.isoformat(),
-            'chats': BanglaConversation.objects.filter(created_at__date=d).count(),
-            'calls': CallLog.objects.filter(timestamp__date=d).count(),
-            'escalations': BanglaConversation.objects.filter(created_at__date=d, is_escalated=True).count(),
+            'date': start.date().isoformat(),
+            'chats': sharding.count(BanglaConversation.objects.filter(created_at__gte=start, created_at__lt=end)),
+            'calls': sharding.count(CallLog.objects.filter(timestamp__gte=start, timestamp__lt=end)),
+            'escalations': sharding.count(BanglaConversation.objects.filter(
+                created_at__gte=start, created_at__lt=end, is_escalated=True
+            )),
         })
     return JsonResponse({'series': series})
 
@@ -469,7 +448,7 @@ from rest_framework.authentication import SessionAuthentication
 
 class AdminTestChatAPIView(APIView):
     """Test chat functionality from admin dashboard"""
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
@@ -501,7 +480,7 @@ class AdminTestChatAPIView(APIView):
 
 class AdminTestVoiceAPIView(APIView):
     """Test voice functionality from admin dashboard"""
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core import fastjson
+from core.bangla import key_digest
+from core.availability import MAX_AVAILABILITY_BATCH, get_availability
+from services.commerce_service import commerce_service
+
+logger = logging.getLogger(__name__)
+
+
+# OpenAI function-calling schemas for the lookups the chat model may run
+CHAT_TOOLS = [
+    {
+        'type': 'function',
+        'function': {
+            'name': 'check_product_availability',
+            'description': 'Look up stock, quantity and price for one or more products by SKU.',
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'skus': {
+                        'type': 'array',
+                        'items': {'type': 'string'},
+                        'description': 'Product SKUs, e.g. ["SKU-12"]',
+                    },
+                },
+                'required': ['skus'],
+            },
+        },
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_order_status',
+            'description': 'Look up the delivery status and tracking number of an order.',
+            'parameters': {
+                'type': 'object',
+                'properties': {'order_id': {'type': 'string'}},
+                'required': ['order_id'],
+            },
+        },
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_payment_status',
+            'description': 'Look up the status and amount of a payment.',
+            'parameters': {
+                'type': 'object',
+                'properties': {'payment_id': {'type': 'string'}},
+                'required': ['payment_id'],
+            },
+        },
+    },
+]
+
+
+class ChatToolExecutor:
+    """Runs chat tool calls in-process for one client conversation.
+
+    Results are cached per conversation (client + user_name) for
+    ``CHAT_TOOL_CACHE_TTL`` seconds, so a follow-up question about the same SKU or
+    order does not repeat the lookup. When the model asks for several tools in one
+    turn they run in parallel threads.
+    """
+
+    def __init__(self, client, user_name: str):
+        self.client = client
+        self.conversation_key = f'{client.id}:{key_digest(user_name)}'
+        self.handlers = {
+            'check_product_availability': self.check_product_availability,
+            'get_order_status': self.get_order_status,
+            'get_payment_status': self.get_payment_status,
+        }
+
+    # Tool implementations
+
+    def check_product_availability(self, skus: List[str]) -> Dict[str, Any]:
+        if not isinstance(skus, list) or not skus:
+            return {'error': 'skus must be a non-empty list'}
+        skus = [str(sku) for sku in skus[:MAX_AVAILABILITY_BATCH]]
+        found = get_availability(skus)
+        products = []
+        for sku in skus:
+            data = found.get(sku)
+            # Only this client's catalog is visible to its chat widget
+            if data and data['client_id'] == self.client.id:
+                products.append({k: v for k, v in data.items() if k != 'client_id'})
+        listed = {product['sku'] for product in products}
+        return {'products': products, 'not_found': [sku for sku in skus if sku not in listed]}
+
+    def get_order_status(self, order_id: str) -> Dict[str, Any]:
+        return commerce_service.get_order_status(order_id) or {'error': 'Order not found'}
+
+    def get_payment_status(self, payment_id: str) -> Dict[str, Any]:
+        return commerce_service.get_payment_status(payment_id) or {'error': 'Payment not found'}
+
+    # Dispatch
+
+    def _cache_key(self, name: str, arguments: str) -> str:
+        digest = hashlib.sha1(arguments.encode('utf-8')).hexdigest()
+        return f'chat_tool:{self.conversation_key}:{name}:{digest}'
+
+    def _call(self, name: str, arguments: str) -> Dict[str, Any]:
+        handler = self.handlers.get(name)
+        if handler is None:
+            return {'error': f'Unknown tool: {name}'}
+        try:
+            kwargs = fastjson.loads(arguments or '{}')
+            if not isinstance(kwargs, dict):
+                raise ValueError('arguments must be a JSON object')
+            return handler(**kwargs)
+        except (ValueError, TypeError) as e:
+            return {'error': f'Invalid arguments for {name}: {e}'}
+        except Exception as e:
+            logger.error(f"Chat tool {name} failed: {str(e)}")
+            return {'error': f'{name} is temporarily unavailable'}
+
+    def _call_in_thread(self, name: str, arguments: str) -> Dict[str, Any]:
+        try:
+            return self._call(name, arguments)
+        finally:
+            # Worker threads open their own connection; don't leave it behind
+            connection.close()
+
+    def execute(self, calls: List[Tuple[str, str, str]]) -> Dict[str, str]:
+        """Run ``(call_id, name, arguments_json)`` calls; return ``{call_id: result_json}``."""
+        keys = {call_id: self._cache_key(name, arguments) for call_id, name, arguments in calls}
+        cached = cache.get_many(list(set(keys.values())))
+        results = {call_id: cached[key] for call_id, key in keys.items() if key in cached}
+
+        pending = {}
+        for call_id, name, arguments in calls:
+            if call_id not in results:
+                pending.setdefault(keys[call_id], (name, arguments, []))[2].append(call_id)
+
+        if len(pending) == 1:
+            outputs = [self._call(name, arguments) for name, arguments, _ in pending.values()]
+        elif pending:
+            max_workers = min(len(pending), getattr(settings, 'CHAT_TOOL_MAX_WORKERS', 4))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                outputs = list(pool.map(lambda item: self._call_in_thread(item[0], item[1]), pending.values()))
+        else:
+            outputs = []
+
+        fresh = {}
+        for key, (name, arguments, call_ids), output in zip(pending.keys(), pending.values(), outputs):
+            payload = fastjson.dumps(output).decode('utf-8')
+            if 'error' not in output:
+                fresh[key] = payload
+            for call_id in call_ids:
+                results[call_id] = payload
+        if fresh:
+            cache.set_many(fresh, getattr(settings, 'CHAT_TOOL_CACHE_TTL', 60))
+        return results
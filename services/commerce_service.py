@@ -0,0 +1,49 @@
+from typing import Optional, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CommerceService:
+    """Order and payment lookups shared by the REST endpoints and chat tools.
+
+    Backed by mock data until an order/payment gateway is connected; replace the
+    dictionaries below with the real ERP or gateway calls.
+    """
+
+    MOCK_ORDERS = {
+        '1': {
+            'order_id': '1',
+            'status': 'প্রক্রিয়াধীন',
+            'tracking_number': 'TRK123456',
+            'estimated_delivery': '2024-01-15',
+            'items': ['পণ্য ১', 'পণ্য ২']
+        },
+        '2': {
+            'order_id': '2',
+            'status': 'ডেলিভারি হয়েছে',
+            'tracking_number': 'TRK789012',
+            'delivered_at': '2024-01-10',
+            'items': ['পণ্য ৩']
+        }
+    }
+
+    MOCK_PAYMENTS = {
+        'PMT1': {'status': 'completed', 'amount': 1200, 'currency': 'BDT'},
+        'PMT2': {'status': 'pending', 'amount': 850, 'currency': 'BDT'},
+    }
+
+    def get_order_status(self, order_id) -> Optional[Dict[str, Any]]:
+        """Return the order status dict, or None if the order does not exist."""
+        return self.MOCK_ORDERS.get(str(order_id))
+
+    def get_payment_status(self, payment_id) -> Optional[Dict[str, Any]]:
+        """Return the payment status dict, or None if the payment does not exist."""
+        data = self.MOCK_PAYMENTS.get(str(payment_id))
+        if data is None:
+            return None
+        return {'payment_id': str(payment_id), **data}
+
+
+# Global instance
+commerce_service = CommerceService()
@@ -8,6 +8,24 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def build_system_prompt(language: str, client_name: str = None) -> str:
+    """Default system prompt for a detected language ('english' or 'bangla')"""
+    client_context = f" for {client_name}" if client_name else ""
+    if language == 'english':
+        return f"""
+                    You are a friendly and helpful AI assistant{client_context}.
+                    The user is asking in English, so you MUST respond in English only.
+                    Do not use Bengali/Bangla language in your response.
+                    Be polite, helpful, and respond naturally in English.
+                    """
+    return f"""
+                    আপনি একজন বন্ধুত্বপূর্ণ এবং সহায়ক AI সহকারী{client_context}।
+                    ব্যবহারকারী বাংলায় প্রশ্ন করেছেন, তাই আপনাকে অবশ্যই বাংলায় উত্তর দিতে হবে।
+                    ইংরেজি ভাষা ব্যবহার করবেন না।
+                    বিনয়ী এবং সহায়ক হন এবং স্বাভাবিক বাংলায় উত্তর দিন।
+                    """
+
+
 class OpenAIService:
     """Service for OpenAI API integration"""
     
@@ -52,7 +70,12 @@ class OpenAIService:
         client_name: str = None,
         model: str = "gpt-4o-mini",
         temperature: float = 0.7,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        tools: list = None,
+        tool_executor=None,
+        max_tool_rounds: int = 3,
+        knowledge: list = None,
+        system_prompts: dict = None
     ) -> Dict[str, Any]:
         """
         Generate AI chat response in Bangla
@@ -64,6 +87,12 @@ class OpenAIService:
             model: OpenAI model to use
             temperature: Response creativity (0-2)
             max_tokens: Maximum tokens in response
+            tools: OpenAI function-calling tool schemas the model may use
+            tool_executor: Object whose execute([(call_id, name, arguments)]) returns
+                {call_id: result_json}; required when tools are given
+            max_tool_rounds: Maximum tool-call round trips before answering
+            knowledge: Client knowledge snippets to ground the answer in
+            system_prompts: Precompiled default prompts keyed by detected language
             
         Returns:
             Dict containing response, confidence, and metadata
@@ -80,21 +109,14 @@ class OpenAIService:
             detected_language = self._detect_language(message)
             
             if not system_prompt:
-                client_context = f" for {client_name}" if client_name else ""
-                if detected_language == 'english':
-                    system_prompt = f"""
-                    You are a friendly and helpful AI assistant{client_context}.
-                    The user is asking in English, so you MUST respond in English only.
-                    Do not use Bengali/Bangla language in your response.
-                    Be polite, helpful, and respond naturally in English.
-                    """
-                else:  # Bangla
-                    system_prompt = f"""
-                    আপনি একজন বন্ধুত্বপূর্ণ এবং সহায়ক AI সহকারী{client_context}।
-                    ব্যবহারকারী বাংলায় প্রশ্ন করেছেন, তাই আপনাকে অবশ্যই বাংলায় উত্তর দিতে হবে।
-                    ইংরেজি ভাষা ব্যবহার করবেন না।
-                    বিনয়ী এবং সহায়ক হন এবং স্বাভাবিক বাংলায় উত্তর দিন।
-                    """
+                system_prompt = (system_prompts or {}).get(detected_language) \
+                    or build_system_prompt(detected_language, client_name)
+            
+            if knowledge:
+                system_prompt += (
+                    "\nRelevant information about this business (use it when it answers the question):\n"
+                    + "\n".join(f"- {snippet}" for snippet in knowledge)
+                )
             
             # Prepare messages
             messages = [{"role": "system", "content": system_prompt}]
@@ -110,25 +132,64 @@ class OpenAIService:
             # Add current message
             messages.append({"role": "user", "content": message})
             
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=1,
-                frequency_penalty=0,
-                presence_penalty=0
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
+            use_tools = bool(tools and tool_executor)
+            if use_tools:
+                messages[0]["content"] += (
+                    "\nUse the provided tools to look up product stock, order status and "
+                    "payment status instead of guessing."
+                )
+            
+            # Call OpenAI API; tool calls are answered in-process and sent back
+            tokens_used = 0
+            tools_used = []
+            for round_number in range(max_tool_rounds + 1):
+                request_kwargs = {}
+                if use_tools:
+                    request_kwargs['tools'] = tools
+                    # Force a final text answer once the round budget is spent
+                    request_kwargs['tool_choice'] = 'auto' if round_number < max_tool_rounds else 'none'
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=1,
+                    frequency_penalty=0,
+                    presence_penalty=0,
+                    **request_kwargs
+                )
+                tokens_used += response.usage.total_tokens
+                reply = response.choices[0].message
+                if not (use_tools and reply.tool_calls):
+                    break
+                
+                calls = [(call.id, call.function.name, call.function.arguments) for call in reply.tool_calls]
+                messages.append({
+                    "role": "assistant",
+                    "content": reply.content,
+                    "tool_calls": [
+                        {
+                            "id": call_id,
+                            "type": "function",
+                            "function": {"name": name, "arguments": arguments}
+                        }
+                        for call_id, name, arguments in calls
+                    ]
+                })
+                results = tool_executor.execute(calls)
+                for call_id, name, _ in calls:
+                    messages.append({"role": "tool", "tool_call_id": call_id, "content": results[call_id]})
+                    tools_used.append(name)
+            
+            ai_response = (reply.content or '').strip()
             
             return {
                 'response': ai_response,
                 'confidence': 0.9,  # High confidence for successful response
                 'detected_language': detected_language,
                 'model_used': model,
-                'tokens_used': response.usage.total_tokens,
+                'tokens_used': tokens_used,
+                'tools_used': tools_used,
                 'finish_reason': response.choices[0].finish_reason
             }
             
@@ -9,6 +9,8 @@ from accounts.models import Organization
 from social_media.models import SocialMediaAccount, SocialMediaMessage, SocialMediaWebhook
 from chat.models import Conversation, Message
 from services.openai_service import openai_service
+from core import metering
+from core.runtime import get_organization_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +19,14 @@ class SocialMediaService:
     """Unified social media integration service"""
 
     def __init__(self, organization):
+        # An Organization, or the OrganizationRuntime the webhook views resolve
         self.organization = organization
 
+    @property
+    def runtime(self):
+        """Compiled organization config (agents, social accounts); no queries once warm."""
+        return get_organization_runtime(self.organization.id)
+
     def connect_facebook(self, page_id, access_token, page_name):
         """Connect Facebook page"""
         account, created = SocialMediaAccount.objects.get_or_create(
@@ -118,13 +126,8 @@ class SocialMediaService:
             page_id = entry.get('id')
 
             # Get social account
-            try:
-                social_account = SocialMediaAccount.objects.get(
-                    platform='facebook',
-                    account_id=page_id,
-                    is_active=True
-                )
-            except SocialMediaAccount.DoesNotExist:
+            social_account = self.runtime.account('facebook', page_id)
+            if social_account is None:
                 continue
 
             # Process messaging events
@@ -144,13 +147,9 @@ class SocialMediaService:
             return
             
         # Find WhatsApp account by organization first
-        whatsapp_accounts = SocialMediaAccount.objects.filter(
-            organization=self.organization,
-            platform='whatsapp',
-            is_active=True
-        )
+        whatsapp_accounts = self.runtime.accounts('whatsapp')
         
-        if not whatsapp_accounts.exists():
+        if not whatsapp_accounts:
             return
         
         # Process entries
@@ -167,16 +166,12 @@ class SocialMediaService:
                     contacts = value.get('contacts', [])
                     if contacts:
                         # Get account from organization
-                        social_account = whatsapp_accounts.first()
+                        social_account = whatsapp_accounts[0]
                     else:
                         continue
                 else:
-                    # Try to find account by phone_number_id
-                    try:
-                        social_account = whatsapp_accounts.get(account_id=phone_number_id)
-                    except SocialMediaAccount.DoesNotExist:
-                        # Use first account as fallback
-                        social_account = whatsapp_accounts.first()
+                    # Try to find account by phone_number_id, first account as fallback
+                    social_account = self.runtime.account('whatsapp', phone_number_id) or whatsapp_accounts[0]
 
                 # Process messages
                 messages = value.get('messages', [])
@@ -194,13 +189,9 @@ class SocialMediaService:
             return
             
         # Find Instagram accounts for this organization
-        instagram_accounts = SocialMediaAccount.objects.filter(
-            organization=self.organization,
-            platform='instagram',
-            is_active=True
-        )
+        instagram_accounts = self.runtime.accounts('instagram')
         
-        if not instagram_accounts.exists():
+        if not instagram_accounts:
             return
         
         # Process entries (Instagram uses same structure as Facebook)
@@ -208,12 +199,8 @@ class SocialMediaService:
         for entry in entries:
             instagram_account_id = entry.get('id')
             
-            # Try to find account by ID
-            try:
-                social_account = instagram_accounts.get(account_id=instagram_account_id)
-            except SocialMediaAccount.DoesNotExist:
-                # Use first account as fallback
-                social_account = instagram_accounts.first()
+            # Try to find account by ID, first account as fallback
+            social_account = self.runtime.account('instagram', instagram_account_id) or instagram_accounts[0]
 
             # Process messaging events
             messaging_events = entry.get('messaging', [])
@@ -247,8 +234,8 @@ class SocialMediaService:
 
         # Create social media message record
         social_message = SocialMediaMessage.objects.create(
-            social_account=social_account,
-            organization=social_account.organization,
+            social_account_id=social_account.id,
+            organization_id=social_account.organization_id,
             message_type='incoming',
             platform_message_id=message_id,
             sender_id=sender_id,
@@ -259,7 +246,7 @@ class SocialMediaService:
         )
 
         # Process with AI if auto-reply is enabled
-        if social_account.auto_reply_enabled and social_account.ai_agent:
+        if social_account.auto_reply_enabled and social_account.ai_agent_id:
             ai_response = self._generate_ai_response(conversation, message_text, self.organization.name)
 
             if ai_response:
@@ -268,8 +255,8 @@ class SocialMediaService:
 
                 # Create outgoing message record
                 SocialMediaMessage.objects.create(
-                    social_account=social_account,
-                    organization=social_account.organization,
+                    social_account_id=social_account.id,
+                    organization_id=social_account.organization_id,
                     message_type='outgoing',
                     platform_message_id=f"response_{message_id}",
                     sender_id=social_account.account_id,
@@ -301,7 +288,7 @@ class SocialMediaService:
         """Get or create conversation for social media interaction"""
         # Try to find existing conversation
         conversation = Conversation.objects.filter(
-            organization=social_account.organization,
+            organization_id=social_account.organization_id,
             social_messages__platform_message_id__startswith=f"{platform}_{sender_id}"
         ).first()
 
@@ -322,21 +309,31 @@ class SocialMediaService:
         # Create conversation
         conversation = Conversation.objects.create(
             user=user,
-            organization=social_account.organization,
-            ai_agent=social_account.ai_agent
+            organization_id=social_account.organization_id,
+            ai_agent_id=social_account.ai_agent_id
         )
 
         return conversation
 
     def _generate_ai_response(self, conversation, message_text, client_name=None):
         """Generate AI response for social media message using AI agent"""
-        if not conversation.ai_agent:
+        agent = self.runtime.agents.get(conversation.ai_agent_id)
+        if not agent:
             return "Thank you for your message. We'll get back to you soon."
 
+        # Configured handoff keywords/phrases hand the conversation to a human
+        trigger = agent.wants_handoff(message_text)
+        if trigger:
+            conversation.status = 'transferred'
+            conversation.transfer_reason = f"Handoff trigger: {trigger}"
+            conversation.save(update_fields=['status', 'transfer_reason', 'last_message_at'])
+            return "Thank you for your message. A member of our team will reply shortly."
+
         try:
             # Get recent conversation history
+            # The timestamp bound lets PostgreSQL skip older message partitions
             recent_messages = Message.objects.filter(
-                conversation=conversation
+                conversation=conversation, timestamp__gte=conversation.started_at
             ).order_by('-timestamp')[:10]
 
             conversation_history = []
@@ -346,22 +343,24 @@ class SocialMediaService:
                     'content': msg.content
                 })
 
-            # Generate response using OpenAI service
-            system_prompt = conversation.ai_agent.system_prompt if conversation.ai_agent else None
-            
-            # Get client name from organization
-            if client_name:
-                system_prompt = f"{system_prompt or ''} You are responding on behalf of {client_name}."
+            # Generate response using OpenAI service; the agent prompt is precompiled
+            # with the organization name
+            if client_name and client_name != self.runtime.name:
+                system_prompt = f"{agent.system_prompt or ''} You are responding on behalf of {client_name}."
+            else:
+                system_prompt = agent.prompt
             
             ai_result = openai_service.generate_chat_response(
                 message=message_text,
                 conversation_history=conversation_history,
                 system_prompt=system_prompt,
-                client_name=client_name or self.organization.name,
-                model=conversation.ai_agent.model_name if conversation.ai_agent else "gpt-4o-mini",
+                client_name=client_name or self.runtime.name,
+                model=agent.model_name,
             )
 
             response_text = ai_result.get('response', '')
+            metering.record('chats', 1, organization_id=self.runtime.id)
+            metering.record('tokens', ai_result.get('tokens_used', 0), organization_id=self.runtime.id)
 
             # Create AI message record
             Message.objects.create(
@@ -402,8 +401,8 @@ class SocialMediaService:
 
         # Create social media message record
         social_message = SocialMediaMessage.objects.create(
-            social_account=social_account,
-            organization=social_account.organization,
+            social_account_id=social_account.id,
+            organization_id=social_account.organization_id,
             message_type='incoming',
             platform_message_id=message_id,
             sender_id=from_id,
@@ -415,7 +414,7 @@ class SocialMediaService:
         )
 
         # Process with AI if auto-reply is enabled
-        if social_account.auto_reply_enabled and social_account.ai_agent:
+        if social_account.auto_reply_enabled and social_account.ai_agent_id:
             ai_response = self._generate_ai_response(conversation, message_text, self.organization.name)
 
             if ai_response:
@@ -424,8 +423,8 @@ class SocialMediaService:
 
                 # Create outgoing message record
                 SocialMediaMessage.objects.create(
-                    social_account=social_account,
-                    organization=social_account.organization,
+                    social_account_id=social_account.id,
+                    organization_id=social_account.organization_id,
                     message_type='outgoing',
                     platform_message_id=f"response_{message_id}",
                     sender_id=social_account.account_id,
@@ -458,8 +457,8 @@ class SocialMediaService:
 
         # Create social media message record
         social_message = SocialMediaMessage.objects.create(
-            social_account=social_account,
-            organization=social_account.organization,
+            social_account_id=social_account.id,
+            organization_id=social_account.organization_id,
             message_type='incoming',
             platform_message_id=message_id,
             sender_id=sender_id,
@@ -469,7 +468,7 @@ class SocialMediaService:
         )
 
         # Process with AI if auto-reply is enabled
-        if social_account.auto_reply_enabled and social_account.ai_agent:
+        if social_account.auto_reply_enabled and social_account.ai_agent_id:
             ai_response = self._generate_ai_response(conversation, message_text, self.organization.name)
 
             if ai_response:
@@ -478,8 +477,8 @@ class SocialMediaService:
 
                 # Create outgoing message record
                 SocialMediaMessage.objects.create(
-                    social_account=social_account,
-                    organization=social_account.organization,
+                    social_account_id=social_account.id,
+                    organization_id=social_account.organization_id,
                     message_type='outgoing',
                     platform_message_id=f"response_{message_id}",
                     sender_id=social_account.account_id,
@@ -535,7 +534,7 @@ class SocialMediaService:
             # Update message status if we have the message
             try:
                 message = SocialMediaMessage.objects.get(
-                    social_account=social_account,
+                    social_account_id=social_account.id,
                     platform_message_id=message_id
                 )
                 
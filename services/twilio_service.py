@@ -8,6 +8,7 @@ from accounts.models import APIKey, Organization
 from chat.models import Conversation, Message, AIAgent
 from voice.models import VoiceRecording, VoiceSession
 from services.openai_service import OpenAIService
+from core.runtime import get_organization_runtime
 
 
 class TwilioService:
@@ -188,31 +189,28 @@ class TwilioService:
 
     def _get_or_create_voice_conversation(self, from_number, organization_id):
         """Get or create conversation for voice call"""
-        try:
-            organization = Organization.objects.get(id=organization_id)
-        except Organization.DoesNotExist:
+        organization = get_organization_runtime(organization_id)
+        if organization is None:
             raise ValueError("Organization not found")
 
         # Try to find existing user by phone number
-        user = None
-        if hasattr(organization, 'users'):
-            user = organization.users.filter(phone=from_number).first()
+        from accounts.models import User
+        user = User.objects.filter(organization_id=organization.id, phone=from_number).first()
 
         if not user:
             # Create anonymous user for this call
-            from accounts.models import User
             user = User.objects.create(
                 username=f"voice_call_{from_number}_{timezone.now().timestamp()}",
                 phone=from_number,
+                organization_id=organization.id,
                 is_active=False  # Mark as inactive until they register
             )
-            organization.users.add(user)
 
         # Create conversation
         conversation = Conversation.objects.create(
             user=user,
-            organization=organization,
-            ai_agent=AIAgent.objects.filter(organization=organization, voice_enabled=True).first()
+            organization_id=organization.id,
+            ai_agent_id=organization.voice_agent_id
         )
 
         return conversation
@@ -226,8 +224,9 @@ class TwilioService:
             openai_service = OpenAIService(conversation.organization)
 
             # Get conversation history
+            # The timestamp bound lets PostgreSQL skip older message partitions
             recent_messages = Message.objects.filter(
-                conversation=conversation
+                conversation=conversation, timestamp__gte=conversation.started_at
             ).order_by('-timestamp')[:10]
 
             conversation_history = []
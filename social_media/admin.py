@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import FullTextSearchAdmin
 from .models import (
     SocialMediaAccount, SocialMediaMessage, SocialMediaAutoReply, 
     SocialMediaWebhook, SocialMediaAnalytics
@@ -32,10 +33,12 @@ class SocialMediaAccountAdmin(admin.ModelAdmin):
 
 
 @admin.register(SocialMediaMessage)
-class SocialMediaMessageAdmin(admin.ModelAdmin):
+class SocialMediaMessageAdmin(FullTextSearchAdmin):
     list_display = ['social_account', 'sender_id', 'message_type', 'ai_processed', 'received_at']
     list_filter = ['message_type', 'ai_processed', 'received_at', 'social_account__platform']
-    search_fields = ['content', 'sender_id', 'social_account__account_name']
+    search_fields = SocialMediaMessage.SEARCH_FIELDS
+    exact_search_fields = ('social_account__account_name',)
+    search_help_text = "Finds whole words of the message or sender, or an exact account name."
     readonly_fields = ['received_at', 'processed_at', 'sent_at']
     ordering = ['-received_at']
     
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hot_query_indexes'),
+        ('chat', '0002_hot_query_indexes'),
+        ('social_media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='socialmediamessage',
+            index=models.Index(fields=['social_account', '-received_at'], name='smmsg_account_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialmediamessage',
+            index=models.Index(fields=['organization', '-received_at'], name='smmsg_org_received_idx'),
+        ),
+    ]
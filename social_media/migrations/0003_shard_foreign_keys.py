@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_organization_api_key'),
+        ('social_media', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='socialmediamessage',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='social_messages', to='accounts.organization'),
+        ),
+        migrations.AlterField(
+            model_name='socialmediamessage',
+            name='social_account',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='social_media.socialmediaaccount'),
+        ),
+    ]
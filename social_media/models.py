@@ -2,6 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from core.bangla import normalize_many
+from core.search import Searchable
+
 
 class SocialMediaAccount(models.Model):
     """Social media account connection"""
@@ -56,17 +59,22 @@ class SocialMediaAccount(models.Model):
     def __str__(self):
         return f"{self.organization.name} - {self.platform} - {self.account_name}"
 
-class SocialMediaMessage(models.Model):
+class SocialMediaMessage(Searchable):
     """Messages from social media platforms"""
 
+    SEARCH_FIELDS = ('sender_id', 'sender_name', 'content')
+
     MESSAGE_TYPE_CHOICES = [
         ('incoming', 'Incoming'),
         ('outgoing', 'Outgoing'),
         ('system', 'System'),
     ]
 
-    social_account = models.ForeignKey(SocialMediaAccount, on_delete=models.CASCADE, related_name='messages')
-    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='social_messages')
+    # Control rows live on the default database, so no constraint (core/db/sharding.py)
+    social_account = models.ForeignKey(SocialMediaAccount, on_delete=models.CASCADE, related_name='messages',
+                                       db_constraint=False)
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='social_messages',
+                                     db_constraint=False)
 
     # Message details
     message_type = models.CharField(max_length=10, choices=MESSAGE_TYPE_CHOICES, default='incoming')
@@ -114,6 +122,8 @@ class SocialMediaMessage(models.Model):
         indexes = [
             models.Index(fields=['social_account', 'thread_id']),
             models.Index(fields=['platform_message_id']),
+            models.Index(fields=['social_account', '-received_at'], name='smmsg_account_received_idx'),
+            models.Index(fields=['organization', '-received_at'], name='smmsg_org_received_idx'),
         ]
 
     def __str__(self):
@@ -233,4 +243,12 @@ class SocialMediaAutoReply(models.Model):
         ordering = ['-priority', 'created_at']
 
     def __str__(self):
-        return f"Auto Reply: {self.trigger_keywords[:50]}..."
\ No newline at end of file
+        return f"Auto Reply: {self.trigger_keywords[:50]}..."
+
+    def save(self, *args, **kwargs):
+        # Stored normalized (core.bangla), so spellings that differ only in encoding are one keyword;
+        # regular expressions are kept as written
+        if self.trigger_type != 'regex':
+            self.trigger_keywords = [keyword for keyword in normalize_many(map(str, self.trigger_keywords or []))
+                                     if keyword]
+        super().save(*args, **kwargs)
@@ -2,13 +2,35 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse
+from core.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.db import models
 from .models import SocialMediaAccount, SocialMediaMessage, SocialMediaWebhook, SocialMediaAutoReply, SocialMediaAnalytics
 from services.social_media_service import SocialMediaService
+from core.runtime import get_organization_runtime
+from core.db.routers import read_from_replica
+from core import exports
+
+
+# Export column -> lookup on SocialMediaAnalytics
+ANALYTICS_EXPORT_COLUMNS = {
+    'date': 'date',
+    'period': 'period',
+    'platform': 'social_account__platform',
+    'account_name': 'social_account__account_name',
+    'messages_received': 'messages_received',
+    'messages_sent': 'messages_sent',
+    'ai_responses': 'ai_responses',
+    'average_response_time': 'average_response_time',
+    'response_rate': 'response_rate',
+    'customer_satisfaction': 'customer_satisfaction',
+    'messages_with_attachments': 'messages_with_attachments',
+    'failed_webhooks': 'failed_webhooks',
+    'failed_responses': 'failed_responses',
+}
 
 
 @login_required
@@ -21,7 +43,7 @@ def social_accounts_list(request):
     # Get recent messages (last 10)
     recent_messages = SocialMediaMessage.objects.filter(
         organization=organization
-    ).select_related('social_account').order_by('-received_at')[:10]
+    ).prefetch_related('social_account').order_by('-received_at')[:10]
 
     context = {
         'accounts': accounts,
@@ -222,7 +244,9 @@ def messages_list(request):
     messages_query = SocialMediaMessage.objects.filter(organization=organization)
 
     if platform:
-        messages_query = messages_query.filter(social_account__platform=platform)
+        # Accounts are on the default database, messages on the organization's shard
+        messages_query = messages_query.filter(social_account_id__in=list(SocialMediaAccount.objects.filter(
+            organization=organization, platform=platform).values_list('id', flat=True)))
     if account_id:
         messages_query = messages_query.filter(social_account_id=account_id)
 
@@ -269,7 +293,10 @@ def facebook_webhook(request, organization_id):
     
     try:
         from accounts.models import Organization
-        organization = Organization.objects.get(id=organization_id)
+        # Compiled organization config; no queries once warm
+        organization = get_organization_runtime(organization_id)
+        if organization is None:
+            raise Organization.DoesNotExist
 
         # Handle Facebook webhook verification (GET request)
         if request.method == 'GET':
@@ -281,12 +308,7 @@ def facebook_webhook(request, organization_id):
                 return HttpResponse('Invalid mode', status=400)
 
             # Get verification token from any Facebook account for this organization
-            from .models import SocialMediaAccount
-            facebook_account = SocialMediaAccount.objects.filter(
-                organization=organization,
-                platform='facebook',
-                is_active=True
-            ).first()
+            facebook_account = next(iter(organization.accounts('facebook')), None)
 
             if facebook_account and facebook_account.webhook_secret == verify_token:
                 return HttpResponse(challenge, content_type='text/plain')
@@ -338,7 +360,10 @@ def twitter_webhook(request, organization_id):
     """Handle Twitter webhooks"""
     try:
         from accounts.models import Organization
-        organization = Organization.objects.get(id=organization_id)
+        # Compiled organization config; no queries once warm
+        organization = get_organization_runtime(organization_id)
+        if organization is None:
+            raise Organization.DoesNotExist
 
         social_service = SocialMediaService(organization)
         social_service.handle_twitter_webhook(request.POST)
@@ -359,7 +384,10 @@ def instagram_webhook(request, organization_id):
     
     try:
         from accounts.models import Organization
-        organization = Organization.objects.get(id=organization_id)
+        # Compiled organization config; no queries once warm
+        organization = get_organization_runtime(organization_id)
+        if organization is None:
+            raise Organization.DoesNotExist
 
         # Handle Instagram webhook verification (GET request)
         if request.method == 'GET':
@@ -371,12 +399,7 @@ def instagram_webhook(request, organization_id):
                 return HttpResponse('Invalid mode', status=400)
 
             # Get verification token from Instagram account
-            from .models import SocialMediaAccount
-            instagram_account = SocialMediaAccount.objects.filter(
-                organization=organization,
-                platform='instagram',
-                is_active=True
-            ).first()
+            instagram_account = next(iter(organization.accounts('instagram')), None)
 
             if instagram_account and instagram_account.webhook_secret == verify_token:
                 return HttpResponse(challenge, content_type='text/plain')
@@ -430,7 +453,10 @@ def whatsapp_webhook(request, organization_id):
     
     try:
         from accounts.models import Organization
-        organization = Organization.objects.get(id=organization_id)
+        # Compiled organization config; no queries once warm
+        organization = get_organization_runtime(organization_id)
+        if organization is None:
+            raise Organization.DoesNotExist
 
         # Handle webhook verification (GET request)
         if request.method == 'GET':
@@ -442,12 +468,7 @@ def whatsapp_webhook(request, organization_id):
                 return HttpResponse('Invalid mode', status=400)
 
             # Get the verify token from WhatsApp account
-            from .models import SocialMediaAccount
-            whatsapp_account = SocialMediaAccount.objects.filter(
-                organization=organization,
-                platform='whatsapp',
-                is_active=True
-            ).first()
+            whatsapp_account = next(iter(organization.accounts('whatsapp')), None)
 
             if whatsapp_account and whatsapp_account.webhook_secret == token:
                 return HttpResponse(challenge, content_type='text/plain')
@@ -463,11 +484,7 @@ def whatsapp_webhook(request, organization_id):
                 app_secret = getattr(settings, 'WHATSAPP_APP_SECRET', '')
                 if not app_secret:
                     # Fallback to access token for verification
-                    whatsapp_account = SocialMediaAccount.objects.filter(
-                        organization=organization,
-                        platform='whatsapp',
-                        is_active=True
-                    ).first()
+                    whatsapp_account = next(iter(organization.accounts('whatsapp')), None)
                     if whatsapp_account:
                         app_secret = whatsapp_account.access_token[:32]  # Use first 32 chars
                 
@@ -601,6 +618,7 @@ def delete_auto_reply(request, reply_id):
 
 
 @login_required
+@read_from_replica
 def analytics_dashboard(request):
     """Social media analytics dashboard"""
     organization = request.user.organization
@@ -647,9 +665,25 @@ def analytics_dashboard(request):
 
 
 @login_required
+@read_from_replica
 def export_analytics(request):
-    """Export social media analytics data"""
-    # This would implement CSV/Excel export functionality
-    # For now, just redirect back
-    messages.info(request, 'Analytics export feature coming soon!')
-    return redirect('social_media:analytics')
\ No newline at end of file
+    """Stream the analytics of the last ``days`` as CSV, NDJSON or Parquet (``file_format``)"""
+    organization = request.user.organization
+    days = int(request.GET.get('days', 30))
+    start_date = timezone.now().date() - timezone.timedelta(days=days)
+    file_format = request.GET.get('file_format', 'csv')
+
+    analytics_data = SocialMediaAnalytics.objects.filter(
+        social_account__organization=organization,
+        date__gte=start_date
+    ).order_by('date', 'id')
+
+    try:
+        return exports.streaming_response(
+            exports.queryset_rows(analytics_data, ANALYTICS_EXPORT_COLUMNS.values()),
+            SocialMediaAnalytics, ANALYTICS_EXPORT_COLUMNS, file_format,
+            f"social-analytics-{start_date.isoformat()}",
+        )
+    except exports.ExportFormatError as e:
+        messages.error(request, str(e))
+        return redirect('social_media:analytics')
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_hot_query_indexes'),
+        ('voice', '0002_alter_voiceanalytics_total_audio_duration_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voicesession',
+            index=models.Index(fields=['user', '-started_at'], name='vsession_user_started_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voice', '0003_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='speechsynthesis',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='speech_syntheses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='voicerecording',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='voice_recordings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='voicesession',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='voice_sessions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_shard_foreign_keys'),
+        ('voice', '0004_shard_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='speechsynthesis',
+            name='message',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='speech_synthesis', to='chat.message'),
+        ),
+    ]
@@ -13,7 +13,9 @@ class VoiceRecording(models.Model):
         ('failed', 'Failed'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='voice_recordings')
+    # Control rows live on the default database, so no constraint (core/db/sharding.py)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='voice_recordings',
+                             db_constraint=False)
     conversation = models.ForeignKey('chat.Conversation', on_delete=models.CASCADE, related_name='voice_recordings')
 
     # File information
@@ -70,7 +72,8 @@ class VoiceSession(models.Model):
     ]
 
     conversation = models.OneToOneField('chat.Conversation', on_delete=models.CASCADE, related_name='voice_session')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='voice_sessions')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='voice_sessions',
+                             db_constraint=False)
 
     # Session information
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
@@ -102,6 +105,10 @@ class VoiceSession(models.Model):
         verbose_name = _('Voice Session')
         verbose_name_plural = _('Voice Sessions')
         ordering = ['-started_at']
+        indexes = [
+            # session_id is already unique (and therefore indexed); this covers per-user listings
+            models.Index(fields=['user', '-started_at'], name='vsession_user_started_idx'),
+        ]
 
     def __str__(self):
         return f"Voice Session {self.session_id} - {self.user.username}"
@@ -117,8 +124,11 @@ class SpeechSynthesis(models.Model):
         ('failed', 'Failed'),
     ]
 
-    message = models.OneToOneField('chat.Message', on_delete=models.CASCADE, related_name='speech_synthesis')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='speech_syntheses')
+    # chat_message is partitioned on PostgreSQL, so no constraint (core/db/partitions.py)
+    message = models.OneToOneField('chat.Message', on_delete=models.CASCADE, related_name='speech_synthesis',
+                                   db_constraint=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='speech_syntheses',
+                             db_constraint=False)
 
     # Synthesis settings
     voice_type = models.CharField(max_length=50, default='neutral')
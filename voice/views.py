@@ -1,7 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse
+from core.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils import timezone
@@ -9,6 +10,8 @@ from .models import VoiceRecording, VoiceSession, SpeechSynthesis
 from chat.models import Conversation
 from services.twilio_service import TwilioService
 from accounts.models import Organization
+from core import metering
+from core.pagination import paginate_keyset, InvalidCursor
 from django.views.decorators.clickjacking import xframe_options_exempt
 import json
 from datetime import timedelta
@@ -167,6 +170,8 @@ def end_voice_session(request):
             session.status = 'completed'
             session.ended_at = timezone.now()
             session.save()
+            metering.record('voice_seconds', (session.ended_at - session.started_at).total_seconds(),
+                            organization_id=request.user.organization_id)
 
             return JsonResponse({'success': True})
 
@@ -381,27 +386,34 @@ def hangup_call_api(request):
 def call_log_api(request):
     """API endpoint to get call log"""
     try:
-        # Get recent voice sessions for the user
-        sessions = VoiceSession.objects.filter(
-            user=request.user
-        ).order_by('-created_at')[:20]
+        # Get recent voice sessions for the user, newest first, one keyset page at a time
+        sessions = VoiceSession.objects.filter(user=request.user).values(
+            'id', 'session_id', 'status', 'started_at', 'ended_at', 'total_duration', 'voice_type', 'language'
+        )
+        try:
+            rows, next_cursor = paginate_keyset(
+                sessions, request.GET, keys=('started_at', 'id'), descending=True, default_limit=20
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         calls = []
-        for session in sessions:
+        for session in rows:
             calls.append({
-                'id': session.id,
-                'session_id': session.session_id,
-                'status': session.status,
-                'created_at': session.created_at.isoformat(),
-                'ended_at': session.ended_at.isoformat() if session.ended_at else None,
-                'duration': session.duration if hasattr(session, 'duration') else 0,
-                'voice_type': session.voice_type,
-                'language': session.language
+                'id': session['id'],
+                'session_id': session['session_id'],
+                'status': session['status'],
+                'created_at': session['started_at'].isoformat(),
+                'ended_at': session['ended_at'].isoformat() if session['ended_at'] else None,
+                'duration': session['total_duration'].total_seconds() if session['total_duration'] else 0,
+                'voice_type': session['voice_type'],
+                'language': session['language']
             })
         
         return JsonResponse({
             'success': True,
-            'calls': calls
+            'calls': calls,
+            'next_cursor': next_cursor
         })
         
     except Exception as e: